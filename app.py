@@ -2,22 +2,40 @@ import os
 import tempfile
 import shutil
 from pathlib import Path
-from flask import Flask, render_template, request, redirect, url_for, flash, jsonify, send_from_directory
+from flask import Flask, render_template, request, redirect, url_for, flash, jsonify, send_from_directory, Response, g, has_request_context, stream_with_context
 from werkzeug.utils import secure_filename
+from werkzeug.datastructures import ContentRange
 import db_manager
 import text_parser
 import audio_processor
 import tts_utils
+import mp3_index
+import static_assets
+import subtitles
+import zip_stream
+import chunked_upload
 
 import logging
 from logging.handlers import RotatingFileHandler
+import click
+import mimetypes
+import json
+import re
+import unicodedata
+from urllib.parse import quote
+from datetime import datetime
+import sqlite3
+import threading
+from collections import OrderedDict
+from markupsafe import Markup
 
 # Configuration
 UPLOAD_FOLDER = 'uploads'
 ALLOWED_TEXT_EXTENSIONS = {'txt'}
 ALLOWED_AUDIO_EXTENSIONS = {'mp3', 'mp4', 'wav', 'm4a'}
 
-app = Flask(__name__)
+# Instance folder (logs, processed files, audio); defaults to ./instance next to this file
+app = Flask(__name__, instance_path=os.environ.get('AUDIOBOOK_WEB_INSTANCE_PATH'))
 app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
 app.config['SECRET_KEY'] = 'your_very_secret_key_here_please_change_me' # TODO: Change this!
 app.config['AENEAS_PYTHON_PATH'] = r"C:\Program Files\Python39\python.exe" # TODO: Make this environment configurable
@@ -26,6 +44,78 @@ app.config['TEMP_FILES_FOLDER'] = os.path.join(app.instance_path, 'temp_files')
 app.config['CONVERTED_AUDIO_FOLDER'] = os.path.join(app.instance_path, 'converted_audio')
 app.config['MP3_PARTS_FOLDER'] = os.path.join(app.instance_path, 'mp3_parts')
 app.config['MAX_AUDIO_PART_SIZE_MB'] = 20
+# Resumable chunked audio uploads (see chunked_upload.py): staging folder, largest chunk accepted per
+# request, largest audio file, and how long an unfinished or unclaimed upload is kept.
+app.config['UPLOAD_SESSIONS_FOLDER'] = os.path.join(app.instance_path, 'upload_sessions')
+app.config['UPLOAD_CHUNK_BYTES'] = 8 * 1024 * 1024
+app.config['UPLOAD_MAX_AUDIO_BYTES'] = 4 * 1024 * 1024 * 1024
+app.config['UPLOAD_SESSION_TTL_S'] = 24 * 60 * 60
+# SQLite tuning, applied by db_manager.init_db (see db_manager.SQLITE_SETTINGS for the meaning of each)
+app.config['SQLITE_JOURNAL_MODE'] = 'WAL'
+app.config['SQLITE_SYNCHRONOUS'] = 'NORMAL'
+app.config['SQLITE_BUSY_TIMEOUT_MS'] = 5000
+app.config['SQLITE_MMAP_SIZE_BYTES'] = 64 * 1024 * 1024
+app.config['SQLITE_CACHE_SIZE_KIB'] = 16 * 1024
+app.config['SQLITE_MAINTENANCE_INTERVAL_S'] = 600
+# Apply pending schema migrations at startup. Set to False to leave them to `flask migrate-db`
+# (e.g. when several workers share the database).
+app.config['DB_AUTO_MIGRATE'] = True
+# Reading-location autosaves are buffered in memory (latest per article) and written in one
+# transaction this often and at exit. 0 writes every save immediately.
+app.config['READING_LOCATION_FLUSH_INTERVAL_S'] = 5
+app.config['READING_LOCATIONS_MAX_BATCH'] = 100 # Positions accepted per /reading_locations request
+app.config['DB_COUNT_QUERIES'] = False # Log SQL statements per request and send them as X-DB-Query-Count
+app.config['AUDIO_PART_VERIFY_WORKERS'] = 4 # Thread pool size for `flask verify-audio-parts`
+# 'physical': write each part to MP3_PARTS_FOLDER. 'virtual': store only byte ranges and
+# serve parts on demand from the converted MP3 (halves disk usage for split articles).
+app.config['AUDIO_PARTS_MODE'] = 'physical'
+# Local part files are matched against their sampled fingerprint (size + a few hashed windows) before
+# playing; with this on, the full SHA-256 is also checked in the background once the part is playing.
+app.config['AUDIO_PART_BACKGROUND_SHA256'] = True
+# Cache lifetime for part URLs that carry the part's checksum (?v=<sha256>); their content can never change.
+app.config['AUDIO_IMMUTABLE_CACHE_MAX_AGE'] = 365 * 24 * 60 * 60
+# Optional HLS-style output: short MP3 segments + M3U8 playlist per article, so a sentence click
+# only needs the segment(s) it falls in.
+app.config['HLS_OUTPUT_ENABLED'] = False
+app.config['HLS_FOLDER'] = os.path.join(app.instance_path, 'hls')
+app.config['HLS_SEGMENT_DURATION_S'] = 6
+# Compact encoding profiles produced alongside the main MP3 (-q:a 2). Each enabled profile gets its
+# own file, part split, checksums and sentence part offsets; listeners pick one on the article page.
+app.config['AUDIO_RENDITIONS_FOLDER'] = os.path.join(app.instance_path, 'audio_renditions')
+app.config['AUDIO_ENCODING_PROFILES'] = {
+    'speech_opus': {
+        'label': 'Opus 24 kbps mono (speech)', 'extension': 'opus', 'mimetype': 'audio/ogg',
+        'ffmpeg_args': ['-c:a', 'libopus', '-b:a', '24k', '-ac', '1', '-application', 'voip'],
+    },
+    'mono_mp3_40k': {
+        'label': 'MP3 40 kbps mono', 'extension': 'mp3', 'mimetype': 'audio/mpeg',
+        'ffmpeg_args': ['-c:a', 'libmp3lame', '-b:a', '40k', '-ac', '1'],
+    },
+}
+app.config['AUDIO_ENCODING_PROFILES_ENABLED'] = [] # e.g. ['speech_opus', 'mono_mp3_40k']
+# Articles with more sentences than this are rendered as a window (around the reading location)
+# and extended on scroll through /article/<id>/sentences, which also caps its limit at this value.
+app.config['ARTICLE_WINDOW_SENTENCES'] = 300
+# LRU of rendered article content, keyed by (article_id, content_version); bounded by total characters.
+app.config['ARTICLE_CONTENT_CACHE_MAX_CHARS'] = 64 * 1024 * 1024
+# LRU of generated subtitle files, keyed by (article_id, content_version, format, lang); bounded by total bytes.
+app.config['SUBTITLE_CACHE_MAX_BYTES'] = 16 * 1024 * 1024
+# Full-text search (/search, /api/search)
+app.config['SEARCH_RESULTS_PER_PAGE'] = 50
+app.config['SEARCH_MAX_RESULTS'] = 200 # Upper bound for /api/search?limit=
+# ASGI serving (asgi.py): thread pools behind the async audio and reading-location routes
+app.config['ASGI_DB_THREADS'] = 4
+app.config['ASGI_FILE_THREADS'] = 16
+app.config['ASGI_STREAM_CHUNK_BYTES'] = 64 * 1024 # Per read; at most two chunks per open stream are held in memory
+
+# Static assets: `flask build-assets` writes fingerprinted, precompressed copies here; served from /assets/
+app.config['STATIC_ASSETS_FOLDER'] = os.path.join(app.instance_path, 'static_assets')
+app.config['STATIC_ASSETS_CACHE_MAX_AGE'] = 365 * 24 * 60 * 60
+# On-the-fly compression of HTML/JSON responses at least this large (brotli if the client accepts it, else gzip)
+app.config['RESPONSE_COMPRESSION_MIN_BYTES'] = 1024
+app.config['RESPONSE_COMPRESSION_GZIP_LEVEL'] = 6
+app.config['RESPONSE_COMPRESSION_BROTLI_QUALITY'] = 4 # 0-11; higher levels cost too much per request
+app.config['RESPONSE_COMPRESSION_MIMETYPES'] = {'text/html', 'application/json'}
 
 # --- NEW TTS Configuration ---
 app.config['KOKORO_MANDARIN_VOICE'] = 'zf_xiaoxiao'  # TODO: REPLACE with your actual Mandarin voice
@@ -60,7 +150,9 @@ app.logger.info('Application startup: File logging configured.')
 
 # --- Database Initialization ---
 with app.app_context():
-    db_manager.init_db(app)
+    db_manager.init_db(app, auto_migrate=app.config['DB_AUTO_MIGRATE'])
+    db_manager.start_maintenance_thread(app_logger=app.logger)
+    db_manager.start_reading_location_flusher(app.config['READING_LOCATION_FLUSH_INTERVAL_S'], app_logger=app.logger)
     # --- NEW: Initialize TTS on app startup ---
     tts_init_success = tts_utils.initialize_kokoro(
         app.config['KOKORO_LANG_CODE_ZH'],
@@ -75,6 +167,144 @@ with app.app_context():
         app.logger.error("APP: *** KOKORO TTS FAILED TO INITIALIZE. TTS features will be unavailable. ***")
     # --- End NEW TTS Initialization ---
 
+
+# --- Static assets ---
+static_asset_manifest = static_assets.load_manifest(app.config['STATIC_ASSETS_FOLDER'], logger=app.logger)
+if not static_asset_manifest:
+    app.logger.info("APP: No built static assets found; serving /static files unfingerprinted (run `flask build-assets`).")
+
+
+@app.context_processor
+def inject_static_url():
+    def static_url(filename):
+        """URL of the fingerprinted build of a static file, or its plain /static URL if assets are not built."""
+        built_name = static_asset_manifest.get(filename)
+        if built_name:
+            return url_for('serve_static_asset', filename=built_name)
+        return url_for('static', filename=filename)
+    return {'static_url': static_url}
+
+
+@app.route('/assets/<path:filename>')
+def serve_static_asset(filename):
+    """Fingerprinted build output: the name changes with the content, so it is cached as immutable."""
+    assets_folder = Path(app.config['STATIC_ASSETS_FOLDER'])
+    available = [encoding for encoding, suffix in static_assets.PRECOMPRESSED_ENCODINGS
+                 if (assets_folder / (filename + suffix)).is_file()]
+    encoding = static_assets.choose_encoding(request.headers.get('Accept-Encoding'), available)
+    suffix = dict(static_assets.PRECOMPRESSED_ENCODINGS)[encoding] if encoding else ''
+    mimetype = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+    response = send_from_directory(str(assets_folder.resolve()), filename + suffix, mimetype=mimetype,
+                                   conditional=True, max_age=app.config['STATIC_ASSETS_CACHE_MAX_AGE'])
+    response.cache_control.public = True
+    response.cache_control.immutable = True
+    if available:
+        response.vary.add('Accept-Encoding')
+    if encoding:
+        response.headers['Content-Encoding'] = encoding
+    return response
+
+
+@app.after_request
+def compress_response(response):
+    """
+    Compresses buffered HTML/JSON responses above RESPONSE_COMPRESSION_MIN_BYTES for clients that accept it.
+    A strong ETag is made weak, so the identity and encoded representations never share one.
+    """
+    if (response.direct_passthrough or response.is_streamed or response.status_code != 200
+            or 'Content-Encoding' in response.headers
+            or response.mimetype not in app.config['RESPONSE_COMPRESSION_MIMETYPES']):
+        return response
+    data = response.get_data()
+    if len(data) < app.config['RESPONSE_COMPRESSION_MIN_BYTES']:
+        return response
+    response.vary.add('Accept-Encoding')
+    available = ('br', 'gzip') if static_assets.brotli_available else ('gzip',)
+    encoding = static_assets.choose_encoding(request.headers.get('Accept-Encoding'), available)
+    if not encoding:
+        return response
+    level = app.config['RESPONSE_COMPRESSION_BROTLI_QUALITY'] if encoding == 'br' else app.config['RESPONSE_COMPRESSION_GZIP_LEVEL']
+    response.set_data(static_assets.compress_bytes(data, encoding, level=level))
+    response.headers['Content-Encoding'] = encoding
+    etag, is_weak = response.get_etag()
+    if etag and not is_weak: # A strong ETag names the identity bytes; the encoded ones only match it weakly
+        response.set_etag(etag, weak=True)
+    return response
+
+
+@app.before_request
+def start_db_query_count():
+    if app.config['DB_COUNT_QUERIES']:
+        db_manager.start_query_count()
+
+
+@app.after_request
+def report_db_query_count(response):
+    count = db_manager.stop_query_count()
+    if count is not None:
+        response.headers['X-DB-Query-Count'] = str(count)
+        app.logger.debug(f"APP: {request.method} {request.path} ran {count} SQL statements.")
+    return response
+
+
+@app.teardown_request
+def clear_db_query_count(exception=None):
+    # after_request hooks are skipped when a view raises; don't leave the trace callback on this thread's connection
+    db_manager.stop_query_count()
+
+
+# --- Request-scoped entity loaders ---
+# Each article/book is read from the DB at most once per request; later lookups in the same request
+# (handlers, path helpers, processing code) get the same dict. Outside a request they just query.
+def _request_entity_cache():
+    if not has_request_context():
+        return None
+    if 'entity_cache' not in g:
+        g.entity_cache = {}
+    return g.entity_cache
+
+
+def load_article_with_book(article_id):
+    """(article, book, reading_location) for article_id in one query; see db_manager.get_article_with_book."""
+    cache = _request_entity_cache()
+    if cache is not None and ('article_view', article_id) in cache:
+        return cache[('article_view', article_id)]
+    article, book, reading_location = db_manager.get_article_with_book(article_id, app_logger=app.logger)
+    if cache is not None:
+        cache[('article_view', article_id)] = (article, book, reading_location)
+        cache[('article', article_id)] = article
+        if book:
+            cache[('book', book['id'])] = book
+    return article, book, reading_location
+
+
+def load_article(article_id):
+    cache = _request_entity_cache()
+    if cache is not None and ('article', article_id) in cache:
+        return cache[('article', article_id)]
+    article = db_manager.get_article_by_id(article_id, app_logger=app.logger)
+    if cache is not None:
+        cache[('article', article_id)] = article
+    return article
+
+
+def load_book(book_id):
+    cache = _request_entity_cache()
+    if cache is not None and ('book', book_id) in cache:
+        return cache[('book', book_id)]
+    book = db_manager.get_book_by_id(book_id, app_logger=app.logger)
+    if cache is not None:
+        cache[('book', book_id)] = book
+    return book
+
+
+@app.teardown_appcontext
+def release_db_connection(exception=None):
+    # Connections are pooled per thread (see db_manager.get_db_connection); just make sure a
+    # failed request does not leave a transaction open on this thread's connection.
+    db_manager.release_thread_connection()
+
+
 def allowed_text_file(filename):
     return '.' in filename and \
            filename.rsplit('.', 1)[1].lower() in ALLOWED_TEXT_EXTENSIONS
@@ -95,9 +325,29 @@ def _ensure_dirs_exist():
         os.makedirs(app.config['CONVERTED_AUDIO_FOLDER'])
     if not os.path.exists(app.config['MP3_PARTS_FOLDER']):
         os.makedirs(app.config['MP3_PARTS_FOLDER'])
+    if not os.path.exists(app.config['HLS_FOLDER']):
+        os.makedirs(app.config['HLS_FOLDER'])
+    if not os.path.exists(app.config['AUDIO_RENDITIONS_FOLDER']):
+        os.makedirs(app.config['AUDIO_RENDITIONS_FOLDER'])
+    if not os.path.exists(app.config['UPLOAD_SESSIONS_FOLDER']):
+        os.makedirs(app.config['UPLOAD_SESSIONS_FOLDER'])
 
 _ensure_dirs_exist()
 
+def _audio_file_from_request():
+    """
+    Audio sent with an upload form: a finished chunked upload named by audio_upload_id, else the
+    multipart audio_file. Both have .filename and .save(path). None if the form has neither.
+    """
+    upload_id = request.form.get('audio_upload_id', '').strip()
+    if upload_id:
+        completed_upload = chunked_upload.claim_completed_upload(upload_id, logger=app.logger)
+        if not completed_upload:
+            flash('The uploaded audio file is incomplete or has expired. Please upload it again.', 'warning')
+            app.logger.warning(f"APP: Audio upload {upload_id} is unknown, incomplete or failed its checksum.")
+        return completed_upload
+    return request.files.get('audio_file')
+
 def _process_audio_alignment(article_id,
                              audio_file_storage,
                              original_bilingual_text_content_string,
@@ -110,12 +360,11 @@ def _process_audio_alignment(article_id,
     
     try:
         # --- Path Generation for Converted Audio and MP3 Parts ---
-        article_data_for_paths = db_manager.get_article_by_id(article_id, app_logger=app.logger)
+        article_data_for_paths, book_data_for_paths, _ = load_article_with_book(article_id)
         if not article_data_for_paths or not article_data_for_paths['book_id']:
             app.logger.error(f"APP: _process_audio_alignment: Cannot determine book for article {article_id} to create descriptive audio/SRT paths.")
             flash("Error: Could not find book information for this article. Cannot create descriptive audio/SRT paths.", "danger")
             return None
-        book_data_for_paths = db_manager.get_book_by_id(article_data_for_paths['book_id'], app_logger=app.logger)
         if not book_data_for_paths:
             app.logger.error(f"APP: _process_audio_alignment: Book data not found for book_id {article_data_for_paths['book_id']} (article {article_id}).")
             flash(f"Error: Book (ID: {article_data_for_paths['book_id']}) not found. Cannot create descriptive audio/SRT paths.", "danger")
@@ -154,7 +403,10 @@ def _process_audio_alignment(article_id,
             )
             app.logger.info(f"APP: Converted audio stored persistently at: {converted_mp3_path_str} for article {article_id}")
             
-            db_manager.update_article_converted_mp3_path(article_id, converted_mp3_path_str, app_logger=app.logger)
+            # convert_to_mp3 recorded the file's metadata, fingerprint included
+            db_manager.update_article_converted_mp3_path(article_id, converted_mp3_path_str,
+                                                         fingerprint=_recorded_audio_fingerprint(converted_mp3_path_str),
+                                                         app_logger=app.logger)
 
             english_sentences_list_for_aeneas = []
             if original_bilingual_text_content_string:
@@ -251,24 +503,25 @@ def _process_audio_alignment(article_id,
                             'original_end_ms': srt_timestamps[i][1]
                         })
                     
-                    base_mp3_parts_dir_for_article.mkdir(parents=True, exist_ok=True)
-
                     split_details = audio_processor.split_mp3_by_size_estimation(
                         original_mp3_path=converted_mp3_path_str,
                         sentences_info=sentences_info_for_splitting,
                         max_part_size_bytes=app.config['MAX_AUDIO_PART_SIZE_MB'] * 1024 * 1024,
                         output_parts_dir=str(base_mp3_parts_dir_for_article),
                         article_filename_base=article_safe_title, # Use article_safe_title
-                        logger=app.logger
+                        logger=app.logger,
+                        materialize_parts=app.config['AUDIO_PARTS_MODE'] != 'virtual'
                     )
 
                     if split_details and split_details['num_parts'] > 0:
                         part_checksums_list = split_details.get('part_checksums', [])
                         db_manager.update_article_mp3_parts_info(
                             article_id,
-                            str(base_mp3_parts_dir_for_article),
+                            str(base_mp3_parts_dir_for_article) if split_details['parts_materialized'] else None,
                             split_details['num_parts'],
                             part_checksums_list,
+                            part_byte_ranges_list=None if split_details['parts_materialized'] else split_details['part_byte_ranges'],
+                            part_fingerprints_list=split_details['part_fingerprints'],
                             app_logger=app.logger
                         )
                         db_manager.batch_update_sentence_part_details(split_details['sentence_part_updates'], app_logger=app.logger)
@@ -281,6 +534,20 @@ def _process_audio_alignment(article_id,
                     else: 
                         app.logger.info(f"APP: Aeneas MP3 for article {article_id} not split (either too small or splitting not applicable). Clearing previous part info.")
                         db_manager.clear_article_mp3_parts_info(article_id, app_logger=app.logger)
+
+                    if app.config['HLS_OUTPUT_ENABLED']:
+                        audio_processor.generate_hls_output_for_article(
+                            article_id, converted_mp3_path_str, sentences_info_for_splitting,
+                            str(Path(app.config['HLS_FOLDER']) / book_safe_title / article_safe_title),
+                            app.config['HLS_SEGMENT_DURATION_S'], logger=app.logger
+                        )
+
+                    if app.config['AUDIO_ENCODING_PROFILES_ENABLED']:
+                        # Encode from the uploaded original, not from the converted MP3
+                        audio_processor.process_audio_renditions(
+                            article_id, str(original_audio_temp_path), sentences_info_for_splitting, app.config,
+                            book_safe_title, article_safe_title, logger=app.logger
+                        )
             
             return bilingual_srt_generated_path_str
     except Exception as e:
@@ -321,7 +588,7 @@ def list_books_page():
 @app.route('/book/<int:book_id>', methods=['GET', 'POST'])
 def book_detail_page(book_id):
     # ... (GET part and initial POST checks for book, text_file are the same) ...
-    book = db_manager.get_book_by_id(book_id)
+    book = load_book(book_id)
     if not book:
         flash('Book not found.', 'danger')
         app.logger.warning(f"APP: Book ID {book_id} not found for viewing.")
@@ -413,8 +680,8 @@ def book_detail_page(book_id):
                 if tts_result and tts_result.get("message"):
                     flash(tts_result["message"], tts_result.get("message_category", "info"))
 
-            elif 'audio_file' in request.files: 
-                audio_file = request.files['audio_file']
+            elif 'audio_file' in request.files or request.form.get('audio_upload_id'): 
+                audio_file = _audio_file_from_request()
                 if audio_file and audio_file.filename != '':
                     if allowed_audio_file(audio_file.filename):
                         app.logger.info(f"APP: Processing Aeneas audio alignment for article ID {article_id_processed}...")
@@ -456,16 +723,99 @@ def book_detail_page(book_id):
                            currently_reading_article_id=currently_reading_article_id)
 
 
+BOOK_EXPORT_AUDIO_MODES = ('full', 'parts', 'none')
+
+
+def _zip_member_name(name):
+    """A title usable as one ZIP path component; unlike secure_filename it keeps Chinese characters."""
+    return re.sub(r'[\\/:*?"<>|\x00-\x1f]', '_', name).strip(' .') or 'untitled'
+
+
+def _article_export_audio_files(article, audio_mode):
+    """(name, path, (start, end) byte range) of each audio file a book export includes for an article."""
+    if audio_mode == 'none':
+        return []
+    stem = _zip_member_name(article['filename'])
+    full_mp3_path = Path(article['converted_mp3_path']) if article['converted_mp3_path'] else None
+    if audio_mode == 'parts' and article['num_audio_parts']:
+        part_names = [f"{stem}_part_{i + 1}.mp3" for i in range(article['num_audio_parts'])]
+        byte_ranges = [_virtual_part_byte_range(article, i) for i in range(article['num_audio_parts'])]
+        if all(byte_ranges) and full_mp3_path and full_mp3_path.is_file():
+            return [(name, full_mp3_path, byte_range) for name, byte_range in zip(part_names, byte_ranges)]
+        if article['mp3_parts_folder_path']:
+            part_paths = [_mp3_part_path(article, i) for i in range(article['num_audio_parts'])]
+            if all(p.is_file() for p in part_paths):
+                return [(name, p, (0, p.stat().st_size)) for name, p in zip(part_names, part_paths)]
+        app.logger.warning(f"APP: Book export: parts of article {article['id']} are missing; exporting its full MP3 instead.")
+    if full_mp3_path and full_mp3_path.is_file():
+        return [(f"{stem}.mp3", full_mp3_path, (0, full_mp3_path.stat().st_size))]
+    return []
+
+
+def _iter_book_export_members(book, articles, audio_mode):
+    """
+    ZIP members of a book export, produced lazily: per article a folder with its audio (stored, not
+    deflated), the bilingual text, and when timed an SRT and a timings JSON; then manifest.json
+    describing what was written.
+    """
+    manifest = {'book_id': book['id'], 'title': book['title'], 'exported_at': datetime.now().isoformat(timespec='seconds'),
+                'audio': audio_mode, 'articles': []}
+    for number, article in enumerate(articles, start=1):
+        stem = _zip_member_name(article['filename'])
+        folder = f"{number:02d} {stem}"
+        entry = {'article_id': article['id'], 'title': article['filename'], 'audio': [],
+                 'text': f"{folder}/{stem}.txt", 'subtitles': None, 'timings': None}
+
+        for name, path, (start_byte, end_byte) in _article_export_audio_files(article, audio_mode):
+            entry['audio'].append(f"{folder}/{name}")
+            yield zip_stream.ZipMember(f"{folder}/{name}", mp3_index.iter_file_range(str(path), start_byte, end_byte),
+                                       stored=True, size=end_byte - start_byte, mtime=path.stat().st_mtime)
+        yield zip_stream.ZipMember(entry['text'], text_parser.iter_bilingual_file_content(
+            db_manager.iter_article_sentences(article['id'], app_logger=app.logger)))
+        if db_manager.article_has_sentence_timestamps(article['id'], app_logger=app.logger):
+            entry['subtitles'] = f"{folder}/{stem}.srt"
+            entry['timings'] = f"{folder}/{stem}.timings.json"
+            yield zip_stream.ZipMember(entry['subtitles'], subtitles.iter_srt(
+                db_manager.iter_article_sentences(article['id'], app_logger=app.logger)))
+            yield zip_stream.ZipMember(entry['timings'], subtitles.iter_json_timings(
+                db_manager.iter_article_sentences(article['id'], app_logger=app.logger),
+                header={'article_id': article['id']}))
+        manifest['articles'].append(entry)
+    yield zip_stream.ZipMember('manifest.json', [json.dumps(manifest, ensure_ascii=False, indent=2)])
+
+
+@app.route('/book/<int:book_id>/export.zip')
+def export_book(book_id):
+    """
+    The whole book as a ZIP for offline use (?audio=full|parts|none), generated while it is sent:
+    the download starts at once, nothing is staged on disk and memory stays constant whatever its size.
+    """
+    audio_mode = request.args.get('audio', 'full')
+    if audio_mode not in BOOK_EXPORT_AUDIO_MODES:
+        flash(f"Unknown audio option '{audio_mode}'.", 'warning')
+        return redirect(url_for('book_detail_page', book_id=book_id))
+    book = load_book(book_id)
+    if not book:
+        flash('Book not found.', 'danger')
+        app.logger.warning(f"APP: Book export: Book ID {book_id} not found.")
+        return redirect(url_for('list_books_page'))
+
+    articles = db_manager.get_articles_for_book(book_id, app_logger=app.logger)
+    app.logger.info(f"APP: Streaming export of book ID {book_id} ({len(articles)} articles, audio={audio_mode})")
+    members = _iter_book_export_members(book, articles, audio_mode)
+    response = Response(stream_with_context(zip_stream.iter_zip(members)), mimetype='application/zip')
+    response.headers.set('Content-Disposition', 'attachment', filename=f"{secure_filename(book['title']) or f'book_{book_id}'}.zip")
+    return response
+
+
 @app.route('/article/<int:article_id>/align_audio', methods=['GET', 'POST'])
 def align_audio_for_article(article_id):
-    article = db_manager.get_article_by_id(article_id)
+    article, book, _ = load_article_with_book(article_id)
     if not article:
         flash('Article not found.', 'danger')
         app.logger.warning(f"APP: Attempt to align audio for non-existent article ID: {article_id}")
         return redirect(url_for('list_books_page'))
     
-    book = db_manager.get_book_by_id(article['book_id']) if article['book_id'] else None
-    
     article_title_from_db = article['filename'] 
     article_safe_stem_for_files = secure_filename(article_title_from_db)
     
@@ -492,12 +842,12 @@ def align_audio_for_article(article_id):
         
         # Else (TTS not checked), proceed with Aeneas audio file upload
         else: 
-            if 'audio_file' not in request.files:
+            if 'audio_file' not in request.files and not request.form.get('audio_upload_id'):
                 flash('No audio file part (and "Use TTS" was not selected).', 'danger')
                 return redirect(url_for('align_audio_for_article', article_id=article_id))
             
-            audio_file = request.files['audio_file']
-            if audio_file.filename == '':
+            audio_file = _audio_file_from_request()
+            if not audio_file or audio_file.filename == '':
                 flash('No audio file selected (and "Use TTS" was not selected).', 'danger')
                 return redirect(url_for('align_audio_for_article', article_id=article_id))
 
@@ -522,66 +872,172 @@ def align_audio_for_article(article_id):
     return render_template('align_audio.html', article_id=article_id, article_filename=article_title_from_db, book=book)
 
 
+# --- Resumable chunked audio uploads (protocol in chunked_upload.py) ---
+
+def _upload_status(session):
+    return {'status': 'success', 'upload_id': session['id'], 'filename': session['filename'],
+            'size': session['total_size'], 'offset': session['received_bytes'],
+            'complete': session['received_bytes'] == session['total_size'],
+            'chunk_size': app.config['UPLOAD_CHUNK_BYTES']}
+
+
+def _upload_error(message, status, offset=None):
+    body = {'status': 'error', 'message': message}
+    if offset is not None:
+        body['offset'] = offset
+    return jsonify(body), status
+
+
+@app.route('/uploads', methods=['POST'])
+def create_audio_upload():
+    """JSON {filename, size[, sha256]} -> 201 with upload_id, offset 0 and the chunk size to use."""
+    data = request.get_json(silent=True) or {}
+    filename = str(data.get('filename') or '')
+    size = data.get('size')
+    sha256 = data.get('sha256')
+    if not allowed_audio_file(filename):
+        return _upload_error(f'Invalid audio file type: "{filename}". Supported: {ALLOWED_AUDIO_EXTENSIONS}', 400)
+    if not isinstance(size, int) or isinstance(size, bool) or size <= 0:
+        return _upload_error('A positive integer "size" is required.', 400)
+    if size > app.config['UPLOAD_MAX_AUDIO_BYTES']:
+        return _upload_error(f"File is larger than the {app.config['UPLOAD_MAX_AUDIO_BYTES']} byte limit.", 413)
+    if sha256 is not None and not (isinstance(sha256, str) and re.fullmatch(r'[0-9a-fA-F]{64}', sha256)):
+        return _upload_error('"sha256" must be 64 hex digits.', 400)
+
+    chunked_upload.purge_stale_uploads(app.config['UPLOAD_SESSION_TTL_S'], logger=app.logger)
+    session = chunked_upload.create_upload(filename, size, app.config['UPLOAD_SESSIONS_FOLDER'],
+                                           sha256=sha256, logger=app.logger)
+    app.logger.info(f"APP: Started chunked upload {session['id']} for '{filename}' ({size} bytes).")
+    return jsonify(_upload_status(session)), 201
+
+
+@app.route('/uploads/<upload_id>', methods=['GET'])
+def get_audio_upload(upload_id):
+    """Current offset of an upload, for resuming it."""
+    session = chunked_upload.get_upload(upload_id, logger=app.logger)
+    if not session:
+        return _upload_error('Unknown or expired upload.', 404)
+    return jsonify(_upload_status(session))
+
+
+@app.route('/uploads/<upload_id>', methods=['PUT'])
+def put_audio_upload_chunk(upload_id):
+    """
+    Raw chunk bytes as the body, written at the Upload-Offset header; X-Chunk-SHA256 (hex) is checked
+    if present. Answers with the new offset, or 409 and the current offset if Upload-Offset is stale.
+    """
+    try:
+        offset = int(request.headers.get('Upload-Offset', ''))
+    except ValueError:
+        return _upload_error('An integer Upload-Offset header is required.', 400)
+    length = request.content_length
+    if length is None:
+        return _upload_error('Content-Length is required.', 411)
+    if offset < 0 or length <= 0:
+        return _upload_error('Upload-Offset must be >= 0 and the chunk non-empty.', 400)
+    if length > app.config['UPLOAD_CHUNK_BYTES']:
+        return _upload_error(f"Chunks may be at most {app.config['UPLOAD_CHUNK_BYTES']} bytes.", 413)
+    try:
+        new_offset = chunked_upload.write_chunk(upload_id, offset, request.stream, length,
+                                                chunk_sha256=request.headers.get('X-Chunk-SHA256'), logger=app.logger)
+    except chunked_upload.UploadError as e:
+        app.logger.warning(f"APP: Rejected chunk at {offset} for upload {upload_id}: {e}")
+        return _upload_error(str(e), e.status, e.offset)
+    session = chunked_upload.get_upload(upload_id, logger=app.logger)
+    return jsonify(_upload_status(session) if session else {'status': 'success', 'upload_id': upload_id, 'offset': new_offset})
+
+
+@app.route('/uploads/<upload_id>', methods=['DELETE'])
+def delete_audio_upload(upload_id):
+    if not chunked_upload.abort_upload(upload_id, logger=app.logger):
+        return _upload_error('Unknown or expired upload.', 404)
+    return jsonify({'status': 'success'})
+
+
 # ... (view_article, save_reading_location, download_mp3_for_article, serve_mp3_part remain unchanged)
 
 @app.route('/article/<int:article_id>')
 def view_article(article_id):
     # ... (no change)
     app.logger.debug(f"APP: Attempting to view article ID: {article_id}")
-    article_data = db_manager.get_article_by_id(article_id) 
+    article_data, book, reading_location_from_db = load_article_with_book(article_id)
     if not article_data:
         flash('Article not found.', 'danger')
         app.logger.warning(f"APP: Article ID {article_id} not found for viewing.")
         return redirect(url_for('list_books_page'))
 
-    book = None
-    if article_data['book_id']:
-        book = db_manager.get_book_by_id(article_data['book_id'])
     if not book and article_data['book_id']: 
         app.logger.warning(f"APP: Book ID {article_data['book_id']} for article {article_id} not found. Article might be orphaned.")
         flash(f"Warning: The book associated with article '{article_data['filename']}' could not be found.", "warning")
 
     article_filename = article_data['filename']
-    try:
-        sentences_from_db = db_manager.get_sentences_for_article(article_id)
-    except Exception as e:
-        app.logger.error(f"APP: Error fetching sentences for article {article_id} ('{article_filename}'): {e}", exc_info=True)
-        flash(f"Error retrieving content for article '{article_filename}'.", "danger")
-        return redirect(url_for('list_books_page')) 
-    
-    structured_article_content = []
-    current_paragraph_db_index = -1 
-    current_paragraph_sentences = []
-    has_timestamps = False 
-
-    for sentence_row in sentences_from_db:
-        if sentence_row['paragraph_index'] != current_paragraph_db_index:
-            if current_paragraph_sentences:
-                structured_article_content.append(current_paragraph_sentences)
-            current_paragraph_sentences = []
-            current_paragraph_db_index = sentence_row['paragraph_index']
-        
-        sentence_pair = {
-            'english': sentence_row['english_text'],
-            'chinese': sentence_row['chinese_text'],
-            'start_time_ms': sentence_row['start_time_ms'],
-            'end_time_ms': sentence_row['end_time_ms'],
-            'paragraph_index': sentence_row['paragraph_index'], 
-            'sentence_index_in_paragraph': sentence_row['sentence_index_in_paragraph'],
-            'audio_part_index': sentence_row['audio_part_index'], 
-            'start_time_in_part_ms': sentence_row['start_time_in_part_ms'], 
-            'end_time_in_part_ms': sentence_row['end_time_in_part_ms'] 
-        }
-        current_paragraph_sentences.append(sentence_pair)
-        
-        if sentence_row['start_time_ms'] is not None and sentence_row['end_time_ms'] is not None:
-            has_timestamps = True
-            
-    if current_paragraph_sentences: 
-        structured_article_content.append(current_paragraph_sentences)
-    
-    reading_location_from_db = db_manager.get_reading_location(article_id, app_logger=app.logger)
     reading_location_for_template = dict(reading_location_from_db) if reading_location_from_db else None
+    # Sentence markup is cached per content version: hot articles render from memory and a reprocessed
+    # article gets a new version. Windowed (long) articles depend on the anchor and aren't cached.
+    content_cache_key = (article_id, article_data['content_version'])
+    cached_content = _article_content_cache.get(content_cache_key)
+    sentence_window = None
+    if cached_content:
+        has_timestamps, article_content_html = cached_content
+    else:
+        window_size = app.config['ARTICLE_WINDOW_SENTENCES']
+        packed_timings = None
+        try:
+            if db_manager.get_sentence_count_for_article(article_id, app_logger=app.logger) > window_size:
+                # Long article: render only a window around the linked sentence or the reading location
+                anchor = None
+                if request.args.get('p', type=int) is not None and request.args.get('s', type=int) is not None:
+                    anchor = (request.args.get('p', type=int), request.args.get('s', type=int))
+                elif reading_location_from_db:
+                    anchor = (reading_location_from_db['paragraph_index'], reading_location_from_db['sentence_index_in_paragraph'])
+                sentences_from_db, has_before, has_after = _load_sentence_window(article_id, anchor, window_size)
+                sentence_window = {'has_before': has_before, 'has_after': has_after, 'size': window_size}
+            else:
+                # Prefer the packed timing arrays: only the text columns come through sqlite3.Row then.
+                packed_timings = db_manager.get_packed_sentence_timings(article_id, app_logger=app.logger)
+                if packed_timings:
+                    sentences_from_db = db_manager.get_sentence_texts_for_article(article_id, app_logger=app.logger)
+                    if len(sentences_from_db) != packed_timings[0]:
+                        app.logger.warning(f"APP: Packed timings for article {article_id} are out of date, using the sentence rows.")
+                        packed_timings = None
+                if not packed_timings:
+                    sentences_from_db = db_manager.get_sentences_for_article(article_id)
+        except Exception as e:
+            app.logger.error(f"APP: Error fetching sentences for article {article_id} ('{article_filename}'): {e}", exc_info=True)
+            flash(f"Error retrieving content for article '{article_filename}'.", "danger")
+            return redirect(url_for('list_books_page')) 
+
+        structured_article_content = []
+        current_paragraph_db_index = -1 
+        current_paragraph_sentences = []
+        has_timestamps = False 
+
+        for i, sentence_row in enumerate(sentences_from_db):
+            if packed_timings:
+                timing = {field: (None if values[i] == db_manager.PACKED_TIMING_NULL else values[i])
+                          for field, values in packed_timings[1].items()}
+            else:
+                timing = sentence_row
+            if sentence_row['paragraph_index'] != current_paragraph_db_index:
+                if current_paragraph_sentences:
+                    structured_article_content.append(current_paragraph_sentences)
+                current_paragraph_sentences = []
+                current_paragraph_db_index = sentence_row['paragraph_index']
+
+            sentence_pair = _sentence_pair(sentence_row, timing)
+            current_paragraph_sentences.append(sentence_pair)
+
+            if timing['start_time_ms'] is not None and timing['end_time_ms'] is not None:
+                has_timestamps = True
+
+        if current_paragraph_sentences: 
+            structured_article_content.append(current_paragraph_sentences)
+        if sentence_window and not has_timestamps:
+            has_timestamps = db_manager.article_has_sentence_timestamps(article_id, app_logger=app.logger)
+        article_content_html = Markup(render_template('_article_content.html', article=article_data,
+                                                      structured_article=structured_article_content))
+        if not sentence_window:
+            _article_content_cache.put(content_cache_key, (has_timestamps, article_content_html), len(article_content_html))
 
     article_audio_part_checksums_str = None
     try:
@@ -593,55 +1049,262 @@ def view_article(article_id):
     app.logger.debug(f"APP: Rendering article.html for ID {article_id}. `has_timestamps` is: {has_timestamps}. Reading location: {reading_location_for_template}")
     app.logger.debug(f"APP: Article data for template: num_audio_parts={article_data['num_audio_parts']}, mp3_parts_folder_path='{article_data['mp3_parts_folder_path']}', audio_part_checksums='{str(article_audio_part_checksums_str)[:30] if article_audio_part_checksums_str else 'None'}...'")
     
+    audio_part_fingerprints = _split_per_part_values(article_data['audio_part_fingerprints'])
+    if not article_data['num_audio_parts'] and article_data['converted_mp3_path']:
+        whole_file_fingerprint = article_data['converted_mp3_fingerprint']
+        audio_part_fingerprints = [whole_file_fingerprint] if whole_file_fingerprint else []
+
+    audio_renditions = [
+        {'profile': r['profile'], 'size_bytes': r['size_bytes'],
+         'label': app.config['AUDIO_ENCODING_PROFILES'].get(r['profile'], {}).get('label', r['profile'])}
+        for r in db_manager.get_audio_renditions_for_article(article_id, app_logger=app.logger)
+    ]
+
     return render_template('article.html',
                            article=article_data, 
                            book=book, 
-                           structured_article=structured_article_content,
+                           article_content_html=article_content_html,
                            has_timestamps=has_timestamps,
                            reading_location=reading_location_for_template,
-                           article_audio_part_checksums=article_audio_part_checksums_str)
+                           article_audio_part_checksums=article_audio_part_checksums_str,
+                           audio_part_fingerprints=audio_part_fingerprints,
+                           audio_renditions=audio_renditions,
+                           sentence_window=sentence_window)
+
+
+def _split_per_part_values(joined):
+    """Stored "a;b;c" per-part checksums/fingerprints -> list ([] for NULL)."""
+    return joined.split(db_manager.AUDIO_PART_CHECKSUM_DELIMITER) if joined else []
+
+
+def _recorded_audio_fingerprint(audio_path):
+    """Sampled fingerprint recorded in audio_metadata for a file we produced, if it still matches the file."""
+    try:
+        path = Path(audio_path).resolve()
+        stat = path.stat()
+    except OSError:
+        return None
+    metadata = db_manager.get_audio_metadata(str(path), app_logger=app.logger)
+    if not metadata or metadata['size_bytes'] != stat.st_size or metadata['mtime_ns'] != stat.st_mtime_ns:
+        return None
+    return metadata['content_fingerprint']
+
+
+class _ArticleVersionCache:
+    """
+    Thread-safe LRU of content generated from one version of an article, keyed by tuples that start
+    with (article_id, content_version). Bounded by the total size of the entries (app.config[max_size_key]);
+    storing an entry drops the article's entries for older versions, which can't be requested again.
+    """
+
+    def __init__(self, max_size_key):
+        self.max_size_key = max_size_key
+        self._entries = OrderedDict() # key -> (size, value)
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            self._entries.move_to_end(key)
+            return entry[1]
+
+    def put(self, key, value, size):
+        max_size = app.config[self.max_size_key]
+        if size > max_size:
+            return
+        with self._lock:
+            for stale_key in [k for k in self._entries if k[0] == key[0] and k[1] != key[1]]:
+                self._size -= self._entries.pop(stale_key)[0]
+            if key in self._entries:
+                return
+            self._entries[key] = (size, value)
+            self._size += size
+            while self._size > max_size:
+                _, (evicted_size, _) = self._entries.popitem(last=False)
+                self._size -= evicted_size
+
+    def stream_into(self, key, chunks):
+        """
+        Yields the chunks (str) UTF-8 encoded, copying them aside as they go; once the stream has
+        completed the whole output is stored under key, unless it outgrew the size bound on the way.
+        """
+        max_size = app.config[self.max_size_key]
+        copied, size = [], 0
+        for chunk in chunks:
+            data = chunk.encode('utf-8')
+            if copied is not None:
+                size += len(data)
+                if size <= max_size:
+                    copied.append(data)
+                else:
+                    copied = None
+            yield data
+        if copied is not None:
+            self.put(key, b''.join(copied), size)
+
+
+_article_content_cache = _ArticleVersionCache('ARTICLE_CONTENT_CACHE_MAX_CHARS') # -> (has_timestamps, html)
+_subtitle_cache = _ArticleVersionCache('SUBTITLE_CACHE_MAX_BYTES') # -> encoded subtitle file
+
+
+def _sentence_pair(sentence_row, timing):
+    """Template/JSON shape of one sentence. timing: any mapping with the five timing fields (often sentence_row itself)."""
+    return {
+        'english': sentence_row['english_text'],
+        'chinese': sentence_row['chinese_text'],
+        'start_time_ms': timing['start_time_ms'],
+        'end_time_ms': timing['end_time_ms'],
+        'paragraph_index': sentence_row['paragraph_index'], 
+        'sentence_index_in_paragraph': sentence_row['sentence_index_in_paragraph'],
+        'audio_part_index': timing['audio_part_index'], 
+        'start_time_in_part_ms': timing['start_time_in_part_ms'], 
+        'end_time_in_part_ms': timing['end_time_in_part_ms'] 
+    }
+
+
+def _load_sentence_window(article_id, anchor, size):
+    """
+    Up to size sentences in reading order: from the start of the article if anchor is None, else about half
+    before and half from the (paragraph_index, sentence_index_in_paragraph) anchor.
+    Returns (rows, has_before, has_after).
+    """
+    if anchor is None:
+        rows = db_manager.get_sentence_window(article_id, limit=size + 1, app_logger=app.logger)
+        return rows[:size], False, len(rows) > size
+    before_limit = size // 2
+    after_limit = size - before_limit
+    rows_before = db_manager.get_sentence_window(article_id, before=anchor, limit=before_limit + 1, app_logger=app.logger)
+    rows_after = db_manager.get_sentence_window(article_id, start=anchor, limit=after_limit + 1, app_logger=app.logger)
+    has_before = len(rows_before) > before_limit
+    has_after = len(rows_after) > after_limit
+    return (rows_before[1:] if has_before else rows_before) + rows_after[:after_limit], has_before, has_after
+
+
+def _parse_sentence_key(value):
+    """'<paragraph_index>:<sentence_index_in_paragraph>' -> tuple of ints, or None."""
+    try:
+        paragraph_index, sentence_index = value.split(':')
+        return int(paragraph_index), int(sentence_index)
+    except (AttributeError, ValueError):
+        return None
+
+
+@app.route('/article/<int:article_id>/sentences')
+def get_article_sentences(article_id):
+    """
+    Keyset-paginated sentences for windowed rendering. Exactly one of
+    after=<p>:<s> (the next sentences), before=<p>:<s> (the previous ones) or around=<p>:<s>;
+    limit defaults to and is capped at ARTICLE_WINDOW_SENTENCES.
+    """
+    max_limit = app.config['ARTICLE_WINDOW_SENTENCES']
+    limit = min(max(request.args.get('limit', max_limit, type=int), 1), max_limit)
+    keys = {name: _parse_sentence_key(request.args[name]) for name in ('after', 'before', 'around') if name in request.args}
+    if len(keys) != 1 or None in keys.values():
+        return jsonify({'status': 'error', 'message': "Pass exactly one of after, before or around as '<paragraph>:<sentence>'."}), 400
+    direction, key = keys.popitem()
+
+    if direction == 'around':
+        rows, has_before, has_after = _load_sentence_window(article_id, key, limit)
+    elif direction == 'after':
+        rows = db_manager.get_sentence_window(article_id, start=(key[0], key[1] + 1), limit=limit + 1, app_logger=app.logger)
+        has_before, has_after = True, len(rows) > limit
+        rows = rows[:limit]
+    else:
+        rows = db_manager.get_sentence_window(article_id, before=key, limit=limit + 1, app_logger=app.logger)
+        has_before, has_after = len(rows) > limit, True
+        rows = rows[1:] if has_before else rows
+    return jsonify({
+        'status': 'success',
+        'has_before': has_before,
+        'has_after': has_after,
+        'sentences': [_sentence_pair(r, r) for r in rows],
+    })
+
+
+def _parse_location_indices(data):
+    """(paragraph_index, sentence_index_in_paragraph) from a JSON object, or None if missing/invalid."""
+    if not isinstance(data, dict) or 'paragraph_index' not in data or 'sentence_index_in_paragraph' not in data:
+        return None
+    try:
+        return int(data['paragraph_index']), int(data['sentence_index_in_paragraph'])
+    except (ValueError, TypeError):
+        return None
 
 
 @app.route('/article/<int:article_id>/save_location', methods=['POST'])
 def save_reading_location(article_id):
-    # ... (no change)
-    article = db_manager.get_article_by_id(article_id)
-    if not article:
+    book_id_for_location = db_manager.get_article_book_ids([article_id], app_logger=app.logger).get(article_id, 0)
+    if book_id_for_location == 0:
         app.logger.warning(f"APP: Attempt to save reading location for non-existent article ID: {article_id}")
         return jsonify({'status': 'error', 'message': 'Article not found'}), 404
     
-    if not article['book_id']:
-        app.logger.error(f"APP: Cannot save reading location for article {article_id} (title: '{article['filename']}') as it has no associated book_id.")
+    if not book_id_for_location:
+        app.logger.error(f"APP: Cannot save reading location for article {article_id} as it has no associated book_id.")
         return jsonify({'status': 'error', 'message': 'Article is not associated with a book.'}), 400
     
-    book_id_for_location = article['book_id']
-    data = request.get_json()
-    if not data or 'paragraph_index' not in data or 'sentence_index_in_paragraph' not in data:
+    data = request.get_json(silent=True)
+    indices = _parse_location_indices(data)
+    if indices is None:
         app.logger.warning(f"APP: Invalid data for saving reading location for article {article_id}: {data}")
-        return jsonify({'status': 'error', 'message': 'Missing paragraph or sentence index'}), 400
-        
-    p_idx = data.get('paragraph_index')
-    s_idx = data.get('sentence_index_in_paragraph')
-
-    try:
-        p_idx = int(p_idx)
-        s_idx = int(s_idx)
-    except (ValueError, TypeError):
-        app.logger.warning(f"APP: Invalid index types for saving reading location for article {article_id}: P:{p_idx}, S:{s_idx}")
-        return jsonify({'status': 'error', 'message': 'Invalid index types'}), 400
+        return jsonify({'status': 'error', 'message': 'Missing or invalid paragraph or sentence index'}), 400
+    p_idx, s_idx = indices
 
     try:
-        db_manager.set_reading_location(article_id, book_id_for_location, p_idx, s_idx, app_logger=app.logger)
-        app.logger.info(f"APP: Successfully saved reading location for article {article_id} (book {book_id_for_location}) at P:{p_idx}, S:{s_idx}.")
+        db_manager.buffer_reading_location(article_id, book_id_for_location, p_idx, s_idx, app_logger=app.logger)
+        app.logger.debug(f"APP: Saved reading location for article {article_id} (book {book_id_for_location}) at P:{p_idx}, S:{s_idx}.")
         return jsonify({'status': 'success', 'message': 'Reading location saved.'})
     except Exception as e:
         app.logger.error(f"APP: Failed to save reading location for article {article_id} (book {book_id_for_location}): {e}", exc_info=True)
         return jsonify({'status': 'error', 'message': f'Failed to save location: {str(e)}'}), 500
 
+
+@app.route('/reading_locations', methods=['POST'])
+def save_reading_locations_batch():
+    """
+    Several positions in one request: {"locations": [{"article_id", "paragraph_index", "sentence_index_in_paragraph"}, ...]}.
+    Later entries for the same article win. Responds with the article ids saved and those rejected.
+    """
+    data = request.get_json(silent=True)
+    locations = data.get('locations') if isinstance(data, dict) else None
+    if not isinstance(locations, list) or not locations:
+        return jsonify({'status': 'error', 'message': 'Expected a non-empty "locations" list.'}), 400
+    if len(locations) > app.config['READING_LOCATIONS_MAX_BATCH']:
+        return jsonify({'status': 'error', 'message': f"At most {app.config['READING_LOCATIONS_MAX_BATCH']} locations per request."}), 400
+
+    latest, rejected = {}, []
+    for location in locations:
+        indices = _parse_location_indices(location)
+        try:
+            article_id = int(location['article_id'])
+        except (KeyError, ValueError, TypeError):
+            article_id = None
+        if indices is None or article_id is None:
+            rejected.append({'location': location, 'reason': 'invalid'})
+            continue
+        latest[article_id] = indices
+
+    book_ids = db_manager.get_article_book_ids(latest.keys(), app_logger=app.logger)
+    saved = []
+    try:
+        for article_id, (p_idx, s_idx) in latest.items():
+            if not book_ids.get(article_id):
+                rejected.append({'article_id': article_id, 'reason': 'article not found or not in a book'})
+                continue
+            db_manager.buffer_reading_location(article_id, book_ids[article_id], p_idx, s_idx, app_logger=app.logger)
+            saved.append(article_id)
+    except Exception as e:
+        app.logger.error(f"APP: Failed to save batched reading locations: {e}", exc_info=True)
+        return jsonify({'status': 'error', 'message': f'Failed to save locations: {str(e)}', 'saved': saved}), 500
+    app.logger.debug(f"APP: Saved {len(saved)} batched reading locations, rejected {len(rejected)}.")
+    return jsonify({'status': 'success', 'saved': saved, 'rejected': rejected})
+
 @app.route('/article/<int:article_id>/download_mp3')
 def download_mp3_for_article(article_id):
     # ... (no change)
-    article = db_manager.get_article_by_id(article_id)
+    article = load_article(article_id)
     if not article:
         flash('Article not found.', 'danger')
         app.logger.warning(f"APP: Download MP3: Article ID {article_id} not found.")
@@ -665,34 +1328,427 @@ def download_mp3_for_article(article_id):
     download_name = f"{original_text_filename_stem}.mp3"
 
     app.logger.info(f"APP: Serving MP3 file: {filename} from dir: {directory} for article ID {article_id} as {download_name}")
-    return send_from_directory(directory, filename, as_attachment=True, download_name=download_name)
+    # conditional=True answers Range requests with 206 and If-None-Match/If-Modified-Since with 304.
+    # The full MP3 is rewritten in place on re-processing, so browsers must revalidate it.
+    response = send_from_directory(directory, filename, as_attachment=True, download_name=download_name,
+                                   conditional=True, etag=True, max_age=0)
+    response.cache_control.no_cache = True
+    return response
+
+
+def _mp3_part_path(article, part_index):
+    """Path of a physically split MP3 part, named as split_mp3_by_size_estimation writes it."""
+    article_filename_base = secure_filename(Path(article['filename']).stem)
+    return Path(article['mp3_parts_folder_path']) / f"{article_filename_base}_part_{part_index}.mp3"
+
+
+def _audio_part_checksum(article, part_index):
+    """Stored SHA-256 of a part (used as its ETag), or None if checksums are missing."""
+    if not article['audio_part_checksums']:
+        return None
+    checksums = article['audio_part_checksums'].split(db_manager.AUDIO_PART_CHECKSUM_DELIMITER)
+    if len(checksums) != article['num_audio_parts'] or not checksums[part_index]:
+        return None
+    return checksums[part_index]
+
+
+def _content_disposition(download_name):
+    """
+    Attachment header value, with an ASCII fallback plus an RFC 5987 filename* for non-ASCII names
+    (as send_file does). Article titles are often Chinese, which a plain filename= cannot carry.
+    """
+    simple = unicodedata.normalize('NFKD', download_name).encode('ascii', 'ignore').decode('ascii')
+    header = 'attachment; filename="{}"'.format(simple.replace('\\', '\\\\').replace('"', '\\"'))
+    if simple != download_name:
+        header += f"; filename*=UTF-8''{quote(download_name, safe='!#$&+^`|~')}"
+    return header
+
+
+def _apply_versioned_cache_headers(response, version):
+    """
+    Responses requested as ?v=<their version> (an audio part's checksum, an article's content_version for
+    subtitles) are content-addressed and cached for good; others revalidate.
+    """
+    if version and request.args.get('v') == version:
+        response.cache_control.no_cache = None
+        response.cache_control.public = True
+        response.cache_control.max_age = app.config['AUDIO_IMMUTABLE_CACHE_MAX_AGE']
+        response.cache_control.immutable = True
+    else:
+        response.cache_control.no_cache = True
+    return response
+
+
+def _virtual_part_byte_range(article, part_index):
+    """(start, end) byte range of a virtual part within the converted MP3, or None for physical parts."""
+    byte_ranges = db_manager.parse_audio_part_byte_ranges(article['audio_part_byte_ranges'])
+    if article['mp3_parts_folder_path'] or len(byte_ranges) != article['num_audio_parts']:
+        return None
+    return byte_ranges[part_index]
+
+
+def _serve_virtual_mp3_part(article, part_index, byte_range, checksum, should_download, download_name):
+    """
+    Streams a virtual part straight out of the converted MP3; nothing is written to disk.
+    Handles If-None-Match (304), Range/If-Range (206) and unsatisfiable ranges (416) itself,
+    since send_from_directory only works on whole files.
+    """
+    mp3_file_path = Path(article['converted_mp3_path']) if article['converted_mp3_path'] else None
+    if not mp3_file_path or not mp3_file_path.is_file():
+        app.logger.error(f"APP: Serve MP3 part: Converted MP3 {mp3_file_path} not found for virtual part {part_index} of article {article['id']}.")
+        return jsonify({'status': 'error', 'message': 'Audio part file not found on server.'}), 404
+
+    start_byte, end_byte = byte_range
+    part_length = end_byte - start_byte
+
+    if checksum and request.if_none_match.contains(checksum):
+        response = Response(status=304)
+        response.set_etag(checksum)
+        return _apply_versioned_cache_headers(response, checksum)
+
+    requested_range = request.range
+    if_range = request.if_range
+    if if_range.date is not None or (if_range.etag is not None and if_range.etag != checksum):
+        requested_range = None # Validator does not match the current part: send all of it
+    elif requested_range is not None and (requested_range.units != 'bytes' or len(requested_range.ranges) != 1):
+        requested_range = None # Multipart ranges are not supported; a full 200 is always a valid answer
+
+    status = 200
+    if requested_range is not None:
+        range_in_part = requested_range.range_for_length(part_length)
+        if range_in_part is None:
+            response = Response(status=416)
+            response.content_range = ContentRange('bytes', None, None, part_length)
+            return response
+        status = 206
+        range_start, range_stop = range_in_part
+    else:
+        range_start, range_stop = 0, part_length
+
+    app.logger.info(f"APP: Serving virtual MP3 part {part_index} (bytes {start_byte + range_start}-{start_byte + range_stop}) of {mp3_file_path.name} for article ID {article['id']}")
+    response = Response(mp3_index.iter_file_range(str(mp3_file_path), start_byte + range_start, start_byte + range_stop),
+                        status=status, mimetype='audio/mpeg', direct_passthrough=True)
+    response.headers['Content-Length'] = str(range_stop - range_start)
+    response.accept_ranges = 'bytes'
+    if status == 206:
+        response.content_range = ContentRange('bytes', range_start, range_stop, part_length)
+    if checksum:
+        response.set_etag(checksum)
+    if should_download:
+        response.headers['Content-Disposition'] = _content_disposition(download_name)
+    return _apply_versioned_cache_headers(response, checksum)
 
 
 @app.route('/article/<int:article_id>/serve_mp3_part/<int:part_index>')
 def serve_mp3_part(article_id, part_index):
-    # ... (no change)
-    article = db_manager.get_article_by_id(article_id)
-    if not article or not article['mp3_parts_folder_path'] or article['num_audio_parts'] is None or part_index < 0 or part_index >= article['num_audio_parts']: 
+    article = load_article(article_id)
+    if not article or article['num_audio_parts'] is None or part_index < 0 or part_index >= article['num_audio_parts']: 
         app.logger.warning(f"APP: Serve MP3 part: Invalid request for article {article_id}, part {part_index}.")
         return jsonify({'status': 'error', 'message': 'Audio part not found or invalid index.'}), 404
 
-    parts_folder = Path(article['mp3_parts_folder_path'])
-    article_filename_base = secure_filename(Path(article['filename']).stem)
-    part_filename = f"{article_filename_base}_part_{part_index}.mp3"
-    part_path = parts_folder / part_filename
+    should_download = request.args.get('download', 'false').lower() == 'true'
+    
+    download_name = f"{Path(article['filename']).stem}_part_{part_index + 1}.mp3" 
+
+    checksum = _audio_part_checksum(article, part_index)
+    byte_range = _virtual_part_byte_range(article, part_index)
+    if byte_range:
+        return _serve_virtual_mp3_part(article, part_index, byte_range, checksum, should_download, download_name)
+    if not article['mp3_parts_folder_path']:
+        app.logger.warning(f"APP: Serve MP3 part: Article {article_id} has neither a parts folder nor part byte ranges.")
+        return jsonify({'status': 'error', 'message': 'Audio part not found or invalid index.'}), 404
+
+    part_path = _mp3_part_path(article, part_index)
+    parts_folder = part_path.parent
+    part_filename = part_path.name
 
     if not part_path.is_file():
         app.logger.error(f"APP: Serve MP3 part: File {part_path} not found for article {article_id}, part {part_index}.")
         return jsonify({'status': 'error', 'message': 'Audio part file not found on server.'}), 404
 
     app.logger.info(f"APP: Serving MP3 part: {part_filename} from dir: {parts_folder} for article ID {article_id}")
-    
+
+    # The stored checksum is a strong validator for the part; without one Flask derives an ETag from mtime/size.
+    response = send_from_directory(str(parts_folder.resolve()), part_filename, 
+                                   as_attachment=should_download, download_name=download_name if should_download else None,
+                                   conditional=True, etag=checksum if checksum else True)
+    return _apply_versioned_cache_headers(response, checksum)
+
+
+@app.route('/article/<int:article_id>/subtitles.<subtitle_format>')
+def export_subtitles(article_id, subtitle_format):
+    """
+    SRT, WebVTT or compact JSON timings generated from the sentence rows and streamed (?lang=both|en|zh,
+    ?download=true). Files up to SUBTITLE_CACHE_MAX_BYTES are copied into _subtitle_cache as they stream
+    and served from it per content_version, which also gives the ETag, so clients revalidate cheaply;
+    ?v=<content_version> URLs are cached as immutable.
+    """
+    if subtitle_format not in subtitles.SUBTITLE_FORMATS:
+        return jsonify({'status': 'error', 'message': f"Unknown format. Supported: {', '.join(subtitles.SUBTITLE_FORMATS)}"}), 404
+    lang = request.args.get('lang', 'both')
+    if lang not in subtitles.SUBTITLE_LANGS:
+        return jsonify({'status': 'error', 'message': f"Unknown lang. Supported: {', '.join(subtitles.SUBTITLE_LANGS)}"}), 400
+    article = load_article(article_id)
+    if not article:
+        return jsonify({'status': 'error', 'message': 'Article not found'}), 404
+
+    content_version = str(article['content_version'])
+    etag = f"{article_id}-{content_version}-{subtitle_format}-{lang}"
+    if request.if_none_match.contains_weak(etag): # Compressed copies carry the weak form (see compress_response)
+        response = Response(status=304)
+        response.set_etag(etag, weak=not request.if_none_match.contains(etag))
+        return _apply_versioned_cache_headers(response, content_version)
+
+    mimetype, extension = subtitles.SUBTITLE_FORMATS[subtitle_format]
+    cache_key = (article_id, article['content_version'], subtitle_format, lang)
+    data = _subtitle_cache.get(cache_key)
+    if data is not None:
+        response = Response(data, content_type=f"{mimetype}; charset=utf-8")
+    else:
+        if not db_manager.article_has_sentence_timestamps(article_id, app_logger=app.logger):
+            return jsonify({'status': 'error', 'message': 'This article has no sentence timestamps.'}), 404
+        header = {'article_id': article_id, 'content_version': article['content_version']}
+        chunks = subtitles.iter_subtitles(subtitle_format, db_manager.iter_article_sentences(article_id, app_logger=app.logger),
+                                          lang=lang, header=header)
+        app.logger.info(f"APP: Streaming {subtitle_format} subtitles (lang={lang}) for article ID {article_id}")
+        response = Response(stream_with_context(_subtitle_cache.stream_into(cache_key, chunks)),
+                            content_type=f"{mimetype}; charset=utf-8")
+    response.set_etag(etag)
+    if request.args.get('download', 'false').lower() == 'true':
+        suffix = '' if lang == 'both' or subtitle_format == 'json' else f".{lang}"
+        response.headers['Content-Disposition'] = _content_disposition(f"{Path(article['filename']).stem}{suffix}.{extension}")
+    return _apply_versioned_cache_headers(response, content_version)
+
+
+@app.route('/article/<int:article_id>/rendition/<profile>')
+def get_audio_rendition_info(article_id, profile):
+    """
+    Parts layout of one encoding profile, in the same shape the parts view uses: an unsplit
+    rendition is reported as a single part covering the whole file.
+    """
+    rendition = db_manager.get_audio_rendition(article_id, profile, app_logger=app.logger)
+    if not rendition:
+        return jsonify({'status': 'error', 'message': 'Encoding profile not available for this article.'}), 404
+    if rendition['num_parts']:
+        sentences = [
+            {'paragraph_index': r['paragraph_index'], 'sentence_index_in_paragraph': r['sentence_index_in_paragraph'],
+             'audio_part_index': r['audio_part_index'], 'start_time_in_part_ms': r['start_time_in_part_ms'],
+             'end_time_in_part_ms': r['end_time_in_part_ms']}
+            for r in db_manager.get_sentence_rendition_parts(article_id, profile, app_logger=app.logger)
+        ]
+        num_parts, part_checksums = rendition['num_parts'], rendition['part_checksums']
+        part_fingerprints = _split_per_part_values(rendition['part_fingerprints'])
+    else:
+        sentences = [
+            {'paragraph_index': s['paragraph_index'], 'sentence_index_in_paragraph': s['sentence_index_in_paragraph'],
+             'audio_part_index': 0, 'start_time_in_part_ms': s['start_time_ms'], 'end_time_in_part_ms': s['end_time_ms']}
+            for s in db_manager.get_sentences_for_article(article_id, app_logger=app.logger) if s['start_time_ms'] is not None
+        ]
+        num_parts, part_checksums = 1, None
+        whole_file_fingerprint = _recorded_audio_fingerprint(rendition['file_path'])
+        part_fingerprints = [whole_file_fingerprint] if whole_file_fingerprint else []
+    return jsonify({
+        'status': 'success',
+        'profile': profile,
+        'mimetype': rendition['mimetype'],
+        'size_bytes': rendition['size_bytes'],
+        'num_parts': num_parts,
+        'part_checksums': _split_per_part_values(part_checksums),
+        'part_fingerprints': part_fingerprints,
+        'sentences': sentences,
+    })
+
+
+@app.route('/article/<int:article_id>/rendition/<profile>/part/<int:part_index>')
+def serve_rendition_part(article_id, profile, part_index):
+    rendition = db_manager.get_audio_rendition(article_id, profile, app_logger=app.logger)
+    num_parts = rendition['num_parts'] if rendition and rendition['num_parts'] else 1
+    if not rendition or part_index < 0 or part_index >= num_parts:
+        app.logger.warning(f"APP: Serve rendition part: Invalid request for article {article_id}, profile '{profile}', part {part_index}.")
+        return jsonify({'status': 'error', 'message': 'Audio part not found or invalid index.'}), 404
+
+    profile_config = app.config['AUDIO_ENCODING_PROFILES'].get(profile, {})
+    extension = profile_config.get('extension', Path(rendition['file_path']).suffix.lstrip('.'))
+    checksum = None
+    if rendition['num_parts']:
+        # encode_audio_profiles names renditions '<article base>.<profile>.<extension>'
+        article_filename_base = Path(rendition['file_path']).name[:-len(f".{profile}.{extension}")]
+        file_path = Path(rendition['parts_folder_path']) / f"{article_filename_base}_part_{part_index}.{extension}"
+        checksums = rendition['part_checksums'].split(db_manager.AUDIO_PART_CHECKSUM_DELIMITER) if rendition['part_checksums'] else []
+        checksum = checksums[part_index] if len(checksums) == num_parts and checksums[part_index] else None
+    else:
+        file_path = Path(rendition['file_path'])
+    if not file_path.is_file():
+        app.logger.error(f"APP: Serve rendition part: File {file_path} not found for article {article_id}, profile '{profile}'.")
+        return jsonify({'status': 'error', 'message': 'Audio part file not found on server.'}), 404
+
     should_download = request.args.get('download', 'false').lower() == 'true'
-    
-    download_name = f"{Path(article['filename']).stem}_part_{part_index + 1}.mp3" 
+    article = load_article(article_id)
+    part_suffix = f"_part_{part_index + 1}" if rendition['num_parts'] else ""
+    download_name = f"{Path(article['filename']).stem if article else article_id}_{profile}{part_suffix}.{extension}"
+    response = send_from_directory(str(file_path.parent.resolve()), file_path.name, mimetype=rendition['mimetype'],
+                                   as_attachment=should_download, download_name=download_name if should_download else None,
+                                   conditional=True, etag=checksum if checksum else True)
+    return _apply_versioned_cache_headers(response, checksum)
+
+
+def _get_article_with_hls(article_id):
+    article = load_article(article_id)
+    if not article or not article['hls_folder_path'] or not article['num_hls_segments']:
+        return None
+    return article
+
 
-    return send_from_directory(str(parts_folder.resolve()), part_filename, 
-                               as_attachment=should_download, download_name=download_name if should_download else None)
+@app.route('/article/<int:article_id>/hls/playlist.m3u8')
+def serve_hls_playlist(article_id):
+    article = _get_article_with_hls(article_id)
+    if not article:
+        app.logger.warning(f"APP: Serve HLS playlist: No HLS output for article {article_id}.")
+        return jsonify({'status': 'error', 'message': 'No streaming output for this article.'}), 404
+    # Segments are re-cut when the article is re-processed, so the playlist is always revalidated.
+    response = send_from_directory(str(Path(article['hls_folder_path']).resolve()), audio_processor.HLS_PLAYLIST_FILENAME,
+                                   mimetype='application/vnd.apple.mpegurl', conditional=True, max_age=0)
+    response.cache_control.no_cache = True
+    return response
+
+
+@app.route('/article/<int:article_id>/hls/segment_<int:segment_index>.mp3')
+def serve_hls_segment(article_id, segment_index):
+    article = _get_article_with_hls(article_id)
+    if not article or segment_index < 0 or segment_index >= article['num_hls_segments']:
+        app.logger.warning(f"APP: Serve HLS segment: Invalid request for article {article_id}, segment {segment_index}.")
+        return jsonify({'status': 'error', 'message': 'Segment not found or invalid index.'}), 404
+    segment_path = Path(article['hls_folder_path']) / audio_processor.hls_segment_filename(segment_index)
+    if not segment_path.is_file():
+        app.logger.error(f"APP: Serve HLS segment: File {segment_path} not found for article {article_id}.")
+        return jsonify({'status': 'error', 'message': 'Segment file not found on server.'}), 404
+    response = send_from_directory(str(segment_path.parent.resolve()), segment_path.name,
+                                   mimetype='audio/mpeg', conditional=True, max_age=0)
+    response.cache_control.no_cache = True
+    return response
+
+
+@app.route('/article/<int:article_id>/hls/sentences')
+def get_hls_sentence_index(article_id):
+    """Sentence -> segment index for click-to-play: the segment holding each sentence's start and its times in it."""
+    article = _get_article_with_hls(article_id)
+    if not article:
+        return jsonify({'status': 'error', 'message': 'No streaming output for this article.'}), 404
+    sentences = db_manager.get_sentences_for_article(article_id, app_logger=app.logger)
+    return jsonify({
+        'status': 'success',
+        'num_segments': article['num_hls_segments'],
+        'playlist_url': url_for('serve_hls_playlist', article_id=article_id),
+        'sentences': [
+            {
+                'paragraph_index': s['paragraph_index'],
+                'sentence_index_in_paragraph': s['sentence_index_in_paragraph'],
+                'segment_index': s['hls_segment_index'],
+                'start_time_in_segment_ms': s['start_time_in_segment_ms'],
+                'end_time_in_segment_ms': s['end_time_in_segment_ms'],
+            }
+            for s in sentences if s['hls_segment_index'] is not None
+        ],
+    })
+
+
+def _run_sentence_search(query, limit, offset):
+    """Returns (hits, has_more) for query, or (None, False) if the search failed."""
+    rows = db_manager.search_sentences(query, limit=limit + 1, offset=offset, app_logger=app.logger)
+    if rows is None:
+        return None, False
+    hits = [
+        {
+            'book_id': r['book_id'], 'book_title': r['book_title'],
+            'article_id': r['article_id'], 'article_filename': r['article_filename'],
+            'paragraph_index': r['paragraph_index'], 'sentence_index_in_paragraph': r['sentence_index_in_paragraph'],
+            'english': r['english_text'], 'chinese': r['chinese_text'],
+            'start_time_ms': r['start_time_ms'], 'end_time_ms': r['end_time_ms'],
+            'audio_part_index': r['audio_part_index'],
+            'start_time_in_part_ms': r['start_time_in_part_ms'], 'end_time_in_part_ms': r['end_time_in_part_ms'],
+        }
+        for r in rows[:limit]
+    ]
+    return hits, len(rows) > limit
+
+
+@app.route('/search')
+def search_page():
+    query = request.args.get('q', '').strip()
+    page = max(request.args.get('page', 1, type=int), 1)
+    per_page = app.config['SEARCH_RESULTS_PER_PAGE']
+    hits, has_more = [], False
+    if query:
+        hits, has_more = _run_sentence_search(query, per_page, (page - 1) * per_page)
+        if hits is None:
+            flash('Search failed. Check the log for details.', 'danger')
+            hits = []
+    return render_template('search.html', query=query, hits=hits, page=page, has_more=has_more)
+
+
+@app.route('/api/search')
+def search_api():
+    query = request.args.get('q', '').strip()
+    if not query:
+        return jsonify({'status': 'error', 'message': 'Missing query parameter q.'}), 400
+    limit = min(max(request.args.get('limit', app.config['SEARCH_RESULTS_PER_PAGE'], type=int), 1), app.config['SEARCH_MAX_RESULTS'])
+    offset = max(request.args.get('offset', 0, type=int), 0)
+    hits, has_more = _run_sentence_search(query, limit, offset)
+    if hits is None:
+        return jsonify({'status': 'error', 'message': 'Search failed.'}), 500
+    return jsonify({'status': 'success', 'query': query, 'offset': offset, 'has_more': has_more, 'results': hits})
+
+
+@app.cli.command('migrate-db')
+def migrate_db_command():
+    """Apply pending database schema migrations."""
+    try:
+        applied = db_manager.migrate_db(app_logger=app.logger)
+    except sqlite3.Error as e:
+        click.echo(f"Migration failed: {e}")
+        raise SystemExit(1)
+    click.echo(f"Schema at version {db_manager.SCHEMA_VERSION}, {applied} migration(s) applied.")
+
+
+@app.cli.command('build-assets')
+def build_assets_command():
+    """Write fingerprinted, precompressed copies of static/ into STATIC_ASSETS_FOLDER."""
+    manifest = static_assets.build_assets(app.static_folder, app.config['STATIC_ASSETS_FOLDER'], logger=app.logger)
+    for source, built in sorted(manifest.items()):
+        click.echo(f"{source} -> {built}")
+    click.echo("Restart the app to serve the new build.")
+
+
+@app.cli.command('verify-audio-parts')
+@click.argument('article_ids', nargs=-1, type=int)
+@click.option('--workers', type=int, default=None, help='Thread pool size (defaults to AUDIO_PART_VERIFY_WORKERS).')
+def verify_audio_parts_command(article_ids, workers):
+    """Re-hash stored MP3 parts in parallel and compare them with audio_part_checksums."""
+    max_workers = workers or app.config['AUDIO_PART_VERIFY_WORKERS']
+    articles = db_manager.get_articles_with_audio_parts(app_logger=app.logger)
+    if article_ids:
+        articles = [a for a in articles if a['id'] in set(article_ids)]
+
+    failures = 0
+    for article in articles:
+        byte_ranges = None
+        if article['mp3_parts_folder_path']:
+            part_paths = [_mp3_part_path(article, i) for i in range(article['num_audio_parts'])]
+        else:
+            byte_ranges = db_manager.parse_audio_part_byte_ranges(article['audio_part_byte_ranges'])
+            if not article['converted_mp3_path'] or len(byte_ranges) != article['num_audio_parts']:
+                continue
+            part_paths = [article['converted_mp3_path']] * len(byte_ranges)
+        expected = article['audio_part_checksums'].split(db_manager.AUDIO_PART_CHECKSUM_DELIMITER) if article['audio_part_checksums'] else []
+        results = audio_processor.verify_audio_part_checksums(part_paths, expected, max_workers=max_workers, logger=app.logger,
+                                                              byte_ranges=byte_ranges)
+        bad = [r for r in results if not r['ok']]
+        failures += len(bad)
+        click.echo(f"Article {article['id']} ('{article['filename']}'): {len(results) - len(bad)}/{len(results)} parts OK")
+        for r in bad:
+            click.echo(f"  part {r['part_index']}: expected {r['expected']}, got {r['actual']} ({r['path']})")
+    if failures:
+        raise SystemExit(1)
 
 
 if __name__ == '__main__':
@@ -0,0 +1,298 @@
+"""
+ASGI entry point for production serving:
+
+    uvicorn asgi:application --host 0.0.0.0 --port 5002
+
+Audio streaming (serve_mp3_part, download_mp3), reading-location saves and upload-status polls are
+answered here on the event loop: file reads and SQLite calls are handed to small thread pools, so a slow listener pulling a
+20 MB part holds a coroutine instead of a worker thread. Their error cases (missing article or file)
+fall through to the Flask views, which render them exactly as in WSGI mode.
+
+Every other route goes to the Flask app through asgiref's WSGI adapter. The adapter runs all wrapped
+requests on one shared thread unless told otherwise, so each request gets its own
+ThreadSensitiveContext; CPU-heavy pipeline work (parsing, TTS, alignment, splitting) therefore runs in
+its own thread and never blocks the loop or other requests.
+
+Requires asgiref and an ASGI server (uvicorn, hypercorn); `python app.py` still runs the dev server.
+"""
+import asyncio
+import json
+import os
+import re
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from urllib.parse import parse_qs
+
+from werkzeug.http import parse_etags, parse_if_range_header, parse_range_header, quote_etag
+
+try:
+    from asgiref.sync import ThreadSensitiveContext
+    from asgiref.wsgi import WsgiToAsgi
+    asgiref_available = True
+except ImportError:
+    print("Warning: 'asgiref' library not found. Install it to serve the app over ASGI (asgi.py).")
+    asgiref_available = False
+
+import db_manager
+import mp3_index
+from app import (app, _audio_part_checksum, _content_disposition, _mp3_part_path, _parse_location_indices,
+                 _upload_status, _virtual_part_byte_range)
+
+# SQLite calls get their own pool: db_manager keeps one pooled connection per thread, so a few threads
+# are enough and a burst of downloads (file pool) cannot starve location saves.
+_db_executor = ThreadPoolExecutor(max_workers=app.config['ASGI_DB_THREADS'], thread_name_prefix='asgi-db')
+_file_executor = ThreadPoolExecutor(max_workers=app.config['ASGI_FILE_THREADS'], thread_name_prefix='asgi-file')
+
+_flask_application = WsgiToAsgi(app) if asgiref_available else None
+
+
+async def run_db(func, *args, **kwargs):
+    """Awaits a db_manager call made on the SQLite thread pool."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_db_executor, lambda: func(*args, app_logger=app.logger, **kwargs))
+
+
+async def _call_flask(scope, receive, send):
+    if _flask_application is None:
+        await _send_json(send, 503, {'status': 'error', 'message': 'asgiref is not installed; only audio and location routes are served.'})
+        return
+    async with ThreadSensitiveContext():
+        await _flask_application(scope, receive, send)
+
+
+def _request_headers(scope):
+    """Request headers as a dict of lower-case name -> value (repeated headers joined with ', ')."""
+    headers = {}
+    for raw_name, raw_value in scope['headers']:
+        name, value = raw_name.decode('latin-1').lower(), raw_value.decode('latin-1')
+        headers[name] = f"{headers[name]}, {value}" if name in headers else value
+    return headers
+
+
+def _query_arg(scope, name, default=None):
+    values = parse_qs(scope.get('query_string', b'').decode('latin-1')).get(name)
+    return values[0] if values else default
+
+
+def _file_etag(path, stat_result):
+    """The ETag send_file derives for a file without an explicit one, so caches stay valid across modes."""
+    return f"{stat_result.st_mtime}-{stat_result.st_size}-{zlib.adler32(str(path).encode()) & 0xFFFFFFFF}"
+
+
+def _part_cache_control(scope, checksum):
+    """Same policy as app._apply_versioned_cache_headers."""
+    if checksum and _query_arg(scope, 'v') == checksum:
+        return f"public, max-age={app.config['AUDIO_IMMUTABLE_CACHE_MAX_AGE']}, immutable"
+    return 'no-cache'
+
+
+async def _send_json(send, status, payload):
+    body = json.dumps(payload).encode('utf-8')
+    await send({'type': 'http.response.start', 'status': status,
+                'headers': [(b'content-type', b'application/json'), (b'content-length', str(len(body)).encode())]})
+    await send({'type': 'http.response.body', 'body': body})
+
+
+async def _wait_for_disconnect(receive, disconnected):
+    while True:
+        message = await receive()
+        if message['type'] == 'http.disconnect':
+            disconnected.set()
+            return
+
+
+async def _send_file_range(scope, receive, send, path, start_byte, end_byte, etag, cache_control,
+                           mimetype='audio/mpeg', download_name=None):
+    """
+    Answers a GET/HEAD for bytes [start_byte, end_byte) of a file: 304 on a matching If-None-Match,
+    206/416 for a single byte range (honouring If-Range), 200 otherwise. The body is read in chunks
+    on the file pool and sent as each chunk arrives; reading stops when the client goes away.
+    """
+    headers = _request_headers(scope)
+    length = end_byte - start_byte
+    response_headers = [(b'cache-control', cache_control.encode()), (b'etag', quote_etag(etag).encode())]
+
+    if 'if-none-match' in headers and parse_etags(headers['if-none-match']).contains(etag):
+        await send({'type': 'http.response.start', 'status': 304, 'headers': response_headers})
+        await send({'type': 'http.response.body', 'body': b''})
+        return
+
+    requested_range = parse_range_header(headers.get('range'))
+    if 'if-range' in headers:
+        if_range = parse_if_range_header(headers['if-range'])
+        if if_range.date is not None or if_range.etag != etag:
+            requested_range = None # Validator does not match the current file: send all of it
+    if requested_range is not None and (requested_range.units != 'bytes' or len(requested_range.ranges) != 1):
+        requested_range = None # Multipart ranges are not supported; a full 200 is always a valid answer
+
+    status, range_start, range_stop = 200, 0, length
+    if requested_range is not None:
+        range_in_file = requested_range.range_for_length(length)
+        if range_in_file is None:
+            await send({'type': 'http.response.start', 'status': 416,
+                        'headers': [(b'content-range', f"bytes */{length}".encode())]})
+            await send({'type': 'http.response.body', 'body': b''})
+            return
+        status = 206
+        range_start, range_stop = range_in_file
+        response_headers.append((b'content-range', f"bytes {range_start}-{range_stop - 1}/{length}".encode()))
+
+    response_headers += [(b'content-type', mimetype.encode()), (b'accept-ranges', b'bytes'),
+                         (b'content-length', str(range_stop - range_start).encode())]
+    if download_name:
+        response_headers.append((b'content-disposition', _content_disposition(download_name).encode('latin-1')))
+    await send({'type': 'http.response.start', 'status': status, 'headers': response_headers})
+    if scope['method'] == 'HEAD' or range_stop == range_start:
+        await send({'type': 'http.response.body', 'body': b''})
+        return
+
+    loop = asyncio.get_running_loop()
+    chunks = mp3_index.iter_file_range(str(path), start_byte + range_start, start_byte + range_stop,
+                                       chunk_size=app.config['ASGI_STREAM_CHUNK_BYTES'])
+    disconnected = asyncio.Event()
+    watcher = asyncio.create_task(_wait_for_disconnect(receive, disconnected))
+    pending_read = loop.run_in_executor(_file_executor, next, chunks, None)
+    try:
+        while True:
+            chunk = await pending_read
+            if chunk is None or disconnected.is_set():
+                break
+            pending_read = loop.run_in_executor(_file_executor, next, chunks, None) # Read ahead while sending
+            await send({'type': 'http.response.body', 'body': chunk, 'more_body': True})
+        if not disconnected.is_set():
+            await send({'type': 'http.response.body', 'body': b''})
+    finally:
+        watcher.cancel()
+        if pending_read.done():
+            chunks.close() # Closes the file; a read still running when cancelled leaves that to the garbage collector
+
+
+async def serve_mp3_part(scope, receive, send, article_id, part_index):
+    article = await run_db(db_manager.get_article_by_id, article_id)
+    if not article or article['num_audio_parts'] is None or part_index >= article['num_audio_parts']:
+        return False
+
+    checksum = _audio_part_checksum(article, part_index)
+    byte_range = _virtual_part_byte_range(article, part_index)
+    if byte_range:
+        path = Path(article['converted_mp3_path']) if article['converted_mp3_path'] else None
+    elif article['mp3_parts_folder_path']:
+        path, byte_range = _mp3_part_path(article, part_index).resolve(), None
+    else:
+        return False
+    try:
+        stat_result = await asyncio.get_running_loop().run_in_executor(_file_executor, os.stat, path) if path else None
+    except OSError:
+        stat_result = None
+    if stat_result is None:
+        return False
+
+    start_byte, end_byte = byte_range if byte_range else (0, stat_result.st_size)
+    should_download = _query_arg(scope, 'download', 'false').lower() == 'true'
+    download_name = f"{Path(article['filename']).stem}_part_{part_index + 1}.mp3" if should_download else None
+    app.logger.info(f"ASGI: Serving MP3 part {part_index} ({'virtual' if byte_range else 'physical'}) of article ID {article_id}")
+    await _send_file_range(scope, receive, send, path, start_byte, end_byte,
+                           checksum or _file_etag(path, stat_result), _part_cache_control(scope, checksum),
+                           download_name=download_name)
+    return True
+
+
+async def download_mp3_for_article(scope, receive, send, article_id):
+    article = await run_db(db_manager.get_article_by_id, article_id)
+    if not article or not article['converted_mp3_path']:
+        return False
+    path = Path(article['converted_mp3_path']).resolve()
+    try:
+        stat_result = await asyncio.get_running_loop().run_in_executor(_file_executor, os.stat, path)
+    except OSError:
+        return False
+
+    app.logger.info(f"ASGI: Serving MP3 file {path.name} for article ID {article_id}")
+    # The full MP3 is rewritten in place on re-processing, so browsers must revalidate it.
+    await _send_file_range(scope, receive, send, path, 0, stat_result.st_size, _file_etag(path, stat_result), 'no-cache',
+                           download_name=f"{Path(article['filename']).stem}.mp3")
+    return True
+
+
+async def save_reading_location(scope, receive, send, article_id):
+    body = b''
+    while True:
+        message = await receive()
+        if message['type'] == 'http.disconnect':
+            return True
+        body += message.get('body', b'')
+        if not message.get('more_body'):
+            break
+
+    book_id = (await run_db(db_manager.get_article_book_ids, [article_id])).get(article_id, 0)
+    if book_id == 0:
+        app.logger.warning(f"ASGI: Attempt to save reading location for non-existent article ID: {article_id}")
+        await _send_json(send, 404, {'status': 'error', 'message': 'Article not found'})
+        return True
+    if not book_id:
+        await _send_json(send, 400, {'status': 'error', 'message': 'Article is not associated with a book.'})
+        return True
+
+    try:
+        data = json.loads(body)
+    except ValueError:
+        data = None
+    indices = _parse_location_indices(data)
+    if indices is None:
+        app.logger.warning(f"ASGI: Invalid data for saving reading location for article {article_id}: {data}")
+        await _send_json(send, 400, {'status': 'error', 'message': 'Missing or invalid paragraph or sentence index'})
+        return True
+
+    try:
+        await run_db(db_manager.buffer_reading_location, article_id, book_id, *indices)
+    except Exception as e:
+        app.logger.error(f"ASGI: Failed to save reading location for article {article_id} (book {book_id}): {e}", exc_info=True)
+        await _send_json(send, 500, {'status': 'error', 'message': f'Failed to save location: {str(e)}'})
+        return True
+    await _send_json(send, 200, {'status': 'success', 'message': 'Reading location saved.'})
+    return True
+
+
+async def get_upload_status(scope, receive, send, upload_id):
+    session = await run_db(db_manager.get_upload_session, upload_id)
+    if not session:
+        return False
+    await _send_json(send, 200, _upload_status(session))
+    return True
+
+
+# (method(s), path pattern, path argument converter, handler). A handler returns False to hand the request
+# to Flask unread.
+ASYNC_ROUTES = [
+    (('GET', 'HEAD'), re.compile(r'/article/(\d+)/serve_mp3_part/(\d+)'), int, serve_mp3_part),
+    (('GET', 'HEAD'), re.compile(r'/article/(\d+)/download_mp3'), int, download_mp3_for_article),
+    (('POST',), re.compile(r'/article/(\d+)/save_location'), int, save_reading_location),
+    (('GET',), re.compile(r'/uploads/([0-9a-f]{32})'), str, get_upload_status),
+]
+
+
+async def application(scope, receive, send):
+    if scope['type'] == 'lifespan':
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                db_manager.flush_reading_locations(app_logger=app.logger)
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    if scope['type'] == 'http':
+        for methods, pattern, convert, handler in ASYNC_ROUTES:
+            match = pattern.fullmatch(scope['path'])
+            if match and scope['method'] in methods:
+                if await handler(scope, receive, send, *map(convert, match.groups())):
+                    return
+                break
+    await _call_flask(scope, receive, send)
+
+
+if __name__ == '__main__':
+    import uvicorn
+    uvicorn.run(application, host='0.0.0.0', port=5002)
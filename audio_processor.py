@@ -6,8 +6,13 @@ import shlex
 from pathlib import Path
 import locale
 import math
+import logging
 import hashlib
+import csv
+import json
+import bisect
 import traceback # For detailed error logging
+from concurrent.futures import ThreadPoolExecutor
 
 from pydub import AudioSegment
 from pydub.exceptions import CouldntEncodeError, CouldntDecodeError
@@ -17,20 +22,88 @@ import text_parser # Assuming this is in the same directory or PYTHONPATH
 from werkzeug.utils import secure_filename # <--- ADDED THIS IMPORT
 import tts_utils # For TTS generation
 import db_manager # For updating DB
-
-# Helper function to calculate SHA256 checksum (no changes from original)
-def calculate_sha256_checksum(file_path_str, logger=None):
-    # ... (same as your existing function)
+import mp3_index # Frame-level MP3 parsing for duration and byte-range splitting
+import subtitles # Streaming SRT/WebVTT/JSON generation
+
+CHECKSUM_READ_BLOCK_SIZE_BYTES = 1024 * 1024 # Large reads; hashlib releases the GIL on big buffers
+# Sampled fingerprints: SHA-256 over a few fixed windows plus the size, so a client can recognise a
+# part without reading it whole. sampledFingerprint() in static/article.js must use the same values.
+FINGERPRINT_WINDOW_BYTES = 64 * 1024
+FINGERPRINT_WINDOW_COUNT = 4 # Spread evenly from the first byte to the last
+
+# Helper function to calculate SHA256 checksum
+def calculate_sha256_checksum(file_path_str, logger=None, byte_range=None):
+    """SHA-256 of a whole file, or only of bytes [start, end) if byte_range is given."""
     sha256_hash = hashlib.sha256()
     try:
-        with open(file_path_str, "rb") as f:
-            for byte_block in iter(lambda: f.read(4096), b""):
+        if byte_range:
+            for byte_block in mp3_index.iter_file_range(file_path_str, byte_range[0], byte_range[1], CHECKSUM_READ_BLOCK_SIZE_BYTES):
                 sha256_hash.update(byte_block)
+        else:
+            with open(file_path_str, "rb") as f:
+                for byte_block in iter(lambda: f.read(CHECKSUM_READ_BLOCK_SIZE_BYTES), b""):
+                    sha256_hash.update(byte_block)
         return sha256_hash.hexdigest()
     except IOError as e:
         if logger: logger.error(f"AUDIO_PROC: Error reading file {file_path_str} for checksum: {e}")
         return None
 
+def fingerprint_windows(size):
+    """(offset, length) of each window hashed by calculate_sampled_fingerprint for content of `size` bytes."""
+    if size <= FINGERPRINT_WINDOW_BYTES * FINGERPRINT_WINDOW_COUNT:
+        return [(0, size)] # Small enough to hash whole
+    last_offset = size - FINGERPRINT_WINDOW_BYTES
+    return [(i * last_offset // (FINGERPRINT_WINDOW_COUNT - 1), FINGERPRINT_WINDOW_BYTES)
+            for i in range(FINGERPRINT_WINDOW_COUNT)]
+
+def calculate_sampled_fingerprint(file_path_str, logger=None, byte_range=None):
+    """
+    '<size>:<SHA-256 of the fingerprint_windows>' of a file, or of bytes [start, end) if byte_range is given.
+    Reads at most FINGERPRINT_WINDOW_COUNT * FINGERPRINT_WINDOW_BYTES; a cheap identity check, not a
+    substitute for calculate_sha256_checksum.
+    """
+    try:
+        start, end = byte_range if byte_range else (0, os.path.getsize(file_path_str))
+        sha256_hash = hashlib.sha256()
+        with open(file_path_str, "rb") as f:
+            for offset, length in fingerprint_windows(end - start):
+                f.seek(start + offset)
+                sha256_hash.update(f.read(length))
+        return f"{end - start}:{sha256_hash.hexdigest()}"
+    except OSError as e:
+        if logger: logger.error(f"AUDIO_PROC: Error reading file {file_path_str} for fingerprint: {e}")
+        return None
+
+def calculate_sha256_checksums_parallel(file_paths, max_workers=None, logger=None, byte_ranges=None):
+    """
+    Checksums several files (or byte ranges of files) across a thread pool.
+    Returns hex digests (None on error) in input order.
+    """
+    if not file_paths:
+        return []
+    ranges = byte_ranges if byte_ranges else [None] * len(file_paths)
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="sha256") as executor:
+        return list(executor.map(lambda p, r: calculate_sha256_checksum(str(p), logger=logger, byte_range=r),
+                                 file_paths, ranges))
+
+def verify_audio_part_checksums(part_paths, expected_checksums, max_workers=None, logger=None, byte_ranges=None):
+    """
+    Re-hashes existing parts in parallel and compares them with the stored checksums.
+    For virtual parts, pass the converted MP3 once per part in part_paths plus the byte_ranges.
+    Returns a list of dicts: {'part_index', 'path', 'expected', 'actual', 'ok'}.
+    """
+    actual_checksums = calculate_sha256_checksums_parallel(part_paths, max_workers=max_workers, logger=logger,
+                                                           byte_ranges=byte_ranges)
+    results = []
+    for part_index, (path, actual) in enumerate(zip(part_paths, actual_checksums)):
+        expected = expected_checksums[part_index] if part_index < len(expected_checksums) else None
+        ok = bool(actual) and bool(expected) and actual.lower() == expected.lower()
+        results.append({'part_index': part_index, 'path': str(path), 'expected': expected, 'actual': actual, 'ok': ok})
+        if logger and not ok:
+            logger.warning(f"AUDIO_PROC: Checksum verification failed for part {part_index} ({path}). "
+                           f"Expected: {expected}, actual: {actual}")
+    return results
+
 # extract_english_sentences_for_aeneas (no changes needed for TTS path initially)
 def extract_english_sentences_for_aeneas(bilingual_file_content_string, logger=None):
     # ... (same as your existing function)
@@ -128,6 +201,7 @@ def convert_to_mp3(source_path_str, output_dir_str, logger=None):
                 logger.info(f"AUDIO_PROC: FFmpeg stdout:\n{ffmpeg_stdout_output}")
         
         if logger: logger.info(f"AUDIO_PROC: Successfully converted '{source_path}' to '{target_mp3_path}'")
+        record_audio_metadata(str(target_mp3_path), logger=logger)
         return str(target_mp3_path)
         
     except subprocess.CalledProcessError as e:
@@ -146,6 +220,42 @@ def convert_to_mp3(source_path_str, output_dir_str, logger=None):
         if logger: logger.error(f"AUDIO_PROC: Generic error during FFmpeg conversion of '{source_path}': {e_generic}", exc_info=True)
         raise Exception(f"Audio conversion error for '{source_path}': {str(e_generic)}") from e_generic
 
+def encode_audio_profiles(source_path_str, output_dir_str, output_stem, profiles, logger=None):
+    """
+    Encodes the source into every given encoding profile with a single ffmpeg run (one decode,
+    one output per profile). profiles maps profile name -> profile dict from
+    AUDIO_ENCODING_PROFILES ('extension', 'ffmpeg_args', ...).
+    Returns {profile_name: output_path}; empty if encoding failed (profiles are optional extras).
+    """
+    if not profiles:
+        return {}
+    output_dir = Path(output_dir_str)
+    output_dir.mkdir(parents=True, exist_ok=True)
+
+    encode_cmd_list = ["ffmpeg", "-y", "-i", str(source_path_str)]
+    output_paths = {}
+    for profile_name, profile in profiles.items():
+        output_path = output_dir / f"{output_stem}.{profile_name}.{profile['extension']}"
+        encode_cmd_list += ["-map", "0:a", "-vn"] + list(profile['ffmpeg_args']) + [str(output_path)]
+        output_paths[profile_name] = str(output_path)
+
+    encode_cmd_str_display = " ".join([shlex.quote(part) for part in encode_cmd_list])
+    if logger: logger.info(f"AUDIO_PROC: FFmpeg encoding profiles command: {encode_cmd_str_display}")
+    try:
+        subprocess.run(encode_cmd_list, check=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    except subprocess.CalledProcessError as e:
+        ffmpeg_stderr = e.stderr.decode(locale.getpreferredencoding(False), errors='replace') if e.stderr else ""
+        if logger: logger.error(f"AUDIO_PROC: Encoding profiles failed for '{source_path_str}'. Return code: {e.returncode}\nFFmpeg stderr: {ffmpeg_stderr}")
+        return {}
+    except FileNotFoundError:
+        if logger: logger.error("AUDIO_PROC: FFmpeg executable not found. Cannot encode audio profiles.")
+        return {}
+
+    for profile_name, output_path in output_paths.items():
+        if logger: logger.info(f"AUDIO_PROC: Encoded profile '{profile_name}' to {output_path} ({Path(output_path).stat().st_size}B).")
+        record_audio_metadata(output_path, logger=logger)
+    return output_paths
+
 # run_aeneas_alignment (no changes, Aeneas specific)
 def run_aeneas_alignment(audio_mp3_path_str, plain_english_text_path_str, srt_output_path_str,
                          python_executable_str, logger=None):
@@ -295,24 +405,15 @@ def generate_bilingual_srt(article_id, original_sentences_data, srt_timestamps,
         if logger: logger.warning(f"AUDIO_PROC: No data to process for bilingual SRT for article {article_id}.")
         return None
 
-    srt_content_lines = []
-    for i in range(count_to_process):
-        start_ms, end_ms = srt_timestamps[i]
-        eng_text = original_sentences_data[i].get('english_text', '').strip()
-        chn_text = original_sentences_data[i].get('chinese_text', '').strip()
-
-        start_time_str = ms_to_srt_time(start_ms)
-        end_time_str = ms_to_srt_time(end_ms)
-
-        srt_content_lines.append(str(i + 1))
-        srt_content_lines.append(f"{start_time_str} --> {end_time_str}")
-        srt_content_lines.append(f"{eng_text} | {chn_text}") # Default separator
-        srt_content_lines.append("") 
+    cue_rows = ({'english_text': original_sentences_data[i].get('english_text', ''),
+                 'chinese_text': original_sentences_data[i].get('chinese_text', ''),
+                 'start_time_ms': srt_timestamps[i][0], 'end_time_ms': srt_timestamps[i][1]}
+                for i in range(count_to_process))
 
     try:
         output_srt_path.parent.mkdir(parents=True, exist_ok=True)
         with open(output_srt_path, 'w', encoding='utf-8') as f:
-            f.write("\n".join(srt_content_lines))
+            f.writelines(subtitles.iter_srt(cue_rows, bilingual_separator=" | "))
         if logger: logger.info(f"AUDIO_PROC: Generated bilingual SRT for article {article_id} at {output_srt_path}")
         return str(output_srt_path)
     except IOError as e:
@@ -333,28 +434,112 @@ def ms_to_srt_time(ms_total):
     h = int(m_total // 60)
     return f"{h:02d}:{m:02d}:{s:02d},{ms:03d}"
 
-# get_audio_duration_ms (no changes)
-def get_audio_duration_ms(audio_path_str, logger=None):
-    # ... (same as your existing function)
+def _probe_audio_metadata(audio_path_str, logger=None):
+    # MP3s are measured from their Xing/Info/VBRI header (first frame only) or, without one, from
+    # a scan of their frame headers; ffprobe is only spawned for other formats or if the MP3 cannot be parsed.
+    if Path(audio_path_str).suffix.lower() == '.mp3':
+        stream_info = mp3_index.read_vbr_stream_info(audio_path_str, logger=logger)
+        if stream_info and stream_info['duration_ms']:
+            audio_bytes = stream_info['audio_bytes'] or Path(audio_path_str).stat().st_size
+            return {'duration_ms': stream_info['duration_ms'],
+                    'bitrate_bps': int(audio_bytes * 8 * 1000 / stream_info['duration_ms']),
+                    'codec': 'mp3', 'sample_rate': stream_info['sample_rate'], 'channels': stream_info['channels']}
+        frame_index = mp3_index.build_frame_index(audio_path_str, logger=logger)
+        if frame_index:
+            return {'duration_ms': frame_index.duration_ms, 'bitrate_bps': frame_index.average_bitrate_bps,
+                    'codec': 'mp3', 'sample_rate': frame_index.sample_rate, 'channels': frame_index.channels}
+        if logger: logger.warning(f"AUDIO_PROC: Could not read MP3 frame headers of {audio_path_str}. Falling back to ffprobe.")
+
     cmd = [
         "ffprobe",
         "-v", "error",
-        "-show_entries", "format=duration",
-        "-of", "default=noprint_wrappers=1:nokey=1",
+        "-select_streams", "a:0",
+        "-show_entries", "format=duration,bit_rate:stream=codec_name,sample_rate,channels",
+        "-of", "json",
         str(audio_path_str)
     ]
     try:
         result = subprocess.run(cmd, capture_output=True, text=True, check=True)
-        duration_sec = float(result.stdout.strip())
-        if logger: logger.info(f"AUDIO_PROC: Duration of {audio_path_str}: {duration_sec}s")
-        return int(duration_sec * 1000)
-    except (subprocess.CalledProcessError, ValueError) as e:
-        if logger: logger.error(f"AUDIO_PROC: Failed to get duration for {audio_path_str}: {e}")
+        probe = json.loads(result.stdout)
+        stream = (probe.get('streams') or [{}])[0]
+        probe_format = probe.get('format', {})
+        return {
+            'duration_ms': int(float(probe_format['duration']) * 1000),
+            'bitrate_bps': int(probe_format['bit_rate']) if probe_format.get('bit_rate') else None,
+            'codec': stream.get('codec_name'),
+            'sample_rate': int(stream['sample_rate']) if stream.get('sample_rate') else None,
+            'channels': stream.get('channels'),
+        }
+    except (subprocess.CalledProcessError, ValueError, KeyError) as e:
+        if logger: logger.error(f"AUDIO_PROC: Failed to probe {audio_path_str}: {e}")
         return None
     except FileNotFoundError:
         if logger: logger.error("AUDIO_PROC: ffprobe not found. Cannot get audio duration.")
         raise Exception("ffprobe not found. Please ensure FFmpeg (which includes ffprobe) is installed and in PATH.")
 
+
+def record_audio_metadata(audio_path_str, duration_ms=None, codec=None, sample_rate=None, channels=None,
+                          bitrate_bps=None, content_sha256=None, logger=None):
+    """
+    Stores duration, bitrate, codec, sample rate, channels, size, mtime, SHA-256 and sampled
+    fingerprint of a file we just produced in the audio_metadata table. Pass the values already known exactly (e.g. TTS
+    output built from sample counts); a missing bitrate is derived from size and duration, anything
+    else missing is probed. The file is not read in full here: content_sha256 is only stored when
+    the caller already hashed the file (e.g. while writing its parts). Returns the metadata dict.
+    """
+    path_obj = Path(audio_path_str).resolve()
+    stat = path_obj.stat()
+    metadata = {'duration_ms': duration_ms, 'codec': codec, 'sample_rate': sample_rate,
+                'channels': channels, 'bitrate_bps': bitrate_bps}
+    if metadata['bitrate_bps'] is None and metadata['duration_ms']:
+        metadata['bitrate_bps'] = int(stat.st_size * 8 * 1000 / metadata['duration_ms'])
+    if any(value is None for value in metadata.values()):
+        probed = _probe_audio_metadata(str(path_obj), logger=logger) or {}
+        metadata = {key: value if value is not None else probed.get(key) for key, value in metadata.items()}
+        if metadata['bitrate_bps'] is None and metadata['duration_ms']:
+            metadata['bitrate_bps'] = int(stat.st_size * 8 * 1000 / metadata['duration_ms'])
+    metadata.update({
+        'file_path': str(path_obj),
+        'size_bytes': stat.st_size,
+        'mtime_ns': stat.st_mtime_ns,
+        'content_sha256': content_sha256,
+        'content_fingerprint': calculate_sampled_fingerprint(str(path_obj), logger=logger),
+    })
+    if metadata['duration_ms'] is None:
+        return metadata # Nothing worth caching
+    try:
+        db_manager.upsert_audio_metadata(metadata, app_logger=logger)
+    except Exception as e:
+        if logger: logger.warning(f"AUDIO_PROC: Could not cache metadata for {path_obj}: {e}")
+    return metadata
+
+
+def get_audio_metadata(audio_path_str, logger=None):
+    """
+    Metadata of an audio file from the audio_metadata cache. The file is only probed (and the
+    cache refreshed) when it has no entry or its size/mtime changed since it was recorded.
+    Returns None if the file cannot be read.
+    """
+    path_obj = Path(audio_path_str).resolve()
+    try:
+        stat = path_obj.stat()
+    except OSError as e:
+        if logger: logger.error(f"AUDIO_PROC: Failed to get metadata for {audio_path_str}: {e}")
+        return None
+    cached = db_manager.get_audio_metadata(str(path_obj), app_logger=logger)
+    if cached and cached['size_bytes'] == stat.st_size and cached['mtime_ns'] == stat.st_mtime_ns:
+        return dict(cached)
+    if logger: logger.info(f"AUDIO_PROC: Audio metadata cache miss for {path_obj}. Probing.")
+    return record_audio_metadata(str(path_obj), logger=logger)
+
+
+def get_audio_duration_ms(audio_path_str, logger=None):
+    metadata = get_audio_metadata(audio_path_str, logger=logger)
+    duration_ms = metadata['duration_ms'] if metadata else None
+    if duration_ms is not None and logger:
+        logger.info(f"AUDIO_PROC: Duration of {audio_path_str}: {duration_ms / 1000.0}s")
+    return duration_ms
+
 def process_article_with_tts(article_id,
                              article_filename_base, app_instance,
                              raw_bilingual_text_content_string=None, parsed_sentences_list=None):
@@ -362,14 +547,13 @@ def process_article_with_tts(article_id,
     app_config = app_instance.config
 
     # --- Path Generation for Converted Audio, MP3 Parts, and SRT ---
-    article_data_for_paths = db_manager.get_article_by_id(article_id, app_logger=logger)
+    article_data_for_paths, book_data_for_paths, _ = db_manager.get_article_with_book(article_id, app_logger=logger)
     result = {} 
     if not article_data_for_paths or not article_data_for_paths['book_id']:
         msg = f"TTS Error: Cannot determine book for article {article_id} to create descriptive audio/SRT paths."
         logger.error(f"AUDIO_PROC: {msg}")
         result.update({"message": msg, "message_category": "danger", "success": False})
         return result
-    book_data_for_paths = db_manager.get_book_by_id(article_data_for_paths['book_id'], app_logger=logger)
     if not book_data_for_paths:
         msg = f"TTS Error: Book data not found for book_id {article_data_for_paths['book_id']} (article {article_id})."
         logger.error(f"AUDIO_PROC: {msg}")
@@ -520,7 +704,13 @@ def process_article_with_tts(article_id,
             try:
                 full_audio_segment.export(converted_mp3_path_str, format="mp3", parameters=["-q:a", "2"])
                 logger.info(f"AUDIO_PROC: Exported combined TTS MP3 to: {converted_mp3_path_str}")
-                db_manager.update_article_converted_mp3_path(article_id, converted_mp3_path_str, app_logger=logger)
+                # Duration is exact from the stitched samples and the bitrate follows from the file size;
+                # no need to probe the encoded file
+                mp3_metadata = record_audio_metadata(converted_mp3_path_str, duration_ms=len(full_audio_segment), codec='mp3',
+                                                     sample_rate=full_audio_segment.frame_rate,
+                                                     channels=full_audio_segment.channels, logger=logger)
+                db_manager.update_article_converted_mp3_path(article_id, converted_mp3_path_str,
+                                                             fingerprint=mp3_metadata['content_fingerprint'], app_logger=logger)
             except Exception as e_export:
                 msg = "Failed to create final MP3 from TTS audio."
                 logger.error(f"AUDIO_PROC: {msg} for article {article_id}: {e_export}", exc_info=True)
@@ -586,7 +776,6 @@ def process_article_with_tts(article_id,
                             'original_end_ms': srt_timestamps[i][1]
                         })
                     
-                    base_mp3_parts_dir_for_article.mkdir(parents=True, exist_ok=True)
                     max_size_bytes = app_config['MAX_AUDIO_PART_SIZE_MB'] * 1024 * 1024
                     original_mp3_size_bytes = Path(converted_mp3_path_str).stat().st_size
 
@@ -598,13 +787,19 @@ def process_article_with_tts(article_id,
                             max_part_size_bytes=max_size_bytes,
                             output_parts_dir=str(base_mp3_parts_dir_for_article),
                             article_filename_base=article_safe_title,
-                            logger=logger
+                            logger=logger,
+                            materialize_parts=app_config['AUDIO_PARTS_MODE'] != 'virtual'
                         )
                         if split_details and split_details['num_parts'] > 0:
                             part_checksums_list = split_details.get('part_checksums', [])
                             db_manager.update_article_mp3_parts_info(
-                                article_id, str(base_mp3_parts_dir_for_article), split_details['num_parts'], 
-                                part_checksums_list, app_logger=logger
+                                article_id,
+                                str(base_mp3_parts_dir_for_article) if split_details['parts_materialized'] else None,
+                                split_details['num_parts'], 
+                                part_checksums_list,
+                                part_byte_ranges_list=None if split_details['parts_materialized'] else split_details['part_byte_ranges'],
+                                part_fingerprints_list=split_details['part_fingerprints'],
+                                app_logger=logger
                             )
                             db_manager.batch_update_sentence_part_details(split_details['sentence_part_updates'], app_logger=logger)
                             logger.info(f"AUDIO_PROC: Successfully split TTS MP3 for article {article_id} into {split_details['num_parts']} parts.")
@@ -617,6 +812,26 @@ def process_article_with_tts(article_id,
                         logger.info(f"AUDIO_PROC: TTS MP3 for article {article_id} not split (size {original_mp3_size_bytes} <= {max_size_bytes}).")
                         db_manager.clear_article_mp3_parts_info(article_id, app_logger=logger)
                         splitting_message_part = " Original MP3 not large enough for splitting."
+
+                    if app_config['HLS_OUTPUT_ENABLED']:
+                        num_segments = generate_hls_output_for_article(
+                            article_id, converted_mp3_path_str, sentences_info_for_splitting,
+                            str(Path(app_config['HLS_FOLDER']) / book_safe_title / article_safe_title),
+                            app_config['HLS_SEGMENT_DURATION_S'], logger=logger
+                        )
+                        if num_segments:
+                            splitting_message_part += f" Streaming output has {num_segments} segments."
+
+                    if app_config['AUDIO_ENCODING_PROFILES_ENABLED']:
+                        # Encode the compact profiles from lossless PCM rather than from the MP3
+                        tts_master_wav_path = temp_tts_clips_dir_obj / f"{article_safe_title}_tts_combined.wav"
+                        full_audio_segment.export(str(tts_master_wav_path), format="wav")
+                        produced_profiles = process_audio_renditions(
+                            article_id, str(tts_master_wav_path), sentences_info_for_splitting, app_config,
+                            book_safe_title, article_safe_title, logger=logger
+                        )
+                        if produced_profiles:
+                            splitting_message_part += f" Compact encodings: {', '.join(produced_profiles)}."
             
             result.update({
                 "success": True,
@@ -635,57 +850,30 @@ def process_article_with_tts(article_id,
     return result
 
 # --- NEW MP3 Splitting Function (by size estimation) ---
-def split_mp3_by_size_estimation(original_mp3_path, sentences_info,
-                                 max_part_size_bytes, output_parts_dir,
-                                 article_filename_base, logger=None):
-    if not logger:
-        # Create a dummy logger if none provided, to avoid `logger.info` errors
-        class DummyLogger:
-            def info(self, msg): print(f"INFO: {msg}")
-            def warning(self, msg): print(f"WARNING: {msg}")
-            def error(self, msg, exc_info=False): print(f"ERROR: {msg}")
-            def debug(self, msg): print(f"DEBUG: {msg}")
-        logger = DummyLogger()
-
-    logger.info(f"AUDIO_PROC_SPLIT: Starting MP3 splitting by size estimation for '{original_mp3_path}'.")
-    if not sentences_info:
-        logger.warning("AUDIO_PROC_SPLIT: No sentences_info provided for splitting. Aborting.")
-        return {'num_parts': 0, 'sentence_part_updates': [], 'part_checksums': []}
-
-    original_mp3_path_obj = Path(original_mp3_path)
-    output_parts_dir_obj = Path(output_parts_dir)
-    output_parts_dir_obj.mkdir(parents=True, exist_ok=True)
-
-    total_mp3_size_bytes = original_mp3_path_obj.stat().st_size
-    total_mp3_duration_ms = get_audio_duration_ms(original_mp3_path, logger=logger)
-
-    if total_mp3_duration_ms is None or total_mp3_duration_ms == 0:
-        logger.error(f"AUDIO_PROC_SPLIT: Could not determine duration or duration is zero for {original_mp3_path}. Cannot split.")
-        return {'num_parts': 0, 'sentence_part_updates': [], 'part_checksums': []}
-    
-    if total_mp3_size_bytes == 0:
-        logger.error(f"AUDIO_PROC_SPLIT: Original MP3 file {original_mp3_path} has zero size. Cannot split.")
-        return {'num_parts': 0, 'sentence_part_updates': [], 'part_checksums': []}
-
-    if total_mp3_size_bytes <= max_part_size_bytes:
-        logger.info(f"AUDIO_PROC_SPLIT: MP3 size {total_mp3_size_bytes}B <= max part size {max_part_size_bytes}B. No splitting needed.")
-        return {'num_parts': 0, 'sentence_part_updates': [], 'part_checksums': []} 
-
-    sentence_part_updates = []
-    current_part_idx = 0
+# ffmpeg segment muxer container for each part file extension we produce
+SEGMENT_FORMAT_BY_EXTENSION = {'mp3': 'mp3', 'opus': 'ogg', 'ogg': 'ogg'}
+
+def _empty_split_result():
+    return {'num_parts': 0, 'sentence_part_updates': [], 'part_checksums': [], 'part_fingerprints': [],
+            'part_byte_ranges': [], 'parts_materialized': False}
+
+
+def _plan_parts_by_size_estimation(sentences_info, total_mp3_duration_ms, total_mp3_size_bytes,
+                                   max_part_size_bytes, logger):
+    """
+    Groups consecutive sentences into parts whose estimated byte size stays under
+    max_part_size_bytes. Returns a list of part plans:
+    [{'sentences': [...], 'start_ms': int, 'end_ms': int, 'estimated_size_bytes': float}, ...]
+    """
+    part_plans = []
     sentence_cursor = 0
-    part_checksums = []
-    num_parts_successfully_created = 0
 
     while sentence_cursor < len(sentences_info):
-        part_start_original_ms = sentences_info[sentence_cursor]['original_start_ms']
         current_part_accumulated_size_bytes = 0
-        current_part_sentences_info = [] 
-        part_end_original_ms_for_ffmpeg = part_start_original_ms
+        current_part_sentences_info = []
 
-        temp_sentence_cursor = sentence_cursor 
-        while temp_sentence_cursor < len(sentences_info):
-            sentence = sentences_info[temp_sentence_cursor]
+        while sentence_cursor < len(sentences_info):
+            sentence = sentences_info[sentence_cursor]
             sentence_duration_ms = sentence['original_end_ms'] - sentence['original_start_ms']
             if sentence_duration_ms <= 0: 
                  estimated_sentence_size_bytes = (50 / total_mp3_duration_ms) * total_mp3_size_bytes if total_mp3_duration_ms > 0 else 1024 
@@ -697,96 +885,477 @@ def split_mp3_by_size_estimation(original_mp3_path, sentences_info,
 
             if (current_part_accumulated_size_bytes + estimated_sentence_size_bytes <= max_part_size_bytes) or \
                (len(current_part_sentences_info) == 0): 
-                
                 current_part_sentences_info.append(sentence)
                 current_part_accumulated_size_bytes += estimated_sentence_size_bytes
-                part_end_original_ms_for_ffmpeg = sentence['original_end_ms'] 
-                temp_sentence_cursor += 1
+                sentence_cursor += 1
             else:
                 break 
 
         if not current_part_sentences_info:
             logger.warning("AUDIO_PROC_SPLIT: No sentences collected for a part, breaking split loop.")
             break 
-        
-        sentence_cursor = temp_sentence_cursor
-
-        part_output_filename = f"{article_filename_base}_part_{current_part_idx}.mp3"
-        part_output_path = output_parts_dir_obj / part_output_filename
-
-        ffmpeg_start_sec = max(0, part_start_original_ms / 1000.0) 
-        ffmpeg_end_sec = part_end_original_ms_for_ffmpeg / 1000.0
-        
-        if ffmpeg_end_sec <= ffmpeg_start_sec:
-            logger.warning(f"AUDIO_PROC_SPLIT: Calculated zero or negative duration for part {current_part_idx} "
-                           f"(start: {ffmpeg_start_sec:.3f}s, to: {ffmpeg_end_sec:.3f}s). Skipping this part extraction.")
-            if temp_sentence_cursor == sentence_cursor and sentence_cursor < len(sentences_info): 
-                logger.error("AUDIO_PROC_SPLIT: Potential infinite loop due to zero-duration part calculation. Advancing sentence cursor by 1 to break.")
-                sentence_cursor += 1 
-            continue
-
 
+        part_plans.append({
+            'sentences': current_part_sentences_info,
+            'start_ms': current_part_sentences_info[0]['original_start_ms'],
+            'end_ms': current_part_sentences_info[-1]['original_end_ms'],
+            'estimated_size_bytes': current_part_accumulated_size_bytes,
+        })
+
+    return part_plans
+
+
+def _write_parts_with_ffmpeg_segment_muxer(original_mp3_path_obj, part_plans, output_parts_dir_obj,
+                                           article_filename_base, logger, part_extension="mp3"):
+    """
+    Cuts all parts in a single ffmpeg run using the segment muxer. Cut points are placed at the
+    start of each part's first sentence (part 0 starts at the beginning of the file), so the
+    parts are contiguous and nothing is decoded or re-encoded.
+    Returns the actual start time (ms) of every written part, as reported by ffmpeg,
+    or None if splitting failed.
+    """
+    cut_times_sec = [max(0, plan['start_ms']) / 1000.0 for plan in part_plans[1:]]
+    part_output_pattern = output_parts_dir_obj / f"{article_filename_base}_part_%d.{part_extension}"
+
+    with tempfile.TemporaryDirectory(prefix="mp3_split_") as segment_list_dir:
+        segment_list_path = Path(segment_list_dir) / "segments.csv"
         cmd_split = [
             "ffmpeg", "-y",
             "-i", str(original_mp3_path_obj),
-            "-ss", str(ffmpeg_start_sec),
-            "-to", str(ffmpeg_end_sec),
-            "-c", "copy", 
-            str(part_output_path)
+            "-map", "0:a",
+            "-c", "copy",
+            "-f", "segment",
+            "-segment_format", SEGMENT_FORMAT_BY_EXTENSION[part_extension],
+            "-reset_timestamps", "1",
+            "-segment_list", str(segment_list_path),
+            "-segment_list_type", "csv",
         ]
+        if cut_times_sec:
+            cmd_split += ["-segment_times", ",".join(f"{t:.3f}" for t in cut_times_sec)]
+        cmd_split.append(str(part_output_pattern))
+
         cmd_display = " ".join([shlex.quote(c) for c in cmd_split])
-        logger.info(f"AUDIO_PROC_SPLIT: Splitting command for part {current_part_idx}: {cmd_display}")
+        logger.info(f"AUDIO_PROC_SPLIT: Splitting command for {len(part_plans)} parts: {cmd_display}")
 
-        checksum_for_this_part = None
         try:
             split_process = subprocess.run(cmd_split, check=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-            actual_part_size = part_output_path.stat().st_size
-            logger.info(f"AUDIO_PROC_SPLIT: Created part {part_output_path} (Size: {actual_part_size}B, Estimated: {current_part_accumulated_size_bytes:.0f}B).")
             if split_process.stderr:
-                logger.debug(f"AUDIO_PROC_SPLIT: ffmpeg split stderr for part {current_part_idx}:\n{split_process.stderr.decode(errors='ignore')}")
+                logger.debug(f"AUDIO_PROC_SPLIT: ffmpeg segment stderr:\n{split_process.stderr.decode(errors='ignore')}")
+        except subprocess.CalledProcessError as e:
+            logger.error(f"AUDIO_PROC_SPLIT: Failed to split MP3 into parts (cmd: {cmd_display}): {e.stderr.decode(errors='ignore') if e.stderr else e}")
+            return None
+        except FileNotFoundError:
+            logger.error("AUDIO_PROC_SPLIT: FFmpeg executable not found. Cannot split MP3.")
+            return None
+
+        # Each row is "filename,start_time,end_time"; the start times are where ffmpeg actually cut,
+        # which can be up to one MP3 frame after the requested time.
+        actual_part_starts_ms = []
+        try:
+            with open(segment_list_path, 'r', encoding='utf-8', newline='') as f:
+                for row in csv.reader(f):
+                    if len(row) >= 2:
+                        actual_part_starts_ms.append(int(round(float(row[1]) * 1000)))
+        except (IOError, ValueError) as e:
+            logger.error(f"AUDIO_PROC_SPLIT: Could not read ffmpeg segment list {segment_list_path}: {e}")
+            return None
+
+    if len(actual_part_starts_ms) != len(part_plans):
+        logger.error(f"AUDIO_PROC_SPLIT: ffmpeg produced {len(actual_part_starts_ms)} parts but {len(part_plans)} were planned. Discarding split.")
+        return None
+    return actual_part_starts_ms
+
+
+def _plan_parts_by_frame_offsets(frame_index, sentences_info, max_part_size_bytes, logger):
+    """
+    Groups consecutive sentences into parts using the real byte offset of every sentence
+    boundary from the frame index. A cut between sentence i-1 and i is placed at the frame
+    containing sentence i's start; part 0 starts at the first audio frame and the last part
+    runs to the end of the audio. Each part is filled with as many whole sentences as fit
+    into max_part_size_bytes (a single sentence larger than the budget gets a part of its own).
+    """
+    num_sentences = len(sentences_info)
+    boundary_frames = [0]
+    for sentence in sentences_info[1:]:
+        boundary_frames.append(max(boundary_frames[-1], frame_index.frame_at_ms(sentence['original_start_ms'])))
+    boundary_frames.append(frame_index.num_frames)
+    boundary_offsets = [frame_index.byte_offset(frame) for frame in boundary_frames]
+
+    part_plans = []
+    first_sentence = 0
+    while first_sentence < num_sentences:
+        budget_end_offset = boundary_offsets[first_sentence] + max_part_size_bytes
+        # Furthest boundary whose cumulative offset still fits into the budget
+        end_boundary = bisect.bisect_right(boundary_offsets, budget_end_offset, lo=first_sentence) - 1
+        if end_boundary <= first_sentence:
+            end_boundary = first_sentence + 1
+            logger.warning(f"AUDIO_PROC_SPLIT: Sentence {first_sentence} alone is "
+                           f"{boundary_offsets[end_boundary] - boundary_offsets[first_sentence]}B, over the "
+                           f"{max_part_size_bytes}B budget. Giving it its own part.")
+        # Skip cuts that would produce a part without any frames
+        while end_boundary < num_sentences and boundary_frames[end_boundary] <= boundary_frames[first_sentence]:
+            end_boundary += 1
+
+        part_sentences = sentences_info[first_sentence:end_boundary]
+        part_plans.append({
+            'sentences': part_sentences,
+            'start_ms': part_sentences[0]['original_start_ms'],
+            'end_ms': part_sentences[-1]['original_end_ms'],
+            'start_frame': boundary_frames[first_sentence],
+            'end_frame': boundary_frames[end_boundary],
+            'estimated_size_bytes': boundary_offsets[end_boundary] - boundary_offsets[first_sentence],
+        })
+        first_sentence = end_boundary
+
+    return part_plans
+
+
+class _HashTee:
+    """Feeds every update to several hashlib objects, so one pass over the bytes yields all digests."""
+
+    def __init__(self, *hashers):
+        self.hashers = hashers
+
+    def update(self, data):
+        for hasher in self.hashers:
+            hasher.update(data)
+
+
+def _write_parts_from_frame_index(frame_index, part_plans, output_parts_dir_obj,
+                                  article_filename_base, logger, materialize_parts=True, file_hasher=None):
+    """
+    Writes every planned part as a byte range of the source MP3, cut on frame boundaries
+    (no ffmpeg, no decoding). With materialize_parts=False nothing is written: the byte
+    ranges are only hashed, for parts served on demand from the converted MP3.
+    If file_hasher is given, the whole source file is fed to it in the same pass: the part bytes
+    as they are copied, the few bytes outside the parts (tags, VBR header frame) read separately.
+    This relies on the plans covering consecutive frames, so the byte ranges never overlap.
+    Returns (part start times in ms on the original timeline, SHA-256 of each part hashed
+    in the same pass, (start, end) byte range of each part), or (None, None, None) on failure.
+    """
+    actual_part_starts_ms = []
+    part_checksums = []
+    part_byte_ranges = []
+    hashed_up_to = 0
+    for current_part_idx, plan in enumerate(part_plans):
+        start_frame, end_frame = plan['start_frame'], plan['end_frame']
+        if end_frame <= start_frame:
+            logger.error(f"AUDIO_PROC_SPLIT: Part {current_part_idx} would contain no frames "
+                         f"(frames {start_frame}-{end_frame}). Discarding split.")
+            return None, None, None
+        start_byte, end_byte = frame_index.byte_range_for_frames(start_frame, end_frame)
+        sha256_hash = hashlib.sha256()
+        part_hasher = _HashTee(sha256_hash, file_hasher) if file_hasher is not None else sha256_hash
+        try:
+            if file_hasher is not None:
+                for chunk in mp3_index.iter_file_range(frame_index.path, hashed_up_to, start_byte):
+                    file_hasher.update(chunk)
+                hashed_up_to = end_byte
+            if materialize_parts:
+                part_output_path = output_parts_dir_obj / f"{article_filename_base}_part_{current_part_idx}.mp3"
+                mp3_index.copy_byte_range(frame_index.path, start_byte, end_byte, str(part_output_path), hasher=part_hasher)
+            else:
+                for chunk in mp3_index.iter_file_range(frame_index.path, start_byte, end_byte):
+                    part_hasher.update(chunk)
+        except (OSError, ValueError) as e:
+            logger.error(f"AUDIO_PROC_SPLIT: Failed to {'write' if materialize_parts else 'hash'} part {current_part_idx} "
+                         f"(bytes {start_byte}-{end_byte}): {e}")
+            return None, None, None
+        logger.debug(f"AUDIO_PROC_SPLIT: {'Wrote' if materialize_parts else 'Hashed virtual'} part {current_part_idx} "
+                     f"from bytes {start_byte}-{end_byte} (frames {start_frame}-{end_frame}).")
+        actual_part_starts_ms.append(int(round(frame_index.frame_start_ms(start_frame))))
+        part_checksums.append(sha256_hash.hexdigest())
+        part_byte_ranges.append((start_byte, end_byte))
+    if file_hasher is not None:
+        try:
+            for chunk in mp3_index.iter_file_range(frame_index.path, hashed_up_to, os.path.getsize(frame_index.path)):
+                file_hasher.update(chunk)
+        except OSError as e:
+            logger.error(f"AUDIO_PROC_SPLIT: Failed to hash the end of {frame_index.path}: {e}")
+            return None, None, None
+    return actual_part_starts_ms, part_checksums, part_byte_ranges
+
+
+def split_mp3_by_size_estimation(original_mp3_path, sentences_info,
+                                 max_part_size_bytes, output_parts_dir,
+                                 article_filename_base, logger=None, materialize_parts=True,
+                                 part_extension="mp3"):
+    # Returns {'num_parts', 'sentence_part_updates', 'part_checksums', 'part_fingerprints', 'part_byte_ranges',
+    # 'parts_materialized'}.
+    # With materialize_parts=False (virtual parts) no files are written; parts are later served
+    # as 'part_byte_ranges' of the original MP3. This needs the frame index, so if the file cannot
+    # be indexed the parts are materialized with ffmpeg instead.
+    # Non-MP3 inputs (e.g. Opus renditions, part_extension="opus") always take the ffmpeg path.
+    if not logger:
+        # Create a dummy logger if none provided, to avoid `logger.info` errors
+        class DummyLogger:
+            def info(self, msg): print(f"INFO: {msg}")
+            def warning(self, msg): print(f"WARNING: {msg}")
+            def error(self, msg, exc_info=False): print(f"ERROR: {msg}")
+            def debug(self, msg): print(f"DEBUG: {msg}")
+        logger = DummyLogger()
+
+    logger.info(f"AUDIO_PROC_SPLIT: Starting MP3 splitting by size estimation for '{original_mp3_path}'.")
+    if not sentences_info:
+        logger.warning("AUDIO_PROC_SPLIT: No sentences_info provided for splitting. Aborting.")
+        return _empty_split_result()
 
-            checksum_for_this_part = calculate_sha256_checksum(str(part_output_path), logger=logger)
-            if checksum_for_this_part:
-                logger.info(f"AUDIO_PROC_SPLIT: Calculated SHA256 for {part_output_path}: {checksum_for_this_part[:10]}...")
+    original_mp3_path_obj = Path(original_mp3_path)
+    output_parts_dir_obj = Path(output_parts_dir)
+
+    total_mp3_size_bytes = original_mp3_path_obj.stat().st_size
+    frame_index = mp3_index.build_frame_index(original_mp3_path, logger=logger) if part_extension == "mp3" else None
+    if frame_index:
+        total_mp3_duration_ms = frame_index.duration_ms
+    else:
+        logger.warning(f"AUDIO_PROC_SPLIT: Could not build MP3 frame index for {original_mp3_path}. Falling back to ffmpeg for splitting.")
+        total_mp3_duration_ms = get_audio_duration_ms(original_mp3_path, logger=logger)
+        if not materialize_parts:
+            logger.warning("AUDIO_PROC_SPLIT: Virtual parts need a frame index. Materializing part files instead.")
+            materialize_parts = True
+    if materialize_parts:
+        output_parts_dir_obj.mkdir(parents=True, exist_ok=True)
+
+    if total_mp3_duration_ms is None or total_mp3_duration_ms == 0:
+        logger.error(f"AUDIO_PROC_SPLIT: Could not determine duration or duration is zero for {original_mp3_path}. Cannot split.")
+        return _empty_split_result()
+    
+    if total_mp3_size_bytes == 0:
+        logger.error(f"AUDIO_PROC_SPLIT: Original MP3 file {original_mp3_path} has zero size. Cannot split.")
+        return _empty_split_result()
+
+    if total_mp3_size_bytes <= max_part_size_bytes:
+        logger.info(f"AUDIO_PROC_SPLIT: MP3 size {total_mp3_size_bytes}B <= max part size {max_part_size_bytes}B. No splitting needed.")
+        return _empty_split_result()
+
+    if frame_index:
+        part_plans = _plan_parts_by_frame_offsets(frame_index, sentences_info, max_part_size_bytes, logger)
+    else:
+        part_plans = _plan_parts_by_size_estimation(
+            sentences_info, total_mp3_duration_ms, total_mp3_size_bytes, max_part_size_bytes, logger
+        )
+    if not part_plans:
+        return _empty_split_result()
+
+    part_output_paths = [output_parts_dir_obj / f"{article_filename_base}_part_{i}.{part_extension}" for i in range(len(part_plans))]
+    part_byte_ranges = []
+    if frame_index:
+        # Checksums (of each part and of the whole source file) are computed while the part bytes are
+        # written (or read, for virtual parts)
+        file_sha256_hash = hashlib.sha256()
+        actual_part_starts_ms, computed_checksums, part_byte_ranges = _write_parts_from_frame_index(
+            frame_index, part_plans, output_parts_dir_obj, article_filename_base, logger,
+            materialize_parts=materialize_parts, file_hasher=file_sha256_hash
+        )
+        if actual_part_starts_ms is not None:
+            record_audio_metadata(str(original_mp3_path_obj), duration_ms=frame_index.duration_ms, codec='mp3',
+                                  sample_rate=frame_index.sample_rate, channels=frame_index.channels,
+                                  bitrate_bps=frame_index.average_bitrate_bps,
+                                  content_sha256=file_sha256_hash.hexdigest(), logger=logger)
+    else:
+        actual_part_starts_ms = _write_parts_with_ffmpeg_segment_muxer(
+            original_mp3_path_obj, part_plans, output_parts_dir_obj, article_filename_base, logger,
+            part_extension=part_extension
+        )
+        computed_checksums = None
+        if actual_part_starts_ms is not None:
+            if any(not p.is_file() for p in part_output_paths):
+                logger.error(f"AUDIO_PROC_SPLIT: ffmpeg did not create all expected part files in {output_parts_dir_obj}. Discarding split.")
+                actual_part_starts_ms = None
             else:
-                logger.warning(f"AUDIO_PROC_SPLIT: Failed to calculate checksum for successfully created part {part_output_path}.")
-            
-            part_checksums.append(checksum_for_this_part if checksum_for_this_part else "")
-            num_parts_successfully_created += 1
-
-            for sent_in_part in current_part_sentences_info:
-                sentence_part_updates.append({
-                    'sentence_db_id': sent_in_part['id'],
-                    'audio_part_index': current_part_idx, 
-                    'start_time_in_part_ms': sent_in_part['original_start_ms'] - part_start_original_ms,
-                    'end_time_in_part_ms': sent_in_part['original_end_ms'] - part_start_original_ms,
-                })
-            current_part_idx += 1 
+                computed_checksums = calculate_sha256_checksums_parallel(part_output_paths, logger=logger)
+    if actual_part_starts_ms is None:
+        return _empty_split_result()
 
-        except subprocess.CalledProcessError as e:
-            logger.error(f"AUDIO_PROC_SPLIT: Failed to create part {current_part_idx} (cmd: {cmd_display}): {e.stderr.decode(errors='ignore') if e.stderr else e}")
-            part_checksums.append("") 
-            # current_part_idx +=1 # Increment filename index even on failure to avoid overwrite if retried.
-                                 # Or, more robustly, delete the failed part if it was partially created.
-                                 # For now, we'll increment to keep filenames unique in case of retries,
-                                 # but num_parts_successfully_created will not increment.
+    sentence_part_updates = []
+    part_checksums = []
+    part_fingerprints = []
+    for current_part_idx, (plan, part_start_ms) in enumerate(zip(part_plans, actual_part_starts_ms)):
+        if materialize_parts:
+            part_label = str(part_output_paths[current_part_idx])
+            actual_part_size = part_output_paths[current_part_idx].stat().st_size
+            fingerprint = calculate_sampled_fingerprint(part_label, logger=logger)
+        else:
+            part_label = f"virtual part {current_part_idx} (bytes {part_byte_ranges[current_part_idx][0]}-{part_byte_ranges[current_part_idx][1]})"
+            actual_part_size = part_byte_ranges[current_part_idx][1] - part_byte_ranges[current_part_idx][0]
+            fingerprint = calculate_sampled_fingerprint(str(original_mp3_path_obj), logger=logger,
+                                                        byte_range=part_byte_ranges[current_part_idx])
+        part_fingerprints.append(fingerprint if fingerprint else "")
+        logger.info(f"AUDIO_PROC_SPLIT: Created part {part_label} (Size: {actual_part_size}B, Planned: {plan['estimated_size_bytes']:.0f}B, "
+                    f"Budget: {max_part_size_bytes}B).")
+
+        checksum_for_this_part = computed_checksums[current_part_idx]
+        if checksum_for_this_part:
+            logger.info(f"AUDIO_PROC_SPLIT: Calculated SHA256 for {part_label}: {checksum_for_this_part[:10]}...")
+        else:
+            logger.warning(f"AUDIO_PROC_SPLIT: Failed to calculate checksum for successfully created part {part_label}.")
+        part_checksums.append(checksum_for_this_part if checksum_for_this_part else "")
+
+        for sent_in_part in plan['sentences']:
+            sentence_part_updates.append({
+                'sentence_db_id': sent_in_part['id'],
+                'audio_part_index': current_part_idx, 
+                'start_time_in_part_ms': max(0, sent_in_part['original_start_ms'] - part_start_ms),
+                'end_time_in_part_ms': max(0, sent_in_part['original_end_ms'] - part_start_ms),
+            })
 
-    logger.info(f"AUDIO_PROC_SPLIT: Splitting complete. {num_parts_successfully_created} parts created. "
-                f"{len(sentence_part_updates)} sentence updates prepared. {len(part_checksums)} checksums recorded (length reflects attempts).")
+    logger.info(f"AUDIO_PROC_SPLIT: Splitting complete. {len(part_plans)} parts created "
+                f"({'byte ranges of the frame index' if frame_index else 'single ffmpeg pass'}). "
+                f"{len(sentence_part_updates)} sentence updates prepared.")
 
     return {
-        'num_parts': num_parts_successfully_created,
+        'num_parts': len(part_plans),
         'sentence_part_updates': sentence_part_updates,
-        'part_checksums': [cs for cs in part_checksums if cs] # Only return checksums for successfully created parts.
-                                                              # Or rather, match length with num_parts_successfully_created
-                                                              # The current logic will have len(part_checksums) == number of attempts.
-                                                              # Let's filter it based on success of creation.
-                                                              # A better way: only append to part_checksums on successful creation.
-                                                              # The current loop structure has `current_part_idx` as the index for next part.
-                                                              # Let's stick to `part_checksums` containing checksums for successfully created parts.
-                                                              # The simplest is to build `part_checksums` only on success.
-                                                              # The `part_checksums` currently has "" for failures.
-                                                              # Re-filter based on num_parts_successfully_created.
-                                                              # The number of successful parts might be less than `current_part_idx` if some failed.
-                                                              # For DB consistency, the list of checksums should match `num_parts_successfully_created`.
-    }
\ No newline at end of file
+        'part_checksums': part_checksums,
+        'part_fingerprints': part_fingerprints,
+        'part_byte_ranges': part_byte_ranges,
+        'parts_materialized': materialize_parts,
+    }
+
+
+# --- HLS-style segmented output ---
+HLS_PLAYLIST_FILENAME = "playlist.m3u8"
+
+def hls_segment_filename(segment_index):
+    return f"segment_{segment_index}.mp3"
+
+
+def write_hls_segments(original_mp3_path, sentences_info, output_dir, segment_duration_s, logger=None):
+    """
+    Cuts the MP3 into fixed-duration segments on frame boundaries (byte copies, no re-encoding),
+    each prefixed with the ID3 timestamp tag HLS expects for packed audio, and writes a VOD
+    M3U8 playlist next to them.
+    Returns {'num_segments', 'playlist_path', 'segment_durations_ms', 'sentence_segment_updates'},
+    where each update maps a sentence to the segment holding its start and its times relative to
+    that segment (the end may run into following segments), or None on failure.
+    """
+    if logger is None:
+        logger = logging.getLogger(__name__)
+
+    frame_index = mp3_index.build_frame_index(original_mp3_path, logger=logger)
+    if not frame_index:
+        logger.error(f"AUDIO_PROC_HLS: Could not build MP3 frame index for {original_mp3_path}. Skipping HLS output.")
+        return None
+
+    frames_per_segment = max(1, int(round(segment_duration_s * 1000.0 / frame_index.frame_duration_ms)))
+    segment_start_frames = list(range(0, frame_index.num_frames, frames_per_segment))
+    output_dir_obj = Path(output_dir)
+    output_dir_obj.mkdir(parents=True, exist_ok=True)
+    for stale_segment in output_dir_obj.glob("segment_*.mp3"):
+        stale_segment.unlink()
+
+    segment_durations_ms = []
+    try:
+        for segment_idx, start_frame in enumerate(segment_start_frames):
+            end_frame = min(start_frame + frames_per_segment, frame_index.num_frames)
+            start_byte, end_byte = frame_index.byte_range_for_frames(start_frame, end_frame)
+            segment_start_ms = frame_index.frame_start_ms(start_frame)
+            mp3_index.copy_byte_range(frame_index.path, start_byte, end_byte,
+                                      str(output_dir_obj / hls_segment_filename(segment_idx)),
+                                      header=mp3_index.build_hls_timestamp_id3_tag(segment_start_ms))
+            segment_durations_ms.append(frame_index.frame_start_ms(end_frame) - max(0.0, segment_start_ms))
+    except (OSError, ValueError) as e:
+        logger.error(f"AUDIO_PROC_HLS: Failed to write HLS segments to {output_dir_obj}: {e}")
+        return None
+
+    playlist_lines = [
+        "#EXTM3U",
+        "#EXT-X-VERSION:3",
+        f"#EXT-X-TARGETDURATION:{int(math.ceil(max(segment_durations_ms) / 1000.0))}",
+        "#EXT-X-MEDIA-SEQUENCE:0",
+        "#EXT-X-PLAYLIST-TYPE:VOD",
+    ]
+    for segment_idx, duration_ms in enumerate(segment_durations_ms):
+        playlist_lines.append(f"#EXTINF:{duration_ms / 1000.0:.3f},")
+        playlist_lines.append(hls_segment_filename(segment_idx))
+    playlist_lines.append("#EXT-X-ENDLIST")
+    playlist_path = output_dir_obj / HLS_PLAYLIST_FILENAME
+    playlist_path.write_text("\n".join(playlist_lines) + "\n", encoding="utf-8")
+
+    sentence_segment_updates = []
+    for s_info in sentences_info:
+        segment_idx = frame_index.frame_at_ms(s_info['original_start_ms']) // frames_per_segment
+        segment_start_ms = int(round(frame_index.frame_start_ms(segment_start_frames[segment_idx])))
+        sentence_segment_updates.append({
+            'sentence_db_id': s_info['id'],
+            'hls_segment_index': segment_idx,
+            'start_time_in_segment_ms': max(0, s_info['original_start_ms'] - segment_start_ms),
+            'end_time_in_segment_ms': max(0, s_info['original_end_ms'] - segment_start_ms),
+        })
+
+    logger.info(f"AUDIO_PROC_HLS: Wrote {len(segment_start_frames)} segments of ~{segment_duration_s}s "
+                f"({frames_per_segment} frames) and {playlist_path}.")
+    return {
+        'num_segments': len(segment_start_frames),
+        'playlist_path': str(playlist_path),
+        'segment_durations_ms': segment_durations_ms,
+        'sentence_segment_updates': sentence_segment_updates,
+    }
+
+
+def generate_hls_output_for_article(article_id, converted_mp3_path, sentences_info, output_dir,
+                                    segment_duration_s, logger=None):
+    """Runs write_hls_segments and records the result in the DB. Returns the number of segments (0 on failure)."""
+    if logger is None:
+        logger = logging.getLogger(__name__)
+
+    hls_details = write_hls_segments(converted_mp3_path, sentences_info, output_dir, segment_duration_s, logger=logger)
+    if not hls_details or hls_details['num_segments'] == 0:
+        logger.warning(f"AUDIO_PROC_HLS: No HLS output for article {article_id}. Clearing previous segment info.")
+        db_manager.clear_article_hls_info(article_id, app_logger=logger)
+        return 0
+    db_manager.update_article_hls_info(article_id, str(output_dir), hls_details['num_segments'], app_logger=logger)
+    db_manager.batch_update_sentence_segment_details(hls_details['sentence_segment_updates'], app_logger=logger)
+    return hls_details['num_segments']
+
+
+# --- Compact encoding profiles (renditions) ---
+def process_audio_renditions(article_id, source_audio_path, sentences_info, app_config,
+                             book_safe_title, article_safe_title, logger=None):
+    """
+    Produces every profile in AUDIO_ENCODING_PROFILES_ENABLED from source_audio_path, splits each
+    rendition that exceeds MAX_AUDIO_PART_SIZE_MB into its own parts, and stores the renditions,
+    their part checksums and per-sentence part offsets in the DB (replacing earlier renditions).
+    Returns the names of the profiles that were produced.
+    """
+    if logger is None:
+        logger = logging.getLogger(__name__)
+
+    enabled_profiles = {name: app_config['AUDIO_ENCODING_PROFILES'][name]
+                        for name in app_config['AUDIO_ENCODING_PROFILES_ENABLED']
+                        if name in app_config['AUDIO_ENCODING_PROFILES']}
+    db_manager.delete_audio_renditions(article_id, app_logger=logger)
+    if not enabled_profiles:
+        return []
+
+    renditions_dir = Path(app_config['AUDIO_RENDITIONS_FOLDER']) / book_safe_title / article_safe_title
+    rendition_paths = encode_audio_profiles(source_audio_path, str(renditions_dir), article_safe_title,
+                                            enabled_profiles, logger=logger)
+    max_size_bytes = app_config['MAX_AUDIO_PART_SIZE_MB'] * 1024 * 1024
+    produced_profiles = []
+    for profile_name, rendition_path in rendition_paths.items():
+        profile = enabled_profiles[profile_name]
+        parts_dir = renditions_dir / f"{profile_name}_parts"
+        split_details = split_mp3_by_size_estimation(
+            original_mp3_path=rendition_path,
+            sentences_info=sentences_info,
+            max_part_size_bytes=max_size_bytes,
+            output_parts_dir=str(parts_dir),
+            article_filename_base=article_safe_title,
+            logger=logger,
+            part_extension=profile['extension']
+        )
+        num_parts = split_details['num_parts'] if split_details else 0
+        db_manager.add_audio_rendition(
+            article_id, profile_name, rendition_path, profile['mimetype'], Path(rendition_path).stat().st_size,
+            parts_folder_path=str(parts_dir) if num_parts > 0 else None,
+            num_parts=num_parts,
+            part_checksums_list=split_details['part_checksums'] if num_parts > 0 else None,
+            part_fingerprints_list=split_details['part_fingerprints'] if num_parts > 0 else None,
+            app_logger=logger
+        )
+        if num_parts > 0:
+            db_manager.batch_update_sentence_rendition_parts(profile_name, split_details['sentence_part_updates'], app_logger=logger)
+        produced_profiles.append(profile_name)
+        logger.info(f"AUDIO_PROC: Rendition '{profile_name}' for article {article_id}: {rendition_path}, {num_parts} parts.")
+    return produced_profiles
@@ -0,0 +1,221 @@
+# bilingual_app/chunked_upload.py
+"""
+Resumable chunked uploads for large audio files.
+A client creates a session (file name, total size, optionally the file's SHA-256) and then PUTs the
+file in chunks at explicit offsets, each optionally with its own SHA-256. Every chunk is written
+straight into the session's staging file at its offset, so request bodies are never buffered whole,
+and a dropped connection only loses the chunk in flight: the client asks for the session's offset
+and carries on from there. A finished upload is handed to the processing pipeline by id
+(claim_completed_upload) and moved, not copied, into the job directory.
+"""
+import hashlib
+import logging
+import os
+import shutil
+import threading
+import uuid
+from collections import defaultdict
+
+import db_manager
+
+try:
+    import fcntl # Serializes chunk writes across worker processes (POSIX only)
+except ImportError:
+    fcntl = None
+
+default_logger = logging.getLogger('chunked_upload_default')
+if not default_logger.hasHandlers(): # Avoid adding multiple handlers if re-imported
+    handler = logging.StreamHandler()
+    formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    handler.setFormatter(formatter)
+    default_logger.addHandler(handler)
+    default_logger.setLevel(logging.INFO)
+
+STAGING_SUFFIX = '.upload'
+COPY_BLOCK_BYTES = 256 * 1024 # Read size when copying a chunk from the request stream to the staging file
+
+# One lock per upload id, so concurrent PUTs to the same session in this process take turns
+_session_locks = defaultdict(threading.Lock)
+_session_locks_guard = threading.Lock()
+
+
+class UploadError(ValueError):
+    """A rejected upload request. `status` is the HTTP status to answer with; `offset` the session's offset, if known."""
+
+    def __init__(self, message, status=400, offset=None):
+        super().__init__(message)
+        self.status = status
+        self.offset = offset
+
+
+class CompletedUpload:
+    """
+    A fully received upload, standing in for a werkzeug FileStorage: `filename` is the client's file
+    name and save(destination) moves the staging file there. Its session ended when it was claimed.
+    """
+
+    def __init__(self, session, logger=None):
+        self.upload_id = session['id']
+        self.filename = session['filename']
+        self.size = session['total_size']
+        self.path = session['staging_path']
+        self._logger = logger if logger else default_logger
+
+    def save(self, destination):
+        shutil.move(self.path, str(destination))
+        self._logger.info(f"UPLOAD: Moved completed upload {self.upload_id} ('{self.filename}') to {destination}.")
+
+
+def _session_lock(upload_id):
+    with _session_locks_guard:
+        return _session_locks[upload_id]
+
+
+def _forget_lock(upload_id):
+    with _session_locks_guard:
+        _session_locks.pop(upload_id, None)
+
+
+def _open_staging_file(session):
+    try:
+        return open(session['staging_path'], 'r+b')
+    except FileNotFoundError: # Aborted or purged since the session was looked up
+        raise UploadError("Unknown or expired upload.", status=404)
+
+
+def is_valid_upload_id(upload_id):
+    return isinstance(upload_id, str) and len(upload_id) == 32 and all(c in '0123456789abcdef' for c in upload_id)
+
+
+def create_upload(filename, total_size, staging_folder, sha256=None, logger=None):
+    """Starts a session with an empty staging file. Returns the session row."""
+    logger = logger if logger else default_logger
+    upload_id = uuid.uuid4().hex
+    staging_path = os.path.abspath(os.path.join(staging_folder, upload_id + STAGING_SUFFIX))
+    os.makedirs(staging_folder, exist_ok=True)
+    open(staging_path, 'wb').close()
+    db_manager.create_upload_session(upload_id, filename, total_size, staging_path,
+                                     sha256=sha256.lower() if sha256 else None, app_logger=logger)
+    return db_manager.get_upload_session(upload_id, app_logger=logger)
+
+
+def get_upload(upload_id, logger=None):
+    """Session row for upload_id, or None."""
+    if not is_valid_upload_id(upload_id):
+        return None
+    return db_manager.get_upload_session(upload_id, app_logger=logger)
+
+
+def write_chunk(upload_id, offset, stream, length, chunk_sha256=None, logger=None):
+    """
+    Writes `length` bytes read from `stream` at `offset` of the upload's staging file and returns the
+    new offset. The offset must be the session's current one (409 otherwise, with the current offset,
+    so a client that lost a response can resynchronise). A short body or a chunk_sha256 mismatch
+    leaves the session where it was.
+    """
+    logger = logger if logger else default_logger
+    session = get_upload(upload_id, logger=logger)
+    if not session:
+        raise UploadError("Unknown or expired upload.", status=404)
+    with _session_lock(upload_id), _open_staging_file(session) as staging_file:
+        if fcntl:
+            fcntl.flock(staging_file.fileno(), fcntl.LOCK_EX)
+        session = get_upload(upload_id, logger=logger) # Re-read under the lock
+        if not session:
+            raise UploadError("Unknown or expired upload.", status=404)
+        received = session['received_bytes']
+        if offset != received:
+            raise UploadError(f"Upload is at offset {received}, not {offset}.", status=409, offset=received)
+        if offset + length > session['total_size']:
+            raise UploadError(f"Chunk ends at {offset + length}, past the declared size {session['total_size']}.",
+                              status=400, offset=received)
+
+        staging_file.seek(offset)
+        chunk_hash = hashlib.sha256()
+        written = 0
+        while written < length:
+            block = stream.read(min(COPY_BLOCK_BYTES, length - written))
+            if not block:
+                break
+            staging_file.write(block)
+            chunk_hash.update(block)
+            written += len(block)
+        if written != length or (chunk_sha256 and chunk_hash.hexdigest() != chunk_sha256.lower()):
+            staging_file.truncate(offset)
+            if written != length:
+                raise UploadError(f"Chunk body ended after {written} of {length} bytes.", status=400, offset=received)
+            raise UploadError("Chunk checksum mismatch.", status=422, offset=received)
+        staging_file.flush()
+        os.fsync(staging_file.fileno()) # The recorded offset must never run ahead of the data on disk
+
+        new_offset = offset + length
+        if not db_manager.advance_upload_session(upload_id, offset, new_offset, app_logger=logger):
+            session = get_upload(upload_id, logger=logger)
+            if not session:
+                raise UploadError("Unknown or expired upload.", status=404)
+            raise UploadError("Upload was modified concurrently.", status=409, offset=session['received_bytes'])
+    if new_offset == session['total_size']:
+        logger.info(f"UPLOAD: Upload {upload_id} ('{session['filename']}') complete: {new_offset} bytes.")
+    return new_offset
+
+
+def claim_completed_upload(upload_id, logger=None):
+    """
+    CompletedUpload for a fully received upload, or None if it is unknown, incomplete or already claimed.
+    Claiming ends the session, so of several requests naming the same upload only one gets it.
+    If a whole-file SHA-256 was given when the upload was created, it is checked here and a mismatching
+    upload is discarded.
+    """
+    logger = logger if logger else default_logger
+    session = get_upload(upload_id, logger=logger)
+    if not session or session['received_bytes'] != session['total_size']:
+        return None
+    checksum_matches = True
+    with _session_lock(upload_id):
+        try:
+            staging_file = open(session['staging_path'], 'rb')
+        except FileNotFoundError: # Aborted or purged since the session was looked up
+            return None
+        with staging_file:
+            if fcntl:
+                fcntl.flock(staging_file.fileno(), fcntl.LOCK_EX)
+            if session['sha256']:
+                file_hash = hashlib.sha256()
+                for block in iter(lambda: staging_file.read(1024 * 1024), b""):
+                    file_hash.update(block)
+                checksum_matches = file_hash.hexdigest() == session['sha256']
+            if checksum_matches and not db_manager.delete_upload_session(upload_id, app_logger=logger):
+                return None # Claimed (or aborted) by another request meanwhile
+    if not checksum_matches:
+        logger.warning(f"UPLOAD: Upload {upload_id} ('{session['filename']}') does not match its declared SHA-256. Discarding.")
+        abort_upload(upload_id, logger=logger)
+        return None
+    _forget_lock(upload_id)
+    return CompletedUpload(session, logger=logger)
+
+
+def abort_upload(upload_id, logger=None):
+    """Deletes the session and its staging file. Returns False if there was no such upload."""
+    logger = logger if logger else default_logger
+    session = get_upload(upload_id, logger=logger)
+    if not session:
+        return False
+    with _session_lock(upload_id):
+        try:
+            os.remove(session['staging_path'])
+        except FileNotFoundError:
+            pass
+        db_manager.delete_upload_session(upload_id, app_logger=logger)
+    _forget_lock(upload_id)
+    return True
+
+
+def purge_stale_uploads(max_age_s, logger=None):
+    """Aborts uploads that have not received a chunk (or been claimed) in max_age_s seconds."""
+    logger = logger if logger else default_logger
+    stale = db_manager.get_stale_upload_sessions(max_age_s, app_logger=logger)
+    for session in stale:
+        abort_upload(session['id'], logger=logger)
+    if stale:
+        logger.info(f"UPLOAD: Removed {len(stale)} stale upload(s).")
+    return len(stale)
@@ -1,7 +1,15 @@
 import sqlite3
 import os
+import sys
+import json
+import re
 import datetime
 import logging # Standard logging
+import threading
+import atexit
+import time
+from contextlib import contextmanager
+from array import array
 
 # --- Configuration (could be moved to a central config if preferred) ---
 DATABASE_NAME = 'bilingual_data.db'
@@ -12,6 +20,23 @@ if not os.path.exists(INSTANCE_FOLDER):
 DATABASE_PATH = os.path.join(INSTANCE_FOLDER, DATABASE_NAME)
 
 AUDIO_PART_CHECKSUM_DELIMITER = ";" # Define delimiter for concatenated checksums
+AUDIO_PART_BYTE_RANGE_SEPARATOR = "-" # "start-end" byte range of a virtual part, joined with the checksum delimiter
+# Packed per-article timing arrays (sentence_timings.timings): one little-endian int32 array per field,
+# concatenated in this order, each sentence_count long and in sentence order. NULL is stored as -1.
+PACKED_TIMING_FIELDS = ('start_time_ms', 'end_time_ms', 'audio_part_index', 'start_time_in_part_ms', 'end_time_in_part_ms')
+PACKED_TIMING_NULL = -1
+
+DB_STATEMENT_CACHE_SIZE = 256 # Prepared statements kept per connection (sqlite3 default is 128)
+# SQLite tuning. Overridden from app.config (SQLITE_* keys) by configure_sqlite() in init_db(app).
+# WAL lets readers (page views, save_reading_location) run while a processing job writes.
+SQLITE_SETTINGS = {
+    'SQLITE_JOURNAL_MODE': 'WAL',
+    'SQLITE_SYNCHRONOUS': 'NORMAL', # Safe with WAL: only the last commits can be lost on power failure
+    'SQLITE_BUSY_TIMEOUT_MS': 5000,
+    'SQLITE_MMAP_SIZE_BYTES': 64 * 1024 * 1024,
+    'SQLITE_CACHE_SIZE_KIB': 16 * 1024,
+    'SQLITE_MAINTENANCE_INTERVAL_S': 600, # wal_checkpoint + optimize; 0 disables the maintenance thread
+}
 
 # --- Default Logger if app_logger is not provided ---
 # This allows functions to be called outside Flask app context for scripts/testing
@@ -55,12 +80,170 @@ sqlite3.register_converter("TIMESTAMP", convert_datetime_from_db)
 sqlite3.register_adapter(datetime.datetime, adapt_datetime_to_db)
 
 
+class PooledConnection(sqlite3.Connection):
+    """
+    Connection kept open for the lifetime of its thread. The `conn.close()` every function
+    calls in its `finally` block only hands the connection back: any transaction left open
+    is rolled back, as a real close would do, unless a connection_scope is active on the
+    connection. The scope owns the transaction then: `conn.commit()` is deferred to the outermost
+    scope's exit. `close_thread_connection()` closes it for good.
+    Across requests this only pays off under servers with long-lived worker threads (gunicorn gthread,
+    waitress, the ASGI executor); Werkzeug's dev server starts a thread per request, so there the
+    connection is only shared by the db_manager calls of one request.
+    """
+    scope_depth = 0 # Nesting level of connection_scope blocks using this connection
+
+    def commit(self):
+        if self.scope_depth == 0:
+            super().commit()
+
+    def really_commit(self):
+        super().commit()
+
+    def close(self):
+        if self.in_transaction and self.scope_depth == 0:
+            self.rollback()
+
+    def really_close(self):
+        super().close()
+
+
+_thread_local = threading.local()
+
+
 def get_db_connection():
-    conn = sqlite3.connect(DATABASE_PATH, detect_types=sqlite3.PARSE_DECLTYPES | sqlite3.PARSE_COLNAMES)
+    """Returns this thread's pooled connection, opening it (and setting its PRAGMAs) on first use."""
+    conn = getattr(_thread_local, 'conn', None)
+    if conn is not None and _thread_local.database_path == DATABASE_PATH:
+        return conn
+    if conn is not None: # DATABASE_PATH was changed (scripts/tests): drop the old connection
+        conn.really_close()
+    conn = _open_connection(DATABASE_PATH)
+    _thread_local.conn = conn
+    _thread_local.database_path = DATABASE_PATH
+    return conn
+
+
+def _open_connection(database_path):
+    conn = sqlite3.connect(database_path, detect_types=sqlite3.PARSE_DECLTYPES | sqlite3.PARSE_COLNAMES,
+                           factory=PooledConnection, cached_statements=DB_STATEMENT_CACHE_SIZE,
+                           timeout=SQLITE_SETTINGS['SQLITE_BUSY_TIMEOUT_MS'] / 1000.0)
     conn.row_factory = sqlite3.Row
     conn.execute("PRAGMA foreign_keys = ON") # Ensure foreign key constraints are enforced
+    # Per-connection settings; journal_mode is persistent and set by migrate_db
+    conn.execute(f"PRAGMA busy_timeout = {int(SQLITE_SETTINGS['SQLITE_BUSY_TIMEOUT_MS'])}")
+    conn.execute(f"PRAGMA synchronous = {SQLITE_SETTINGS['SQLITE_SYNCHRONOUS']}")
+    conn.execute(f"PRAGMA mmap_size = {int(SQLITE_SETTINGS['SQLITE_MMAP_SIZE_BYTES'])}")
+    conn.execute(f"PRAGMA cache_size = -{int(SQLITE_SETTINGS['SQLITE_CACHE_SIZE_KIB'])}") # Negative = KiB
     return conn
 
+
+def release_thread_connection():
+    """End-of-request hook: keeps the thread's connection open but discards any uncommitted work."""
+    conn = getattr(_thread_local, 'conn', None)
+    if conn is not None:
+        conn.close()
+
+
+def close_thread_connection():
+    """Really closes this thread's connection, e.g. when a background worker finishes."""
+    conn = getattr(_thread_local, 'conn', None)
+    if conn is not None:
+        _thread_local.conn = None
+        conn.really_close()
+
+
+@contextmanager
+def connection_scope(close_on_exit=None):
+    """
+    Context manager for background jobs and scripts:
+
+        with db_manager.connection_scope() as conn:
+            ...
+
+    The outermost scope commits on success and rolls back on error; db_manager functions
+    called inside it leave its transaction open (their `conn.commit()` waits for the scope and
+    their `conn.close()` does not roll back), so their writes are committed or discarded together.
+    The connection is closed on exit if this scope opened it (a short-lived thread), or kept
+    if the thread already had one; close_on_exit overrides that.
+    """
+    opened_here = getattr(_thread_local, 'conn', None) is None
+    conn = get_db_connection()
+    conn.scope_depth += 1
+    try:
+        yield conn
+        if conn.scope_depth == 1:
+            conn.really_commit()
+    except Exception:
+        if conn.scope_depth == 1:
+            conn.rollback()
+        raise
+    finally:
+        conn.scope_depth -= 1
+        if close_on_exit if close_on_exit is not None else opened_here:
+            close_thread_connection()
+
+def start_query_count():
+    """Counts the SQL statements this thread runs until stop_query_count() (e.g. per request)."""
+    conn = get_db_connection()
+    _thread_local.query_count = 0
+
+    def _count_statement(statement):
+        _thread_local.query_count += 1
+
+    conn.set_trace_callback(_count_statement)
+
+def stop_query_count():
+    """Stops counting and returns the number of statements since start_query_count(), or None if not counting."""
+    count = getattr(_thread_local, 'query_count', None)
+    if count is None:
+        return None
+    _thread_local.query_count = None
+    conn = getattr(_thread_local, 'conn', None)
+    if conn is not None:
+        conn.set_trace_callback(None)
+    return count
+
+def configure_sqlite(app_config):
+    """Takes the SQLITE_* settings present in app_config. Applies to connections opened afterwards."""
+    for key in SQLITE_SETTINGS:
+        if key in app_config:
+            SQLITE_SETTINGS[key] = app_config[key]
+
+
+def run_maintenance(app_logger=None):
+    """Checkpoints the WAL back into the main database file and lets SQLite refresh its query statistics."""
+    logger = app_logger if app_logger else default_logger
+    conn = get_db_connection()
+    try:
+        busy, wal_frames, checkpointed = conn.execute("PRAGMA wal_checkpoint(PASSIVE)").fetchone()
+        conn.execute("PRAGMA optimize")
+        logger.info(f"DB: Maintenance done. WAL frames: {wal_frames}, checkpointed: {checkpointed}, busy: {busy}.")
+    except sqlite3.Error as e:
+        logger.error(f"DB: Error during maintenance: {e}", exc_info=True)
+    finally:
+        if conn: conn.close()
+
+
+_maintenance_thread = None
+
+def start_maintenance_thread(app_logger=None):
+    """Starts a daemon thread running run_maintenance every SQLITE_MAINTENANCE_INTERVAL_S seconds (once per process)."""
+    global _maintenance_thread
+    interval_s = SQLITE_SETTINGS['SQLITE_MAINTENANCE_INTERVAL_S']
+    if not interval_s or (_maintenance_thread is not None and _maintenance_thread.is_alive()):
+        return None
+
+    def _maintenance_loop():
+        while True:
+            time.sleep(interval_s)
+            run_maintenance(app_logger=app_logger)
+
+    _maintenance_thread = threading.Thread(target=_maintenance_loop, name="sqlite-maintenance", daemon=True)
+    _maintenance_thread.start()
+    return _maintenance_thread
+
+
 def _execute_sql_script(cursor, sql_script):
     try:
         cursor.executescript(sql_script)
@@ -69,181 +252,444 @@ def _execute_sql_script(cursor, sql_script):
         # For schema changes, OperationalError is common.
         raise sqlite3.OperationalError(f"Error executing SQL script: {e}\nScript:\n{sql_script}")
 
-def init_db(app=None):
-    """Initializes the database schema for books, articles, sentences, and reading locations."""
-    logger = app.logger if app and hasattr(app, 'logger') else default_logger
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    logger.info("DB: Starting database schema initialization/verification.")
 
-    try:
-        # 1. Create books table
+def _migration_0001_baseline(cursor, logger):
+    """Baseline schema (books, articles, sentences, reading locations, renditions, audio metadata).
+    Also brings databases created before schema versioning up to date by adding any missing columns."""
+    # 1. Create books table
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS books (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            title TEXT UNIQUE NOT NULL,
+            creation_timestamp DATETIME DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    logger.info("DB: Table 'books' checked/created.")
+
+    # 2. Create or modify articles table
+    cursor.execute("PRAGMA table_info(articles)")
+    articles_columns = {col['name'] for col in cursor.fetchall()}
+
+    if not articles_columns: # Table doesn't exist
+        logger.info("DB: 'articles' table not found, creating new table.")
         cursor.execute('''
-            CREATE TABLE IF NOT EXISTS books (
+            CREATE TABLE articles (
                 id INTEGER PRIMARY KEY AUTOINCREMENT,
-                title TEXT UNIQUE NOT NULL,
-                creation_timestamp DATETIME DEFAULT CURRENT_TIMESTAMP
+                book_id INTEGER NOT NULL,
+                filename TEXT NOT NULL, 
+                upload_timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
+                processed_srt_path TEXT NULLABLE,
+                converted_mp3_path TEXT NULLABLE,
+                mp3_parts_folder_path TEXT NULLABLE,
+                num_audio_parts INTEGER NULLABLE,
+                audio_part_checksums TEXT NULLABLE,
+                audio_part_byte_ranges TEXT NULLABLE,
+                hls_folder_path TEXT NULLABLE,
+                num_hls_segments INTEGER NULLABLE,
+                FOREIGN KEY (book_id) REFERENCES books (id) ON DELETE RESTRICT,
+                UNIQUE (book_id, filename) 
             )
         ''')
-        logger.info("DB: Table 'books' checked/created.")
-
-        # 2. Create or modify articles table
-        cursor.execute("PRAGMA table_info(articles)")
-        articles_columns = {col['name'] for col in cursor.fetchall()}
-        
-        if not articles_columns: # Table doesn't exist
-            logger.info("DB: 'articles' table not found, creating new table.")
-            cursor.execute('''
-                CREATE TABLE articles (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    book_id INTEGER NOT NULL,
-                    filename TEXT NOT NULL, 
-                    upload_timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
-                    processed_srt_path TEXT NULLABLE,
-                    converted_mp3_path TEXT NULLABLE,
-                    mp3_parts_folder_path TEXT NULLABLE,
-                    num_audio_parts INTEGER NULLABLE,
-                    audio_part_checksums TEXT NULLABLE,
-                    FOREIGN KEY (book_id) REFERENCES books (id) ON DELETE RESTRICT,
-                    UNIQUE (book_id, filename) 
-                )
-            ''')
-            logger.info("DB: 'articles' table created with all columns and UNIQUE constraint on (book_id, filename).")
-        else: # Table exists, check for missing columns and add them
-            logger.info("DB: 'articles' table exists. Verifying columns...")
-            cols_to_add_articles = {
-                'book_id': 'INTEGER REFERENCES books(id) ON DELETE RESTRICT', 
-                'filename': 'TEXT', 
-                'processed_srt_path': 'TEXT NULLABLE',
-                'converted_mp3_path': 'TEXT NULLABLE',
-                'mp3_parts_folder_path': 'TEXT NULLABLE',
-                'num_audio_parts': 'INTEGER NULLABLE',
-                'audio_part_checksums': 'TEXT NULLABLE'
-            }
-            for col_name, col_def in cols_to_add_articles.items():
-                if col_name not in articles_columns:
-                    try:
-                        if col_name in ['book_id', 'filename'] and articles_columns: 
-                             current_def = col_def + " NULLABLE" 
-                             logger.warning(f"DB: Adding '{col_name}' as NULLABLE to existing 'articles' table. Manual data fill and NOT NULL constraint might be needed.")
-                        else:
-                             current_def = col_def + (" NOT NULL" if col_name in ['book_id', 'filename'] else "")
-                        
-                        cursor.execute(f"ALTER TABLE articles ADD COLUMN {col_name} {current_def.split('REFERENCES')[0].strip()}")
-                        logger.info(f"DB: Added column '{col_name}' to 'articles' table with definition: '{current_def}'.")
-                    except sqlite3.OperationalError as e:
-                        if "duplicate column name" in str(e).lower():
-                            logger.info(f"DB: Column '{col_name}' already exists in 'articles'.")
-                        else:
-                            logger.error(f"DB: Failed to add column '{col_name}' to 'articles': {e}", exc_info=True)
-            
-            # Check for UNIQUE (book_id, filename) constraint
-            # Method 1: Check table's DDL for "UNIQUE (book_id, filename)"
-            cursor.execute("SELECT sql FROM sqlite_master WHERE type='table' AND name='articles'")
-            table_sql_row = cursor.fetchone()
-            table_sql = table_sql_row['sql'] if table_sql_row else ""
-            
-            has_table_level_unique = "UNIQUE" in table_sql.upper() and \
-                                     "BOOK_ID" in table_sql.upper() and \
-                                     "FILENAME" in table_sql.upper() and \
-                                     table_sql.upper().count("(", table_sql.upper().find("UNIQUE")) > \
-                                     table_sql.upper().count(")", table_sql.upper().find("UNIQUE")) # crude check for (col, col)
-
-            # Method 2: Check for a unique index explicitly created on these columns
-            has_explicit_unique_index = False
-            indexes_info = cursor.execute("PRAGMA index_list(articles)").fetchall()
-            for index_row in indexes_info:
-                if index_row['unique'] == 1: # If it's a unique index
-                    # Get columns for this index
-                    index_cols_info = cursor.execute(f"PRAGMA index_info('{index_row['name']}')").fetchall()
-                    indexed_col_names = {col_info['name'] for col_info in index_cols_info}
-                    if 'book_id' in indexed_col_names and 'filename' in indexed_col_names and len(indexed_col_names) == 2:
-                        has_explicit_unique_index = True
-                        logger.info(f"DB: Found explicit unique index '{index_row['name']}' on (book_id, filename).")
-                        break
-            
-            if not has_table_level_unique and not has_explicit_unique_index:
-                logger.warning("DB: UNIQUE constraint/index on (book_id, filename) for 'articles' table appears to be missing.")
+        logger.info("DB: 'articles' table created with all columns and UNIQUE constraint on (book_id, filename).")
+    else: # Table exists, check for missing columns and add them
+        logger.info("DB: 'articles' table exists. Verifying columns...")
+        cols_to_add_articles = {
+            'book_id': 'INTEGER REFERENCES books(id) ON DELETE RESTRICT', 
+            'filename': 'TEXT', 
+            'processed_srt_path': 'TEXT NULLABLE',
+            'converted_mp3_path': 'TEXT NULLABLE',
+            'mp3_parts_folder_path': 'TEXT NULLABLE',
+            'num_audio_parts': 'INTEGER NULLABLE',
+            'audio_part_checksums': 'TEXT NULLABLE',
+            'audio_part_byte_ranges': 'TEXT NULLABLE',
+            'hls_folder_path': 'TEXT NULLABLE',
+            'num_hls_segments': 'INTEGER NULLABLE'
+        }
+        for col_name, col_def in cols_to_add_articles.items():
+            if col_name not in articles_columns:
                 try:
-                    cursor.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_articles_book_filename ON articles(book_id, filename)")
-                    logger.info("DB: Attempted to ensure UNIQUE INDEX idx_articles_book_filename ON articles(book_id, filename) exists.")
+                    if col_name in ['book_id', 'filename'] and articles_columns: 
+                         current_def = col_def + " NULLABLE" 
+                         logger.warning(f"DB: Adding '{col_name}' as NULLABLE to existing 'articles' table. Manual data fill and NOT NULL constraint might be needed.")
+                    else:
+                         current_def = col_def + (" NOT NULL" if col_name in ['book_id', 'filename'] else "")
+
+                    cursor.execute(f"ALTER TABLE articles ADD COLUMN {col_name} {current_def.split('REFERENCES')[0].strip()}")
+                    logger.info(f"DB: Added column '{col_name}' to 'articles' table with definition: '{current_def}'.")
                 except sqlite3.OperationalError as e:
-                    logger.error(f"DB: Could not create UNIQUE INDEX on articles(book_id, filename). This might be due to existing duplicate data. Error: {e}")
+                    if "duplicate column name" in str(e).lower():
+                        logger.info(f"DB: Column '{col_name}' already exists in 'articles'.")
+                    else:
+                        logger.error(f"DB: Failed to add column '{col_name}' to 'articles': {e}", exc_info=True)
 
-        # ... (rest of the init_db function for 'sentences' and 'reading_locations' tables) ...
-        # 3. Create sentences table
+        # Check for UNIQUE (book_id, filename) constraint
+        # Method 1: Check table's DDL for "UNIQUE (book_id, filename)"
+        cursor.execute("SELECT sql FROM sqlite_master WHERE type='table' AND name='articles'")
+        table_sql_row = cursor.fetchone()
+        table_sql = table_sql_row['sql'] if table_sql_row else ""
+
+        has_table_level_unique = "UNIQUE" in table_sql.upper() and \
+                                 "BOOK_ID" in table_sql.upper() and \
+                                 "FILENAME" in table_sql.upper() and \
+                                 table_sql.upper().count("(", table_sql.upper().find("UNIQUE")) > \
+                                 table_sql.upper().count(")", table_sql.upper().find("UNIQUE")) # crude check for (col, col)
+
+        # Method 2: Check for a unique index explicitly created on these columns
+        has_explicit_unique_index = False
+        indexes_info = cursor.execute("PRAGMA index_list(articles)").fetchall()
+        for index_row in indexes_info:
+            if index_row['unique'] == 1: # If it's a unique index
+                # Get columns for this index
+                index_cols_info = cursor.execute(f"PRAGMA index_info('{index_row['name']}')").fetchall()
+                indexed_col_names = {col_info['name'] for col_info in index_cols_info}
+                if 'book_id' in indexed_col_names and 'filename' in indexed_col_names and len(indexed_col_names) == 2:
+                    has_explicit_unique_index = True
+                    logger.info(f"DB: Found explicit unique index '{index_row['name']}' on (book_id, filename).")
+                    break
+
+        if not has_table_level_unique and not has_explicit_unique_index:
+            logger.warning("DB: UNIQUE constraint/index on (book_id, filename) for 'articles' table appears to be missing.")
+            try:
+                cursor.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_articles_book_filename ON articles(book_id, filename)")
+                logger.info("DB: Attempted to ensure UNIQUE INDEX idx_articles_book_filename ON articles(book_id, filename) exists.")
+            except sqlite3.OperationalError as e:
+                logger.error(f"DB: Could not create UNIQUE INDEX on articles(book_id, filename). This might be due to existing duplicate data. Error: {e}")
+
+    # ... (rest of the init_db function for 'sentences' and 'reading_locations' tables) ...
+    # 3. Create sentences table
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS sentences (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            article_id INTEGER NOT NULL,
+            paragraph_index INTEGER NOT NULL,
+            sentence_index_in_paragraph INTEGER NOT NULL,
+            english_text TEXT NOT NULL,
+            chinese_text TEXT NOT NULL,
+            start_time_ms INTEGER NULLABLE,
+            end_time_ms INTEGER NULLABLE,
+            audio_part_index INTEGER NULLABLE,
+            start_time_in_part_ms INTEGER NULLABLE,
+            end_time_in_part_ms INTEGER NULLABLE,
+            hls_segment_index INTEGER NULLABLE,
+            start_time_in_segment_ms INTEGER NULLABLE,
+            end_time_in_segment_ms INTEGER NULLABLE,
+            FOREIGN KEY (article_id) REFERENCES articles (id) ON DELETE CASCADE,
+            UNIQUE (article_id, paragraph_index, sentence_index_in_paragraph) 
+        )
+    ''')
+    logger.info("DB: Table 'sentences' checked/created.")
+
+    cursor.execute("PRAGMA table_info(sentences)")
+    sentences_columns = {col['name'] for col in cursor.fetchall()}
+    cols_to_add_sentences = {
+        'audio_part_index': 'INTEGER NULLABLE',
+        'start_time_in_part_ms': 'INTEGER NULLABLE',
+        'end_time_in_part_ms': 'INTEGER NULLABLE',
+        'hls_segment_index': 'INTEGER NULLABLE',
+        'start_time_in_segment_ms': 'INTEGER NULLABLE',
+        'end_time_in_segment_ms': 'INTEGER NULLABLE'
+    }
+    for col_name, col_type in cols_to_add_sentences.items():
+        if col_name not in sentences_columns:
+            try:
+                cursor.execute(f"ALTER TABLE sentences ADD COLUMN {col_name} {col_type}")
+                logger.info(f"DB: Added column '{col_name}' to 'sentences' table.")
+            except sqlite3.OperationalError as e:
+                if "duplicate column name" in str(e).lower():
+                    logger.info(f"DB: Column '{col_name}' already exists in 'sentences'.")
+                else:
+                    logger.error(f"DB: Failed to add column '{col_name}' to 'sentences': {e}", exc_info=True)
+
+    # 4. Create reading_locations table
+    cursor.execute("PRAGMA table_info(reading_locations)")
+    reading_loc_columns = {col['name'] for col in cursor.fetchall()}
+    if not reading_loc_columns:
+        logger.info("DB: 'reading_locations' table not found, creating new table.")
         cursor.execute('''
-            CREATE TABLE IF NOT EXISTS sentences (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                article_id INTEGER NOT NULL,
+            CREATE TABLE reading_locations (
+                article_id INTEGER PRIMARY KEY, 
+                book_id INTEGER NOT NULL,
                 paragraph_index INTEGER NOT NULL,
                 sentence_index_in_paragraph INTEGER NOT NULL,
-                english_text TEXT NOT NULL,
-                chinese_text TEXT NOT NULL,
-                start_time_ms INTEGER NULLABLE,
-                end_time_ms INTEGER NULLABLE,
-                audio_part_index INTEGER NULLABLE,
-                start_time_in_part_ms INTEGER NULLABLE,
-                end_time_in_part_ms INTEGER NULLABLE,
+                last_updated DATETIME DEFAULT CURRENT_TIMESTAMP,
                 FOREIGN KEY (article_id) REFERENCES articles (id) ON DELETE CASCADE,
-                UNIQUE (article_id, paragraph_index, sentence_index_in_paragraph) 
+                FOREIGN KEY (book_id) REFERENCES books (id) ON DELETE CASCADE
             )
         ''')
-        logger.info("DB: Table 'sentences' checked/created.")
-        
-        cursor.execute("PRAGMA table_info(sentences)")
-        sentences_columns = {col['name'] for col in cursor.fetchall()}
-        cols_to_add_sentences = {
-            'audio_part_index': 'INTEGER NULLABLE',
-            'start_time_in_part_ms': 'INTEGER NULLABLE',
-            'end_time_in_part_ms': 'INTEGER NULLABLE'
-        }
-        for col_name, col_type in cols_to_add_sentences.items():
-            if col_name not in sentences_columns:
-                try:
-                    cursor.execute(f"ALTER TABLE sentences ADD COLUMN {col_name} {col_type}")
-                    logger.info(f"DB: Added column '{col_name}' to 'sentences' table.")
-                except sqlite3.OperationalError as e:
-                    if "duplicate column name" in str(e).lower():
-                        logger.info(f"DB: Column '{col_name}' already exists in 'sentences'.")
-                    else:
-                        logger.error(f"DB: Failed to add column '{col_name}' to 'sentences': {e}", exc_info=True)
+        logger.info("DB: 'reading_locations' table created.")
+    else: 
+        if 'book_id' not in reading_loc_columns:
+            try:
+                cursor.execute("ALTER TABLE reading_locations ADD COLUMN book_id INTEGER REFERENCES books(id) ON DELETE CASCADE")
+                logger.info("DB: Added 'book_id' column to 'reading_locations'. It will be NULLABLE. Update existing rows if necessary.")
+            except sqlite3.OperationalError as e:
+                if "duplicate column name" in str(e).lower():
+                    logger.info("DB: Column 'book_id' already exists in 'reading_locations'.")
+                else:
+                    logger.error(f"DB: Failed to add 'book_id' to 'reading_locations': {e}", exc_info=True)
 
-        # 4. Create reading_locations table
-        cursor.execute("PRAGMA table_info(reading_locations)")
-        reading_loc_columns = {col['name'] for col in cursor.fetchall()}
-        if not reading_loc_columns:
-            logger.info("DB: 'reading_locations' table not found, creating new table.")
-            cursor.execute('''
-                CREATE TABLE reading_locations (
-                    article_id INTEGER PRIMARY KEY, 
-                    book_id INTEGER NOT NULL,
-                    paragraph_index INTEGER NOT NULL,
-                    sentence_index_in_paragraph INTEGER NOT NULL,
-                    last_updated DATETIME DEFAULT CURRENT_TIMESTAMP,
-                    FOREIGN KEY (article_id) REFERENCES articles (id) ON DELETE CASCADE,
-                    FOREIGN KEY (book_id) REFERENCES books (id) ON DELETE CASCADE
-                )
-            ''')
-            logger.info("DB: 'reading_locations' table created.")
-        else: 
-            if 'book_id' not in reading_loc_columns:
-                try:
-                    cursor.execute("ALTER TABLE reading_locations ADD COLUMN book_id INTEGER REFERENCES books(id) ON DELETE CASCADE")
-                    logger.info("DB: Added 'book_id' column to 'reading_locations'. It will be NULLABLE. Update existing rows if necessary.")
-                except sqlite3.OperationalError as e:
-                    if "duplicate column name" in str(e).lower():
-                        logger.info("DB: Column 'book_id' already exists in 'reading_locations'.")
-                    else:
-                        logger.error(f"DB: Failed to add 'book_id' to 'reading_locations': {e}", exc_info=True)
-        
-        conn.commit()
-        logger.info("DB: Database schema initialization/verification process complete.")
+    # 5. Create audio_renditions / sentence_rendition_parts tables (compact encoding profiles)
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS audio_renditions (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            article_id INTEGER NOT NULL,
+            profile TEXT NOT NULL,
+            file_path TEXT NOT NULL,
+            mimetype TEXT NOT NULL,
+            size_bytes INTEGER NULLABLE,
+            parts_folder_path TEXT NULLABLE,
+            num_parts INTEGER NULLABLE,
+            part_checksums TEXT NULLABLE,
+            FOREIGN KEY (article_id) REFERENCES articles (id) ON DELETE CASCADE,
+            UNIQUE (article_id, profile)
+        )
+    ''')
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS sentence_rendition_parts (
+            sentence_id INTEGER NOT NULL,
+            profile TEXT NOT NULL,
+            audio_part_index INTEGER NOT NULL,
+            start_time_in_part_ms INTEGER NOT NULL,
+            end_time_in_part_ms INTEGER NOT NULL,
+            PRIMARY KEY (sentence_id, profile),
+            FOREIGN KEY (sentence_id) REFERENCES sentences (id) ON DELETE CASCADE
+        )
+    ''')
+    logger.info("DB: Tables 'audio_renditions' and 'sentence_rendition_parts' checked/created.")
+
+    # 6. Create audio_metadata table (cache of probed/known audio file properties)
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS audio_metadata (
+            file_path TEXT PRIMARY KEY,
+            size_bytes INTEGER NOT NULL,
+            mtime_ns INTEGER NOT NULL,
+            duration_ms INTEGER NULLABLE,
+            bitrate_bps INTEGER NULLABLE,
+            codec TEXT NULLABLE,
+            sample_rate INTEGER NULLABLE,
+            channels INTEGER NULLABLE,
+            content_sha256 TEXT NULLABLE,
+            recorded_at DATETIME DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    logger.info("DB: Table 'audio_metadata' checked/created.")
+
+
+
+def _migration_0002_packed_sentence_timings(cursor, logger):
+    """Per-article packed timing arrays, filled in for articles that already have sentences."""
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS sentence_timings (
+            article_id INTEGER PRIMARY KEY,
+            sentence_count INTEGER NOT NULL,
+            timings BLOB NOT NULL,
+            FOREIGN KEY (article_id) REFERENCES articles (id) ON DELETE CASCADE
+        )
+    ''')
+    # Frozen copy of the packing as of this migration: five little-endian int32 arrays, NULL as -1
+    columns_by_article = {}
+    for article_id, *values in cursor.execute('''
+            SELECT article_id, start_time_ms, end_time_ms, audio_part_index, start_time_in_part_ms, end_time_in_part_ms
+            FROM sentences
+            ORDER BY article_id, paragraph_index, sentence_index_in_paragraph
+        ''').fetchall():
+        columns = columns_by_article.setdefault(article_id, ([], [], [], [], []))
+        for column, value in zip(columns, values):
+            column.append(-1 if value is None else value)
+    for article_id, columns in columns_by_article.items():
+        packed = array('i', (value for column in columns for value in column))
+        if sys.byteorder == 'big':
+            packed.byteswap()
+        cursor.execute("INSERT OR REPLACE INTO sentence_timings (article_id, sentence_count, timings) VALUES (?, ?, ?)",
+                       (article_id, len(columns[0]), packed.tobytes()))
+    logger.info(f"DB: Table 'sentence_timings' created, packed timings stored for {len(columns_by_article)} articles.")
+
+
+
+def _migration_0003_sentence_search_index(cursor, logger):
+    """
+    FTS5 index over sentence texts, kept in sync by triggers. The trigram tokenizer needs no word
+    segmentation, so the same index serves English and Chinese.
+    """
+    try:
+        cursor.execute('''
+            CREATE VIRTUAL TABLE IF NOT EXISTS sentences_fts USING fts5(
+                english_text, chinese_text,
+                content='sentences', content_rowid='id', tokenize='trigram'
+            )
+        ''')
+    except sqlite3.OperationalError as e: # SQLite built without FTS5 or older than 3.34 (no trigram tokenizer)
+        # The missing table is the record of this: search_sentences then matches every term with LIKE.
+        logger.warning(f"DB: Full-text search unavailable, skipping 'sentences_fts'; search will scan sentences: {e}")
+        return
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS sentences_fts_insert AFTER INSERT ON sentences BEGIN
+            INSERT INTO sentences_fts (rowid, english_text, chinese_text) VALUES (new.id, new.english_text, new.chinese_text);
+        END
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS sentences_fts_delete AFTER DELETE ON sentences BEGIN
+            INSERT INTO sentences_fts (sentences_fts, rowid, english_text, chinese_text)
+            VALUES ('delete', old.id, old.english_text, old.chinese_text);
+        END
+    ''')
+    # Only text edits touch the index; timing updates don't fire this trigger.
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS sentences_fts_update AFTER UPDATE OF english_text, chinese_text ON sentences BEGIN
+            INSERT INTO sentences_fts (sentences_fts, rowid, english_text, chinese_text)
+            VALUES ('delete', old.id, old.english_text, old.chinese_text);
+            INSERT INTO sentences_fts (rowid, english_text, chinese_text) VALUES (new.id, new.english_text, new.chinese_text);
+        END
+    ''')
+    cursor.execute("INSERT INTO sentences_fts (sentences_fts) VALUES ('rebuild')")
+    logger.info("DB: Full-text index 'sentences_fts' created and populated.")
+
+
+
+def _migration_0004_article_content_version(cursor, logger):
+    """Per-article counter bumped whenever what view_article renders changes (see _bump_content_version)."""
+    cursor.execute("ALTER TABLE articles ADD COLUMN content_version INTEGER NOT NULL DEFAULT 0")
+    logger.info("DB: Added 'content_version' column to 'articles' table.")
+
+
+def _migration_0005_sampled_audio_fingerprints(cursor, logger):
+    """Sampled fingerprints (see audio_processor.calculate_sampled_fingerprint) next to the SHA-256 checksums."""
+    cursor.execute("ALTER TABLE articles ADD COLUMN audio_part_fingerprints TEXT NULLABLE")
+    cursor.execute("ALTER TABLE audio_renditions ADD COLUMN part_fingerprints TEXT NULLABLE")
+    cursor.execute("ALTER TABLE audio_metadata ADD COLUMN content_fingerprint TEXT NULLABLE")
+    logger.info("DB: Added sampled audio fingerprint columns to 'articles', 'audio_renditions' and 'audio_metadata'.")
+
+
+def _migration_0006_upload_sessions(cursor, logger):
+    """Resumable chunked uploads (see chunked_upload.py): one row per unfinished or unclaimed upload."""
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS upload_sessions (
+            id TEXT PRIMARY KEY,
+            filename TEXT NOT NULL,
+            total_size INTEGER NOT NULL,
+            received_bytes INTEGER NOT NULL DEFAULT 0,
+            sha256 TEXT NULLABLE,
+            staging_path TEXT NOT NULL,
+            created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+            updated_at DATETIME DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    logger.info("DB: Table 'upload_sessions' created.")
+
+
+def _migration_0007_sentence_short_term_index(cursor, logger):
+    """
+    Every Chinese character and character pair of each sentence, for search terms too short for the
+    trigram index (see _sentence_search_grams, which maintains it for new sentences).
+    """
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS sentence_grams (
+            gram TEXT NOT NULL,
+            sentence_id INTEGER NOT NULL REFERENCES sentences(id) ON DELETE CASCADE,
+            PRIMARY KEY (gram, sentence_id)
+        ) WITHOUT ROWID
+    ''')
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_sentence_grams_sentence ON sentence_grams(sentence_id)")
+    # Frozen copy of the gram extraction as of this migration
+    cjk_runs = re.compile('[\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff]+')
+    rows = []
+    for sentence_id, english_text, chinese_text in cursor.execute(
+            "SELECT id, english_text, chinese_text FROM sentences").fetchall():
+        grams = set()
+        for text in (english_text, chinese_text):
+            for run in cjk_runs.findall(text or ''):
+                grams.update(run)
+                grams.update(run[i:i + 2] for i in range(len(run) - 1))
+        rows.extend((gram, sentence_id) for gram in grams)
+    cursor.executemany("INSERT OR IGNORE INTO sentence_grams (gram, sentence_id) VALUES (?, ?)", rows)
+    logger.info(f"DB: Table 'sentence_grams' created with {len(rows)} entries.")
+
+
+def _migration_0008_converted_mp3_fingerprint(cursor, logger):
+    """
+    Sampled fingerprint of the whole converted MP3, for unsplit articles (see update_article_converted_mp3_path),
+    so view_article reads it with the article instead of looking it up in audio_metadata on every view.
+    """
+    cursor.execute("ALTER TABLE articles ADD COLUMN converted_mp3_fingerprint TEXT NULLABLE")
+    cursor.execute("""
+        UPDATE articles SET converted_mp3_fingerprint = (
+            SELECT content_fingerprint FROM audio_metadata WHERE file_path = articles.converted_mp3_path
+        )
+        WHERE converted_mp3_path IS NOT NULL
+    """)
+    logger.info("DB: Added 'converted_mp3_fingerprint' column to 'articles' table.")
+
+
+# Numbered schema migrations; PRAGMA user_version holds the number of the last one applied.
+# Append new migrations to the end of this list and never edit one that has shipped.
+MIGRATIONS = [
+    (1, "baseline schema", _migration_0001_baseline),
+    (2, "packed sentence timings", _migration_0002_packed_sentence_timings),
+    (3, "sentence full-text search", _migration_0003_sentence_search_index),
+    (4, "article content version", _migration_0004_article_content_version),
+    (5, "sampled audio fingerprints", _migration_0005_sampled_audio_fingerprints),
+    (6, "resumable upload sessions", _migration_0006_upload_sessions),
+    (7, "sentence short-term search index", _migration_0007_sentence_short_term_index),
+    (8, "converted MP3 fingerprint", _migration_0008_converted_mp3_fingerprint),
+]
+SCHEMA_VERSION = MIGRATIONS[-1][0]
+
+
+def get_schema_version(conn):
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+
+def migrate_db(app_logger=None):
+    """Applies pending MIGRATIONS, each in its own transaction together with its user_version bump.
+    Also (re)applies SQLITE_JOURNAL_MODE. Returns the number of migrations applied; raises sqlite3.Error on failure."""
+    logger = app_logger if app_logger else default_logger
+    conn = get_db_connection()
+    applied = 0
+    try:
+        journal_mode = conn.execute(f"PRAGMA journal_mode = {SQLITE_SETTINGS['SQLITE_JOURNAL_MODE']}").fetchone()[0]
+        logger.info(f"DB: Journal mode is '{journal_mode}'.")
+        for version, description, migration in MIGRATIONS:
+            if version <= get_schema_version(conn):
+                continue
+            conn.execute("BEGIN IMMEDIATE")
+            if version <= get_schema_version(conn): # Another worker migrated while we waited for the lock
+                conn.rollback()
+                continue
+            logger.info(f"DB: Applying migration {version} ({description}).")
+            migration(conn.cursor(), logger)
+            conn.execute(f"PRAGMA user_version = {int(version)}")
+            conn.commit()
+            applied += 1
+        logger.info(f"DB: Schema is at version {get_schema_version(conn)} ({applied} migration(s) applied).")
+        return applied
     except sqlite3.Error as e:
-        logger.error(f"DB: Database error during schema initialization: {e}", exc_info=True)
+        logger.error(f"DB: Database error during schema migration: {e}", exc_info=True)
         if conn: conn.rollback()
+        raise
+    finally:
+        if conn: conn.close()
+
+
+def init_db(app=None, auto_migrate=True):
+    """Checks the schema version at startup (a single PRAGMA read when up to date) and applies
+    pending migrations if auto_migrate is set; otherwise they are left to `flask migrate-db`.
+    A failed migration raises sqlite3.Error (logged by migrate_db): the app must not start on an older schema."""
+    logger = app.logger if app and hasattr(app, 'logger') else default_logger
+    if app is not None:
+        configure_sqlite(app.config)
+        close_thread_connection() # Reopen with the configured settings
+    conn = get_db_connection()
+    try:
+        version = get_schema_version(conn)
     finally:
         if conn: conn.close()
+    if version >= SCHEMA_VERSION:
+        logger.info(f"DB: Schema is up to date (version {version}).")
+        return
+    if not auto_migrate:
+        logger.warning(f"DB: Schema is at version {version}, code expects {SCHEMA_VERSION}. Run `flask migrate-db`.")
+        return
+    migrate_db(app_logger=logger)
 
 # ... (rest of db_manager.py functions: add_book, get_book_by_id, etc. remain the same as previously provided)
 # Ensure the previously provided full db_manager.py is used from here down, as only init_db was the issue.
@@ -314,16 +760,31 @@ def add_article(book_id, filename_stem, app_logger=None):
         if existing_article:
             article_id = existing_article['id']
             logger.info(f"DB: Article '{filename_stem}' (ID: {article_id}) already exists in book {book_id}. Preparing for re-processing.")
+            # Cached metadata (incl. sampled fingerprints) of the audio files being replaced
+            cursor.execute("""
+                DELETE FROM audio_metadata WHERE file_path IN (
+                    SELECT converted_mp3_path FROM articles WHERE id = ?
+                    UNION SELECT file_path FROM audio_renditions WHERE article_id = ?
+                )
+            """, (article_id, article_id))
             cursor.execute("""
                 UPDATE articles
                 SET upload_timestamp = CURRENT_TIMESTAMP,
-                    processed_srt_path = NULL, converted_mp3_path = NULL,
+                    processed_srt_path = NULL, converted_mp3_path = NULL, converted_mp3_fingerprint = NULL,
                     mp3_parts_folder_path = NULL, num_audio_parts = NULL,
-                    audio_part_checksums = NULL
+                    audio_part_checksums = NULL, audio_part_byte_ranges = NULL, audio_part_fingerprints = NULL,
+                    hls_folder_path = NULL, num_hls_segments = NULL,
+                    content_version = content_version + 1
                 WHERE id = ?
             """, (article_id,))
             cursor.execute("DELETE FROM sentences WHERE article_id = ?", (article_id,))
             cursor.execute("DELETE FROM reading_locations WHERE article_id = ?", (article_id,))
+            cursor.execute("DELETE FROM audio_renditions WHERE article_id = ?", (article_id,))
+            cursor.execute("DELETE FROM sentence_timings WHERE article_id = ?", (article_id,))
+            # Dropped while this transaction holds the write lock: a flush either committed before the
+            # DELETE above or snapshots the buffer after this commit (see flush_reading_locations)
+            with _pending_reading_locations_lock:
+                _pending_reading_locations.pop((DATABASE_PATH, article_id), None)
             logger.info(f"DB: Cleared existing sentences and reset processing fields for article ID {article_id}.")
         else:
             cursor.execute("INSERT INTO articles (book_id, filename) VALUES (?, ?)", (book_id, filename_stem))
@@ -355,7 +816,8 @@ def get_articles_for_book(book_id, app_logger=None):
         cursor = conn.cursor()
         cursor.execute("""
             SELECT id, filename, upload_timestamp, processed_srt_path, converted_mp3_path,
-                   mp3_parts_folder_path, num_audio_parts, book_id, audio_part_checksums
+                   mp3_parts_folder_path, num_audio_parts, book_id, audio_part_checksums,
+                   audio_part_byte_ranges, hls_folder_path, num_hls_segments
             FROM articles
             WHERE book_id = ?
             ORDER BY filename ASC
@@ -368,14 +830,18 @@ def get_articles_for_book(book_id, app_logger=None):
     finally:
         if conn: conn.close()
 
+ARTICLE_COLUMNS = ('id', 'book_id', 'filename', 'upload_timestamp', 'processed_srt_path', 'converted_mp3_path',
+                   'mp3_parts_folder_path', 'num_audio_parts', 'audio_part_checksums', 'audio_part_byte_ranges',
+                   'hls_folder_path', 'num_hls_segments', 'content_version', 'audio_part_fingerprints',
+                   'converted_mp3_fingerprint')
+
 def get_article_by_id(article_id, app_logger=None):
     logger = app_logger if app_logger else default_logger
     conn = get_db_connection()
     try:
         cursor = conn.cursor()
-        cursor.execute("""
-            SELECT id, book_id, filename, upload_timestamp, processed_srt_path, converted_mp3_path,
-                   mp3_parts_folder_path, num_audio_parts, audio_part_checksums
+        cursor.execute(f"""
+            SELECT {', '.join(ARTICLE_COLUMNS)}
             FROM articles
             WHERE id = ?
         """, (article_id,))
@@ -387,6 +853,87 @@ def get_article_by_id(article_id, app_logger=None):
     finally:
         if conn: conn.close()
 
+def get_article_with_book(article_id, app_logger=None):
+    """
+    An article with its book and reading location in one query, for views and processing paths
+    that need all three. Returns (article, book, reading_location) as dicts; book and reading_location
+    are None if missing, and all three are None if the article doesn't exist (or on error).
+    """
+    logger = app_logger if app_logger else default_logger
+    with _pending_reading_locations_lock:
+        buffered_location = _pending_reading_locations.get((DATABASE_PATH, article_id))
+    conn = get_db_connection()
+    try:
+        cursor = conn.cursor()
+        cursor.execute(f"""
+            SELECT {', '.join('a.' + column for column in ARTICLE_COLUMNS)},
+                   b.title AS book_title, b.creation_timestamp AS book_creation_timestamp,
+                   rl.paragraph_index AS rl_paragraph_index,
+                   rl.sentence_index_in_paragraph AS rl_sentence_index_in_paragraph,
+                   rl.last_updated AS rl_last_updated
+            FROM articles a
+            LEFT JOIN books b ON b.id = a.book_id
+            LEFT JOIN reading_locations rl ON rl.article_id = a.id
+            WHERE a.id = ?
+        """, (article_id,))
+        row = cursor.fetchone()
+        if not row:
+            return None, None, None
+        article = {column: row[column] for column in ARTICLE_COLUMNS}
+        book = None
+        if row['book_title'] is not None:
+            book = {'id': row['book_id'], 'title': row['book_title'], 'creation_timestamp': row['book_creation_timestamp']}
+        reading_location = None
+        if buffered_location:
+            reading_location = _buffered_location_row(article_id, buffered_location)
+        elif row['rl_paragraph_index'] is not None:
+            reading_location = {'article_id': article_id, 'book_id': row['book_id'],
+                                'paragraph_index': row['rl_paragraph_index'],
+                                'sentence_index_in_paragraph': row['rl_sentence_index_in_paragraph'],
+                                'last_updated': row['rl_last_updated']}
+        return article, book, reading_location
+    except sqlite3.Error as e:
+        logger.error(f"DB: Error fetching article {article_id} with its book: {e}", exc_info=True)
+        return None, None, None
+    finally:
+        if conn: conn.close()
+
+def get_article_book_ids(article_ids, app_logger=None):
+    """Returns {article_id: book_id} for the given article ids that exist."""
+    logger = app_logger if app_logger else default_logger
+    if not article_ids:
+        return {}
+    conn = get_db_connection()
+    try:
+        cursor = conn.cursor()
+        cursor.execute("SELECT id, book_id FROM articles WHERE id IN (SELECT value FROM json_each(?))",
+                       (json.dumps(list(article_ids)),))
+        return {row['id']: row['book_id'] for row in cursor.fetchall()}
+    except sqlite3.Error as e:
+        logger.error(f"DB: Error fetching book ids for articles {list(article_ids)[:10]}: {e}", exc_info=True)
+        return {}
+    finally:
+        if conn: conn.close()
+
+def get_articles_with_audio_parts(app_logger=None):
+    logger = app_logger if app_logger else default_logger
+    conn = get_db_connection()
+    try:
+        cursor = conn.cursor()
+        cursor.execute("""
+            SELECT id, book_id, filename, converted_mp3_path, mp3_parts_folder_path, num_audio_parts,
+                   audio_part_checksums, audio_part_byte_ranges
+            FROM articles
+            WHERE num_audio_parts IS NOT NULL AND num_audio_parts > 0
+            ORDER BY id ASC
+        """)
+        return cursor.fetchall()
+    except sqlite3.Error as e:
+        logger.error(f"DB: Error fetching articles with audio parts: {e}", exc_info=True)
+        return []
+    finally:
+        if conn: conn.close()
+
 # --- Sentence Functions ---
 def add_sentences_batch(article_id, sentences_data, app_logger=None):
     logger = app_logger if app_logger else default_logger
@@ -400,11 +947,17 @@ def add_sentences_batch(article_id, sentences_data, app_logger=None):
             (article_id, s_data[0], s_data[1], s_data[2], s_data[3])
             for s_data in sentences_data
         ]
-        cursor.executemany('''
-            INSERT INTO sentences (article_id, paragraph_index, sentence_index_in_paragraph,
-                                   english_text, chinese_text)
-            VALUES (?, ?, ?, ?, ?)
-        ''', data_to_insert)
+        gram_rows = []
+        for row in data_to_insert:
+            cursor.execute('''
+                INSERT INTO sentences (article_id, paragraph_index, sentence_index_in_paragraph,
+                                       english_text, chinese_text)
+                VALUES (?, ?, ?, ?, ?)
+            ''', row)
+            gram_rows.extend((gram, cursor.lastrowid) for gram in _sentence_search_grams(row[3], row[4]))
+        cursor.executemany("INSERT OR IGNORE INTO sentence_grams (gram, sentence_id) VALUES (?, ?)", gram_rows)
+        cursor.execute("DELETE FROM sentence_timings WHERE article_id = ?", (article_id,)) # Stale now
+        _bump_content_version(cursor, article_id)
         conn.commit()
         logger.info(f"DB: Batch added {len(data_to_insert)} sentences for article {article_id}.")
         return len(data_to_insert)
@@ -428,7 +981,8 @@ def get_sentences_for_article(article_id, app_logger=None):
             SELECT id, article_id, paragraph_index, sentence_index_in_paragraph,
                    english_text, chinese_text,
                    start_time_ms, end_time_ms,
-                   audio_part_index, start_time_in_part_ms, end_time_in_part_ms
+                   audio_part_index, start_time_in_part_ms, end_time_in_part_ms,
+                   hls_segment_index, start_time_in_segment_ms, end_time_in_segment_ms
             FROM sentences
             WHERE article_id = ?
             ORDER BY paragraph_index, sentence_index_in_paragraph
@@ -441,6 +995,193 @@ def get_sentences_for_article(article_id, app_logger=None):
     finally:
         if conn: conn.close()
 
+def get_sentence_window(article_id, start=None, before=None, limit=200, app_logger=None):
+    """
+    Keyset page of an article's sentences in reading order, for rendering long articles piecewise.
+    start=(paragraph_index, sentence_index_in_paragraph): the first `limit` sentences from that key on (inclusive).
+    before=(paragraph_index, sentence_index_in_paragraph): the last `limit` sentences before that key.
+    Neither: the article's first `limit` sentences. Seeks on the (article_id, paragraph_index,
+    sentence_index_in_paragraph) unique index, so the cost doesn't depend on where the window is.
+    """
+    logger = app_logger if app_logger else default_logger
+    columns = '''paragraph_index, sentence_index_in_paragraph, english_text, chinese_text,
+                   start_time_ms, end_time_ms,
+                   audio_part_index, start_time_in_part_ms, end_time_in_part_ms'''
+    conn = get_db_connection()
+    try:
+        cursor = conn.cursor()
+        if before is not None:
+            cursor.execute(f'''
+                SELECT {columns} FROM sentences
+                WHERE article_id = ? AND (paragraph_index, sentence_index_in_paragraph) < (?, ?)
+                ORDER BY paragraph_index DESC, sentence_index_in_paragraph DESC
+                LIMIT ?
+            ''', (article_id, before[0], before[1], limit))
+            return cursor.fetchall()[::-1]
+        start = start if start is not None else (-1, -1)
+        cursor.execute(f'''
+            SELECT {columns} FROM sentences
+            WHERE article_id = ? AND (paragraph_index, sentence_index_in_paragraph) >= (?, ?)
+            ORDER BY paragraph_index, sentence_index_in_paragraph
+            LIMIT ?
+        ''', (article_id, start[0], start[1], limit))
+        return cursor.fetchall()
+    except sqlite3.Error as e:
+        logger.error(f"DB: Error fetching sentence window for article {article_id}: {e}", exc_info=True)
+        return []
+    finally:
+        if conn: conn.close()
+
+def iter_article_sentences(article_id, batch_size=1000, app_logger=None):
+    """All of an article's sentences in reading order (get_sentence_window columns), one keyset page at a time."""
+    start = None
+    while True:
+        rows = get_sentence_window(article_id, start=start, limit=batch_size, app_logger=app_logger)
+        yield from rows
+        if len(rows) < batch_size:
+            return
+        start = (rows[-1]['paragraph_index'], rows[-1]['sentence_index_in_paragraph'] + 1)
+
+def get_sentence_count_for_article(article_id, app_logger=None):
+    """Number of sentences in an article, from sentence_timings when present (no scan), else COUNT(*)."""
+    logger = app_logger if app_logger else default_logger
+    conn = get_db_connection()
+    try:
+        row = conn.execute("SELECT sentence_count FROM sentence_timings WHERE article_id = ?", (article_id,)).fetchone()
+        if row:
+            return row['sentence_count']
+        return conn.execute("SELECT COUNT(*) FROM sentences WHERE article_id = ?", (article_id,)).fetchone()[0]
+    except sqlite3.Error as e:
+        logger.error(f"DB: Error counting sentences for article {article_id}: {e}", exc_info=True)
+        return 0
+    finally:
+        if conn: conn.close()
+
+def article_has_sentence_timestamps(article_id, app_logger=None):
+    logger = app_logger if app_logger else default_logger
+    conn = get_db_connection()
+    try:
+        row = conn.execute("""
+            SELECT 1 FROM sentences
+            WHERE article_id = ? AND start_time_ms IS NOT NULL AND end_time_ms IS NOT NULL
+            LIMIT 1
+        """, (article_id,)).fetchone()
+        return row is not None
+    except sqlite3.Error as e:
+        logger.error(f"DB: Error checking timestamps for article {article_id}: {e}", exc_info=True)
+        return False
+    finally:
+        if conn: conn.close()
+
+def get_sentence_texts_for_article(article_id, app_logger=None):
+    """Like get_sentences_for_article without the timing columns; pair with get_packed_sentence_timings."""
+    logger = app_logger if app_logger else default_logger
+    conn = get_db_connection()
+    try:
+        cursor = conn.cursor()
+        cursor.execute('''
+            SELECT paragraph_index, sentence_index_in_paragraph, english_text, chinese_text
+            FROM sentences
+            WHERE article_id = ?
+            ORDER BY paragraph_index, sentence_index_in_paragraph
+        ''', (article_id,))
+        return cursor.fetchall()
+    except sqlite3.Error as e:
+        logger.error(f"DB: Error fetching sentence texts for article {article_id}: {e}", exc_info=True)
+        return []
+    finally:
+        if conn: conn.close()
+
+def pack_sentence_timings(rows):
+    """rows: sequences of the PACKED_TIMING_FIELDS values (in that order), in sentence order. Returns the BLOB for sentence_timings."""
+    values = array('i', (PACKED_TIMING_NULL if value is None else value
+                         for column in zip(*rows) for value in column))
+    if sys.byteorder == 'big':
+        values.byteswap()
+    return values.tobytes()
+
+def unpack_sentence_timings(blob, sentence_count):
+    """
+    Returns {field: sequence of ints} for a sentence_timings BLOB, or None if its size doesn't match.
+    On little-endian hosts the sequences are memoryview slices over the BLOB (no copy);
+    numpy.frombuffer(blob, '<i4').reshape(len(PACKED_TIMING_FIELDS), -1) gives the same data as a matrix.
+    """
+    if len(blob) != 4 * len(PACKED_TIMING_FIELDS) * sentence_count:
+        return None
+    if sys.byteorder == 'little':
+        values = memoryview(blob).cast('i')
+    else:
+        values = array('i', blob)
+        values.byteswap()
+    return {field: values[i * sentence_count:(i + 1) * sentence_count] for i, field in enumerate(PACKED_TIMING_FIELDS)}
+
+def _bump_content_version(cursor, article_id):
+    """Invalidates cached renderings of the article (within the caller's transaction)."""
+    cursor.execute("UPDATE articles SET content_version = content_version + 1 WHERE id = ?", (article_id,))
+
+def _store_packed_sentence_timings(cursor, article_id):
+    """Rebuilds an article's sentence_timings row from its sentences (within the caller's transaction)."""
+    tuple_cursor = cursor.connection.cursor()
+    tuple_cursor.row_factory = None # Plain tuples; building sqlite3.Row objects is most of the cost here
+    rows = tuple_cursor.execute(f"""
+        SELECT {', '.join(PACKED_TIMING_FIELDS)} FROM sentences
+        WHERE article_id = ?
+        ORDER BY paragraph_index, sentence_index_in_paragraph
+    """, (article_id,)).fetchall()
+    if not rows:
+        cursor.execute("DELETE FROM sentence_timings WHERE article_id = ?", (article_id,))
+        return
+    cursor.execute("INSERT OR REPLACE INTO sentence_timings (article_id, sentence_count, timings) VALUES (?, ?, ?)",
+                   (article_id, len(rows), pack_sentence_timings(rows)))
+
+def _load_packed_sentence_timings_for_update(cursor, article_id):
+    """
+    (sentence_count, {field: array of ints}) copied out of an article's sentence_timings BLOB, for a
+    writer to change in memory and store with _save_packed_sentence_timings. None if the article has
+    no usable row (the caller then rebuilds it with _store_packed_sentence_timings).
+    """
+    row = cursor.execute("SELECT sentence_count, timings FROM sentence_timings WHERE article_id = ?",
+                         (article_id,)).fetchone()
+    if not row or len(row['timings']) != 4 * len(PACKED_TIMING_FIELDS) * row['sentence_count']:
+        return None
+    values = array('i', row['timings'])
+    if sys.byteorder == 'big':
+        values.byteswap()
+    sentence_count = row['sentence_count']
+    return sentence_count, {field: values[i * sentence_count:(i + 1) * sentence_count]
+                            for i, field in enumerate(PACKED_TIMING_FIELDS)}
+
+def _save_packed_sentence_timings(cursor, article_id, sentence_count, timings):
+    """Stores timings as returned (and changed) by _load_packed_sentence_timings_for_update."""
+    values = array('i')
+    for field in PACKED_TIMING_FIELDS:
+        values.extend(timings[field])
+    if sys.byteorder == 'big':
+        values.byteswap()
+    cursor.execute("UPDATE sentence_timings SET timings = ? WHERE article_id = ?", (values.tobytes(), article_id))
+
+def _packed_timing_value(value):
+    return PACKED_TIMING_NULL if value is None else int(value)
+
+def get_packed_sentence_timings(article_id, app_logger=None):
+    """Returns (sentence_count, {field: values}) from sentence_timings, or None if the article has no usable row."""
+    logger = app_logger if app_logger else default_logger
+    conn = get_db_connection()
+    try:
+        row = conn.execute("SELECT sentence_count, timings FROM sentence_timings WHERE article_id = ?", (article_id,)).fetchone()
+        if not row:
+            return None
+        timings = unpack_sentence_timings(row['timings'], row['sentence_count'])
+        if timings is None:
+            logger.warning(f"DB: Packed timings for article {article_id} have an unexpected size; ignoring them.")
+            return None
+        return row['sentence_count'], timings
+    except sqlite3.Error as e:
+        logger.error(f"DB: Error fetching packed timings for article {article_id}: {e}", exc_info=True)
+        return None
+    finally:
+        if conn: conn.close()
+
 def get_sentence_ids_for_article_in_order(article_id, app_logger=None):
     logger = app_logger if app_logger else default_logger
     conn = get_db_connection()
@@ -514,9 +1255,21 @@ def update_sentence_timestamps(article_id, timestamps_data, app_logger=None):
             SET start_time_ms = ?, end_time_ms = ?
             WHERE id = ?
         """, updates)
+        updated_count = cursor.rowcount
+        # updates[i] is the i-th sentence in order, so the packed row is patched without re-reading the sentences
+        packed = _load_packed_sentence_timings_for_update(cursor, article_id)
+        if packed and packed[0] == len(sentence_ids_rows):
+            sentence_count, timings = packed
+            for i, (current_start_ms, current_end_ms, _) in enumerate(updates):
+                timings['start_time_ms'][i] = _packed_timing_value(current_start_ms)
+                timings['end_time_ms'][i] = _packed_timing_value(current_end_ms)
+            _save_packed_sentence_timings(cursor, article_id, sentence_count, timings)
+        else:
+            _store_packed_sentence_timings(cursor, article_id)
+        _bump_content_version(cursor, article_id)
         conn.commit()
-        logger.info(f"DB: Committed {cursor.rowcount} timestamp updates for article {article_id}. Expected {len(updates)}.")
-        return cursor.rowcount
+        logger.info(f"DB: Committed {updated_count} timestamp updates for article {article_id}. Expected {len(updates)}.")
+        return updated_count
     except sqlite3.Error as e:
         logger.error(f"DB: Database error updating timestamps for article {article_id}: {e}", exc_info=True)
         if conn: conn.rollback()
@@ -540,12 +1293,14 @@ def update_article_srt_path(article_id, srt_path, app_logger=None):
     finally:
         if conn: conn.close()
 
-def update_article_converted_mp3_path(article_id, mp3_path, app_logger=None):
+def update_article_converted_mp3_path(article_id, mp3_path, fingerprint=None, app_logger=None):
+    """fingerprint: the MP3's sampled fingerprint, served to clients for verifying a local copy of an unsplit article."""
     logger = app_logger if app_logger else default_logger
     conn = get_db_connection()
     try:
         cursor = conn.cursor()
-        cursor.execute("UPDATE articles SET converted_mp3_path = ? WHERE id = ?", (mp3_path, article_id))
+        cursor.execute("UPDATE articles SET converted_mp3_path = ?, converted_mp3_fingerprint = ? WHERE id = ?",
+                       (mp3_path, fingerprint, article_id))
         conn.commit()
         logger.info(f"DB: Updated converted_mp3_path for article {article_id} to '{mp3_path}'.")
     except sqlite3.Error as e:
@@ -555,9 +1310,41 @@ def update_article_converted_mp3_path(article_id, mp3_path, app_logger=None):
     finally:
         if conn: conn.close()
 
-def update_article_mp3_parts_info(article_id, parts_folder_path, num_parts, part_checksums_list=None, app_logger=None):
+def format_audio_part_byte_ranges(part_byte_ranges_list):
+    """[(start, end), ...] -> "start-end;start-end;..." as stored in articles.audio_part_byte_ranges."""
+    if not part_byte_ranges_list:
+        return None
+    return AUDIO_PART_CHECKSUM_DELIMITER.join(
+        f"{int(start)}{AUDIO_PART_BYTE_RANGE_SEPARATOR}{int(end)}" for start, end in part_byte_ranges_list
+    )
+
+def parse_audio_part_byte_ranges(byte_ranges_str):
+    """Inverse of format_audio_part_byte_ranges. Returns [] for NULL/empty or malformed values."""
+    if not byte_ranges_str:
+        return []
+    try:
+        ranges = []
+        for item in byte_ranges_str.split(AUDIO_PART_CHECKSUM_DELIMITER):
+            start_str, end_str = item.split(AUDIO_PART_BYTE_RANGE_SEPARATOR)
+            ranges.append((int(start_str), int(end_str)))
+        return ranges
+    except ValueError:
+        default_logger.warning(f"DB: Malformed audio_part_byte_ranges value '{byte_ranges_str[:50]}'.")
+        return []
+
+def _join_per_part_values(values, num_parts):
+    """Per-part strings joined with AUDIO_PART_CHECKSUM_DELIMITER, or None unless there is one per part."""
+    if not values or num_parts <= 0 or len(values) != num_parts:
+        return None
+    return AUDIO_PART_CHECKSUM_DELIMITER.join(value if isinstance(value, str) else "" for value in values)
+
+def update_article_mp3_parts_info(article_id, parts_folder_path, num_parts, part_checksums_list=None,
+                                  part_byte_ranges_list=None, part_fingerprints_list=None, app_logger=None):
+    # parts_folder_path is None for virtual parts, which are described by part_byte_ranges_list
+    # (byte ranges of the article's converted MP3) instead of files on disk.
     logger = app_logger if app_logger else default_logger
     conn = get_db_connection()
+    fingerprints_str = _join_per_part_values(part_fingerprints_list, num_parts)
     
     concatenated_checksums_str = None
     if part_checksums_list and num_parts > 0:
@@ -569,18 +1356,29 @@ def update_article_mp3_parts_info(article_id, parts_folder_path, num_parts, part
     elif num_parts == 0:
          logger.info(f"DB: num_parts is 0 for article {article_id}, storing NULL for checksums.")
 
+    byte_ranges_str = None
+    if part_byte_ranges_list and num_parts > 0:
+        if len(part_byte_ranges_list) == num_parts:
+            byte_ranges_str = format_audio_part_byte_ranges(part_byte_ranges_list)
+        else:
+            logger.warning(f"DB: Byte range list length ({len(part_byte_ranges_list)}) != num_parts ({num_parts}) for article {article_id}. Storing NULL for byte ranges.")
+
     try:
         cursor = conn.cursor()
         cursor.execute("""
             UPDATE articles
-            SET mp3_parts_folder_path = ?, num_audio_parts = ?, audio_part_checksums = ?
+            SET mp3_parts_folder_path = ?, num_audio_parts = ?, audio_part_checksums = ?, audio_part_byte_ranges = ?,
+                audio_part_fingerprints = ?
             WHERE id = ?
         """, (parts_folder_path if num_parts > 0 else None, 
               num_parts if num_parts > 0 else None, 
               concatenated_checksums_str, 
+              byte_ranges_str,
+              fingerprints_str,
               article_id))
+        _bump_content_version(cursor, article_id)
         conn.commit()
-        logger.info(f"DB: Updated MP3 parts info for article {article_id}: path='{parts_folder_path}', num_parts={num_parts}, checksums_stored={'YES' if concatenated_checksums_str else 'NO'}.")
+        logger.info(f"DB: Updated MP3 parts info for article {article_id}: path='{parts_folder_path}', num_parts={num_parts}, checksums_stored={'YES' if concatenated_checksums_str else 'NO'}, virtual={'YES' if byte_ranges_str else 'NO'}.")
     except sqlite3.Error as e:
         logger.error(f"DB: Error updating MP3 parts info for article {article_id}: {e}", exc_info=True)
         if conn: conn.rollback()
@@ -595,7 +1393,8 @@ def clear_article_mp3_parts_info(article_id, app_logger=None):
         cursor = conn.cursor()
         cursor.execute("""
             UPDATE articles
-            SET mp3_parts_folder_path = NULL, num_audio_parts = NULL, audio_part_checksums = NULL
+            SET mp3_parts_folder_path = NULL, num_audio_parts = NULL, audio_part_checksums = NULL,
+                audio_part_byte_ranges = NULL, audio_part_fingerprints = NULL
             WHERE id = ?
         """, (article_id,))
         cursor.execute("""
@@ -603,6 +1402,15 @@ def clear_article_mp3_parts_info(article_id, app_logger=None):
             SET audio_part_index = NULL, start_time_in_part_ms = NULL, end_time_in_part_ms = NULL
             WHERE article_id = ?
         """, (article_id,))
+        packed = _load_packed_sentence_timings_for_update(cursor, article_id)
+        if packed:
+            sentence_count, timings = packed
+            for field in ('audio_part_index', 'start_time_in_part_ms', 'end_time_in_part_ms'):
+                timings[field] = array('i', [PACKED_TIMING_NULL]) * sentence_count
+            _save_packed_sentence_timings(cursor, article_id, sentence_count, timings)
+        else:
+            _store_packed_sentence_timings(cursor, article_id)
+        _bump_content_version(cursor, article_id)
         conn.commit()
         logger.info(f"DB: Cleared MP3 parts info for article {article_id}.")
     except sqlite3.Error as e:
@@ -628,9 +1436,38 @@ def batch_update_sentence_part_details(sentence_updates, app_logger=None):
             SET audio_part_index=?, start_time_in_part_ms=?, end_time_in_part_ms=? 
             WHERE id=?
             """, updates_prepared)
+        updated_count = cursor.rowcount
+        # Patch the packed rows from updates_prepared; only the sentence order (ids) is read back
+        cursor.execute("""
+            SELECT id, article_id FROM sentences
+            WHERE article_id IN (SELECT article_id FROM sentences WHERE id IN (SELECT value FROM json_each(?)))
+            ORDER BY article_id, paragraph_index, sentence_index_in_paragraph
+        """, (json.dumps([u[-1] for u in updates_prepared]),))
+        sentence_positions, article_sentence_counts = {}, {}
+        for row in cursor.fetchall():
+            position = article_sentence_counts.get(row['article_id'], 0)
+            sentence_positions[row['id']] = (row['article_id'], position)
+            article_sentence_counts[row['article_id']] = position + 1
+        updates_by_article = {article_id: [] for article_id in article_sentence_counts}
+        for part_index, start_in_part_ms, end_in_part_ms, sentence_id in updates_prepared:
+            if sentence_id in sentence_positions:
+                article_id, position = sentence_positions[sentence_id]
+                updates_by_article[article_id].append((position, part_index, start_in_part_ms, end_in_part_ms))
+        for article_id, article_updates in updates_by_article.items():
+            packed = _load_packed_sentence_timings_for_update(cursor, article_id)
+            if packed and packed[0] == article_sentence_counts[article_id]:
+                sentence_count, timings = packed
+                for position, part_index, start_in_part_ms, end_in_part_ms in article_updates:
+                    timings['audio_part_index'][position] = _packed_timing_value(part_index)
+                    timings['start_time_in_part_ms'][position] = _packed_timing_value(start_in_part_ms)
+                    timings['end_time_in_part_ms'][position] = _packed_timing_value(end_in_part_ms)
+                _save_packed_sentence_timings(cursor, article_id, sentence_count, timings)
+            else:
+                _store_packed_sentence_timings(cursor, article_id)
+            _bump_content_version(cursor, article_id)
         conn.commit()
-        logger.info(f"DB: Batch updated sentence part details for {cursor.rowcount} sentences. Expected {len(updates_prepared)}.")
-        return cursor.rowcount
+        logger.info(f"DB: Batch updated sentence part details for {updated_count} sentences. Expected {len(updates_prepared)}.")
+        return updated_count
     except sqlite3.Error as e:
         logger.error(f"DB: Error batch updating sentence part details: {e}", exc_info=True)
         if conn: conn.rollback()
@@ -638,6 +1475,251 @@ def batch_update_sentence_part_details(sentence_updates, app_logger=None):
     finally:
         if conn: conn.close()
 
+def update_article_hls_info(article_id, hls_folder_path, num_segments, app_logger=None):
+    logger = app_logger if app_logger else default_logger
+    conn = get_db_connection()
+    try:
+        cursor = conn.cursor()
+        cursor.execute("""
+            UPDATE articles
+            SET hls_folder_path = ?, num_hls_segments = ?
+            WHERE id = ?
+        """, (hls_folder_path if num_segments > 0 else None,
+              num_segments if num_segments > 0 else None,
+              article_id))
+        conn.commit()
+        logger.info(f"DB: Updated HLS info for article {article_id}: path='{hls_folder_path}', num_segments={num_segments}.")
+    except sqlite3.Error as e:
+        logger.error(f"DB: Error updating HLS info for article {article_id}: {e}", exc_info=True)
+        if conn: conn.rollback()
+        raise
+    finally:
+        if conn: conn.close()
+
+def clear_article_hls_info(article_id, app_logger=None):
+    logger = app_logger if app_logger else default_logger
+    conn = get_db_connection()
+    try:
+        cursor = conn.cursor()
+        cursor.execute("""
+            UPDATE articles
+            SET hls_folder_path = NULL, num_hls_segments = NULL
+            WHERE id = ?
+        """, (article_id,))
+        cursor.execute("""
+            UPDATE sentences
+            SET hls_segment_index = NULL, start_time_in_segment_ms = NULL, end_time_in_segment_ms = NULL
+            WHERE article_id = ?
+        """, (article_id,))
+        conn.commit()
+        logger.info(f"DB: Cleared HLS info for article {article_id}.")
+    except sqlite3.Error as e:
+        logger.error(f"DB: Error clearing HLS info for article {article_id}: {e}", exc_info=True)
+        if conn: conn.rollback()
+        raise
+    finally:
+        if conn: conn.close()
+
+def batch_update_sentence_segment_details(sentence_updates, app_logger=None):
+    logger = app_logger if app_logger else default_logger
+    if not sentence_updates:
+        logger.info("DB: No sentence segment details to update.")
+        return 0
+    conn = get_db_connection()
+
+    updates_prepared = [(d['hls_segment_index'], d['start_time_in_segment_ms'], d['end_time_in_segment_ms'], d['sentence_db_id'])
+                        for d in sentence_updates]
+    try:
+        cursor = conn.cursor()
+        cursor.executemany("""
+            UPDATE sentences
+            SET hls_segment_index=?, start_time_in_segment_ms=?, end_time_in_segment_ms=?
+            WHERE id=?
+            """, updates_prepared)
+        conn.commit()
+        logger.info(f"DB: Batch updated sentence segment details for {cursor.rowcount} sentences. Expected {len(updates_prepared)}.")
+        return cursor.rowcount
+    except sqlite3.Error as e:
+        logger.error(f"DB: Error batch updating sentence segment details: {e}", exc_info=True)
+        if conn: conn.rollback()
+        raise
+    finally:
+        if conn: conn.close()
+
+# --- Audio Rendition (Encoding Profile) Functions ---
+def delete_audio_renditions(article_id, app_logger=None):
+    logger = app_logger if app_logger else default_logger
+    conn = get_db_connection()
+    try:
+        cursor = conn.cursor()
+        cursor.execute("""
+            DELETE FROM sentence_rendition_parts
+            WHERE sentence_id IN (SELECT id FROM sentences WHERE article_id = ?)
+        """, (article_id,))
+        cursor.execute("DELETE FROM audio_renditions WHERE article_id = ?", (article_id,))
+        conn.commit()
+        logger.info(f"DB: Deleted audio renditions for article {article_id}.")
+    except sqlite3.Error as e:
+        logger.error(f"DB: Error deleting audio renditions for article {article_id}: {e}", exc_info=True)
+        if conn: conn.rollback()
+        raise
+    finally:
+        if conn: conn.close()
+
+def add_audio_rendition(article_id, profile, file_path, mimetype, size_bytes, parts_folder_path=None,
+                        num_parts=0, part_checksums_list=None, part_fingerprints_list=None, app_logger=None):
+    logger = app_logger if app_logger else default_logger
+    conn = get_db_connection()
+    concatenated_checksums_str = _join_per_part_values(part_checksums_list, num_parts)
+    try:
+        cursor = conn.cursor()
+        cursor.execute("""
+            INSERT OR REPLACE INTO audio_renditions
+                (article_id, profile, file_path, mimetype, size_bytes, parts_folder_path, num_parts, part_checksums,
+                 part_fingerprints)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+        """, (article_id, profile, file_path, mimetype, size_bytes,
+              parts_folder_path if num_parts > 0 else None,
+              num_parts if num_parts > 0 else None,
+              concatenated_checksums_str,
+              _join_per_part_values(part_fingerprints_list, num_parts)))
+        conn.commit()
+        logger.info(f"DB: Stored rendition '{profile}' for article {article_id}: path='{file_path}', num_parts={num_parts}.")
+    except sqlite3.Error as e:
+        logger.error(f"DB: Error storing rendition '{profile}' for article {article_id}: {e}", exc_info=True)
+        if conn: conn.rollback()
+        raise
+    finally:
+        if conn: conn.close()
+
+def get_audio_renditions_for_article(article_id, app_logger=None):
+    logger = app_logger if app_logger else default_logger
+    conn = get_db_connection()
+    try:
+        cursor = conn.cursor()
+        cursor.execute("""
+            SELECT id, article_id, profile, file_path, mimetype, size_bytes, parts_folder_path, num_parts, part_checksums,
+                   part_fingerprints
+            FROM audio_renditions
+            WHERE article_id = ?
+            ORDER BY size_bytes ASC
+        """, (article_id,))
+        return cursor.fetchall()
+    except sqlite3.Error as e:
+        logger.error(f"DB: Error fetching audio renditions for article {article_id}: {e}", exc_info=True)
+        return []
+    finally:
+        if conn: conn.close()
+
+def get_audio_rendition(article_id, profile, app_logger=None):
+    logger = app_logger if app_logger else default_logger
+    conn = get_db_connection()
+    try:
+        cursor = conn.cursor()
+        cursor.execute("""
+            SELECT id, article_id, profile, file_path, mimetype, size_bytes, parts_folder_path, num_parts, part_checksums,
+                   part_fingerprints
+            FROM audio_renditions
+            WHERE article_id = ? AND profile = ?
+        """, (article_id, profile))
+        return cursor.fetchone()
+    except sqlite3.Error as e:
+        logger.error(f"DB: Error fetching rendition '{profile}' for article {article_id}: {e}", exc_info=True)
+        return None
+    finally:
+        if conn: conn.close()
+
+def batch_update_sentence_rendition_parts(profile, sentence_updates, app_logger=None):
+    logger = app_logger if app_logger else default_logger
+    if not sentence_updates:
+        logger.info(f"DB: No sentence part details to store for rendition '{profile}'.")
+        return 0
+    conn = get_db_connection()
+
+    updates_prepared = [(d['sentence_db_id'], profile, d['audio_part_index'], d['start_time_in_part_ms'], d['end_time_in_part_ms'])
+                        for d in sentence_updates]
+    try:
+        cursor = conn.cursor()
+        cursor.executemany("""
+            INSERT OR REPLACE INTO sentence_rendition_parts
+                (sentence_id, profile, audio_part_index, start_time_in_part_ms, end_time_in_part_ms)
+            VALUES (?, ?, ?, ?, ?)
+            """, updates_prepared)
+        conn.commit()
+        logger.info(f"DB: Stored rendition '{profile}' part details for {cursor.rowcount} sentences. Expected {len(updates_prepared)}.")
+        return cursor.rowcount
+    except sqlite3.Error as e:
+        logger.error(f"DB: Error storing rendition '{profile}' sentence part details: {e}", exc_info=True)
+        if conn: conn.rollback()
+        raise
+    finally:
+        if conn: conn.close()
+
+def get_sentence_rendition_parts(article_id, profile, app_logger=None):
+    logger = app_logger if app_logger else default_logger
+    conn = get_db_connection()
+    try:
+        cursor = conn.cursor()
+        cursor.execute("""
+            SELECT s.paragraph_index, s.sentence_index_in_paragraph,
+                   srp.audio_part_index, srp.start_time_in_part_ms, srp.end_time_in_part_ms
+            FROM sentence_rendition_parts srp
+            JOIN sentences s ON s.id = srp.sentence_id
+            WHERE s.article_id = ? AND srp.profile = ?
+            ORDER BY s.paragraph_index, s.sentence_index_in_paragraph
+        """, (article_id, profile))
+        return cursor.fetchall()
+    except sqlite3.Error as e:
+        logger.error(f"DB: Error fetching rendition '{profile}' sentence parts for article {article_id}: {e}", exc_info=True)
+        return []
+    finally:
+        if conn: conn.close()
+
+# --- Audio Metadata Cache Functions ---
+def upsert_audio_metadata(metadata, app_logger=None):
+    """
+    metadata: dict with file_path, size_bytes, mtime_ns, duration_ms, bitrate_bps, codec, sample_rate, channels,
+    content_sha256 and (optionally) content_fingerprint.
+    """
+    logger = app_logger if app_logger else default_logger
+    conn = get_db_connection()
+    try:
+        cursor = conn.cursor()
+        cursor.execute("""
+            INSERT OR REPLACE INTO audio_metadata
+                (file_path, size_bytes, mtime_ns, duration_ms, bitrate_bps, codec, sample_rate, channels, content_sha256,
+                 content_fingerprint, recorded_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, CURRENT_TIMESTAMP)
+        """, (metadata['file_path'], metadata['size_bytes'], metadata['mtime_ns'], metadata['duration_ms'],
+              metadata['bitrate_bps'], metadata['codec'], metadata['sample_rate'], metadata['channels'],
+              metadata['content_sha256'], metadata.get('content_fingerprint')))
+        conn.commit()
+        logger.info(f"DB: Cached audio metadata for {metadata['file_path']} (duration {metadata['duration_ms']} ms).")
+    except sqlite3.Error as e:
+        logger.error(f"DB: Error caching audio metadata for {metadata.get('file_path')}: {e}", exc_info=True)
+        if conn: conn.rollback()
+        raise
+    finally:
+        if conn: conn.close()
+
+def get_audio_metadata(file_path, app_logger=None):
+    logger = app_logger if app_logger else default_logger
+    conn = get_db_connection()
+    try:
+        cursor = conn.cursor()
+        cursor.execute("""
+            SELECT file_path, size_bytes, mtime_ns, duration_ms, bitrate_bps, codec, sample_rate, channels, content_sha256,
+                   content_fingerprint
+            FROM audio_metadata
+            WHERE file_path = ?
+        """, (file_path,))
+        return cursor.fetchone()
+    except sqlite3.Error as e:
+        logger.error(f"DB: Error fetching audio metadata for {file_path}: {e}", exc_info=True)
+        return None
+    finally:
+        if conn: conn.close()
+
 # --- Reading Location Functions ---
 def set_reading_location(article_id, book_id, paragraph_index, sentence_index_in_paragraph, app_logger=None):
     logger = app_logger if app_logger else default_logger
@@ -658,7 +1740,7 @@ def set_reading_location(article_id, book_id, paragraph_index, sentence_index_in
                 last_updated = CURRENT_TIMESTAMP
         """, (article_id, book_id, paragraph_index, sentence_index_in_paragraph))
         conn.commit()
-        logger.info(f"DB: Set reading location for article {article_id} (book {book_id}) to P:{paragraph_index}, S:{sentence_index_in_paragraph}.")
+        logger.debug(f"DB: Set reading location for article {article_id} (book {book_id}) to P:{paragraph_index}, S:{sentence_index_in_paragraph}.")
     except sqlite3.Error as e:
         logger.error(f"DB: Error setting reading location for article {article_id} (book {book_id}): {e}", exc_info=True)
         if conn: conn.rollback()
@@ -666,8 +1748,127 @@ def set_reading_location(article_id, book_id, paragraph_index, sentence_index_in
     finally:
         if conn: conn.close()
 
+# Write buffer: autosaves only replace the latest position per article in memory; a background thread
+# writes them in one transaction every flush interval (and at exit). Reads in this process see the buffer.
+# With no flusher started (interval 0, scripts), buffer_reading_location writes through immediately.
+# Positions are keyed by the DATABASE_PATH they were saved under and only ever written to that database.
+_pending_reading_locations = {} # (database_path, article_id) -> (book_id, paragraph_index, sentence_index_in_paragraph, last_updated)
+_pending_reading_locations_lock = threading.Lock()
+_reading_location_flusher = None
+
+def _buffered_location_row(article_id, entry):
+    book_id, paragraph_index, sentence_index_in_paragraph, last_updated = entry
+    return {'article_id': article_id, 'book_id': book_id, 'paragraph_index': paragraph_index,
+            'sentence_index_in_paragraph': sentence_index_in_paragraph, 'last_updated': last_updated}
+
+def buffer_reading_location(article_id, book_id, paragraph_index, sentence_index_in_paragraph, app_logger=None):
+    """Records a reading position; written by the next flush_reading_locations (or now, if no flusher runs)."""
+    if _reading_location_flusher is None:
+        set_reading_location(article_id, book_id, paragraph_index, sentence_index_in_paragraph, app_logger=app_logger)
+        return
+    if book_id is None:
+        raise ValueError("book_id cannot be NULL for reading_locations.")
+    now = datetime.datetime.now(datetime.timezone.utc).replace(tzinfo=None) # Same clock as CURRENT_TIMESTAMP
+    with _pending_reading_locations_lock:
+        _pending_reading_locations[(DATABASE_PATH, article_id)] = (book_id, paragraph_index, sentence_index_in_paragraph, now)
+
+def flush_reading_locations(app_logger=None):
+    """
+    Writes all buffered positions, in one transaction per database they were saved for. Returns how
+    many were written. Positions stay buffered (and visible to get_reading_location) until the
+    transaction has committed; only then are they dropped, unless a newer position was buffered meanwhile.
+    """
+    logger = app_logger if app_logger else default_logger
+    with _pending_reading_locations_lock:
+        database_paths = {database_path for database_path, _ in _pending_reading_locations}
+    if not database_paths:
+        return 0
+    written = sum(_flush_reading_locations_to(database_path, logger) for database_path in database_paths)
+    logger.info(f"DB: Flushed {written} buffered reading locations.")
+    return written
+
+def _flush_reading_locations_to(database_path, logger):
+    if not os.path.exists(database_path): # Removed since (e.g. a test database): don't create an empty one
+        with _pending_reading_locations_lock:
+            dropped = [key for key in _pending_reading_locations if key[0] == database_path]
+            for key in dropped:
+                del _pending_reading_locations[key]
+        logger.warning(f"DB: Dropping {len(dropped)} buffered reading locations for missing database {database_path}.")
+        return 0
+    upsert_sql = """
+        INSERT INTO reading_locations (article_id, book_id, paragraph_index, sentence_index_in_paragraph, last_updated)
+        VALUES (?, ?, ?, ?, ?)
+        ON CONFLICT(article_id) DO UPDATE SET
+            book_id = excluded.book_id,
+            paragraph_index = excluded.paragraph_index,
+            sentence_index_in_paragraph = excluded.sentence_index_in_paragraph,
+            last_updated = excluded.last_updated
+    """
+    pooled = database_path == DATABASE_PATH
+    conn = None
+    try:
+        conn = get_db_connection() if pooled else _open_connection(database_path)
+        # Snapshot the buffer only once this transaction holds the write lock: add_article drops a
+        # re-processed article's position before committing, so a stale one can't be written back.
+        conn.execute("BEGIN IMMEDIATE")
+        with _pending_reading_locations_lock:
+            pending = {article_id: entry for (path, article_id), entry in _pending_reading_locations.items()
+                       if path == database_path}
+        rows = [(article_id,) + entry for article_id, entry in pending.items()]
+        written = len(rows)
+        conn.execute("SAVEPOINT flush_reading_locations")
+        try:
+            conn.executemany(upsert_sql, rows)
+        except sqlite3.IntegrityError: # E.g. an article deleted since; write the others one by one
+            conn.execute("ROLLBACK TO flush_reading_locations")
+            for row in rows:
+                try:
+                    conn.execute(upsert_sql, row)
+                except sqlite3.IntegrityError as e:
+                    written -= 1
+                    logger.warning(f"DB: Dropping buffered reading location for article {row[0]}: {e}")
+        conn.commit()
+    except sqlite3.Error as e:
+        logger.error(f"DB: Error flushing reading locations to {database_path}, keeping them buffered: {e}", exc_info=True)
+        if conn: conn.rollback()
+        return 0
+    finally:
+        if conn:
+            if pooled:
+                conn.close()
+            else:
+                conn.really_close()
+    with _pending_reading_locations_lock:
+        for article_id, entry in pending.items():
+            key = (database_path, article_id)
+            buffered_entry = _pending_reading_locations.get(key)
+            if buffered_entry is not None and buffered_entry[3] == entry[3]: # Not replaced by a newer position
+                del _pending_reading_locations[key]
+    return written
+
+def start_reading_location_flusher(interval_s, app_logger=None):
+    """Starts buffering reading locations, flushed every interval_s seconds and at exit. interval_s=0: write-through."""
+    global _reading_location_flusher
+    if not interval_s or _reading_location_flusher is not None:
+        return _reading_location_flusher
+
+    def _flush_loop():
+        while True:
+            time.sleep(interval_s)
+            flush_reading_locations(app_logger=app_logger)
+            release_thread_connection()
+
+    _reading_location_flusher = threading.Thread(target=_flush_loop, name="reading-location-flusher", daemon=True)
+    _reading_location_flusher.start()
+    atexit.register(flush_reading_locations, app_logger=app_logger)
+    return _reading_location_flusher
+
 def get_reading_location(article_id, app_logger=None):
     logger = app_logger if app_logger else default_logger
+    with _pending_reading_locations_lock:
+        entry = _pending_reading_locations.get((DATABASE_PATH, article_id))
+    if entry:
+        return _buffered_location_row(article_id, entry)
     conn = get_db_connection()
     try:
         cursor = conn.cursor()
@@ -702,6 +1903,14 @@ def get_most_recent_reading_location_for_book(book_id, app_logger=None):
             LIMIT 1
         """, (book_id,))
         location = cursor.fetchone()
+        with _pending_reading_locations_lock:
+            buffered = [_buffered_location_row(article_id, entry)
+                        for (database_path, article_id), entry in _pending_reading_locations.items()
+                        if database_path == DATABASE_PATH and entry[0] == book_id]
+        if buffered:
+            newest = max(buffered, key=lambda row: row['last_updated'])
+            if not location or not location['last_updated'] or newest['last_updated'] >= location['last_updated']:
+                location = newest
         if location:
             logger.debug(f"DB: Most recent reading for book {book_id} is article {location['article_id']} "
                              f"at P:{location['paragraph_index']}, S:{location['sentence_index_in_paragraph']}.")
@@ -714,6 +1923,191 @@ def get_most_recent_reading_location_for_book(book_id, app_logger=None):
     finally:
         if conn: conn.close()
 
+# --- Search Functions ---
+# Shorter terms can't use the trigram index. One- and two-character Chinese terms (most Chinese words)
+# are looked up in sentence_grams instead; other short terms (e.g. "of") are checked with LIKE, which
+# scans every sentence when the query has no term the indexes can answer.
+SEARCH_TRIGRAM_MIN_TERM_LENGTH = 3
+_CJK_RUN = re.compile('[\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff]+')
+_sentence_fts_available = {} # DATABASE_PATH -> whether migration 3 could create sentences_fts
+
+def _like_pattern(term):
+    return '%' + term.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_') + '%'
+
+def _sentence_search_grams(english_text, chinese_text):
+    """The sentence_grams entries of a sentence: each Chinese character and each pair of adjacent ones."""
+    grams = set()
+    for text in (english_text, chinese_text):
+        for run in _CJK_RUN.findall(text or ''):
+            grams.update(run)
+            grams.update(run[i:i + 2] for i in range(len(run) - 1))
+    return grams
+
+def _is_gram_term(term):
+    return len(term) < SEARCH_TRIGRAM_MIN_TERM_LENGTH and _CJK_RUN.fullmatch(term) is not None
+
+def _has_sentence_fts(conn):
+    """Whether this database has the sentences_fts index (not if SQLite lacked FTS5/trigram when migrating)."""
+    if DATABASE_PATH not in _sentence_fts_available:
+        row = conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'sentences_fts'").fetchone()
+        _sentence_fts_available[DATABASE_PATH] = row is not None
+    return _sentence_fts_available[DATABASE_PATH]
+
+def search_sentences(query, limit=50, offset=0, app_logger=None):
+    """
+    Sentences across all books containing every whitespace-separated term of query (English or Chinese),
+    best bm25 match first. One- and two-character Chinese terms are looked up in sentence_grams; other
+    terms under three characters are checked with LIKE on the index hits. Queries without a trigram
+    term return their hits in reading order; if they have no Chinese short term either, or the database
+    has no full-text index (see _migration_0003_sentence_search_index), every sentence is scanned with LIKE.
+    Returns up to limit rows with book/article/sentence coordinates and timings, or None on error.
+    """
+    logger = app_logger if app_logger else default_logger
+    terms = query.split()
+    if not terms:
+        return []
+    conn = get_db_connection()
+    try:
+        min_index_term_length = SEARCH_TRIGRAM_MIN_TERM_LENGTH if _has_sentence_fts(conn) else float('inf')
+        index_terms = [t for t in terms if len(t) >= min_index_term_length]
+        gram_terms = list(dict.fromkeys(t for t in terms if _is_gram_term(t)))
+        like_terms = [t for t in terms if len(t) < min_index_term_length and not _is_gram_term(t)]
+
+        drive_by_gram = not index_terms and bool(gram_terms)
+
+        conditions, params = [], []
+        if index_terms:
+            conditions.append("sentences_fts MATCH ?")
+            params.append(' '.join('"' + t.replace('"', '""') + '"' for t in index_terms))
+        elif drive_by_gram: # The first short term drives the query through the sentence_grams primary key
+            conditions.append("g.gram = ?")
+            params.append(gram_terms.pop(0))
+        for term in gram_terms:
+            conditions.append("s.id IN (SELECT sentence_id FROM sentence_grams WHERE gram = ?)")
+            params.append(term)
+        for term in like_terms:
+            conditions.append("(s.english_text LIKE ? ESCAPE '\\' OR s.chinese_text LIKE ? ESCAPE '\\')")
+            params.extend([_like_pattern(term)] * 2)
+        if index_terms:
+            source = "sentences_fts JOIN sentences s ON s.id = sentences_fts.rowid"
+            order_by = "sentences_fts.rank"
+        elif drive_by_gram:
+            source = "sentence_grams g JOIN sentences s ON s.id = g.sentence_id"
+            order_by = "s.article_id, s.paragraph_index, s.sentence_index_in_paragraph"
+        else:
+            source = "sentences s"
+            order_by = "s.article_id, s.paragraph_index, s.sentence_index_in_paragraph"
+
+        cursor = conn.cursor()
+        cursor.execute(f"""
+            SELECT s.id AS sentence_id, s.article_id, a.filename AS article_filename, a.book_id, b.title AS book_title,
+                   s.paragraph_index, s.sentence_index_in_paragraph, s.english_text, s.chinese_text,
+                   s.start_time_ms, s.end_time_ms,
+                   s.audio_part_index, s.start_time_in_part_ms, s.end_time_in_part_ms
+            FROM {source}
+            JOIN articles a ON a.id = s.article_id
+            LEFT JOIN books b ON b.id = a.book_id
+            WHERE {' AND '.join(conditions)}
+            ORDER BY {order_by}
+            LIMIT ? OFFSET ?
+        """, params + [limit, offset])
+        return cursor.fetchall()
+    except sqlite3.Error as e:
+        logger.error(f"DB: Error searching sentences for '{query}': {e}", exc_info=True)
+        return None
+    finally:
+        if conn: conn.close()
+
+# --- Upload Session Functions (resumable chunked uploads) ---
+UPLOAD_SESSION_COLUMNS = ('id', 'filename', 'total_size', 'received_bytes', 'sha256', 'staging_path',
+                          'created_at', 'updated_at')
+
+def create_upload_session(upload_id, filename, total_size, staging_path, sha256=None, app_logger=None):
+    logger = app_logger if app_logger else default_logger
+    conn = get_db_connection()
+    try:
+        cursor = conn.cursor()
+        cursor.execute("""
+            INSERT INTO upload_sessions (id, filename, total_size, received_bytes, sha256, staging_path)
+            VALUES (?, ?, ?, 0, ?, ?)
+        """, (upload_id, filename, total_size, sha256, staging_path))
+        conn.commit()
+        logger.info(f"DB: Created upload session {upload_id} for '{filename}' ({total_size} bytes).")
+    except sqlite3.Error as e:
+        logger.error(f"DB: Error creating upload session for '{filename}': {e}", exc_info=True)
+        if conn: conn.rollback()
+        raise
+    finally:
+        if conn: conn.close()
+
+def get_upload_session(upload_id, app_logger=None):
+    logger = app_logger if app_logger else default_logger
+    conn = get_db_connection()
+    try:
+        cursor = conn.cursor()
+        cursor.execute(f"SELECT {', '.join(UPLOAD_SESSION_COLUMNS)} FROM upload_sessions WHERE id = ?", (upload_id,))
+        return cursor.fetchone()
+    except sqlite3.Error as e:
+        logger.error(f"DB: Error fetching upload session {upload_id}: {e}", exc_info=True)
+        return None
+    finally:
+        if conn: conn.close()
+
+def advance_upload_session(upload_id, expected_offset, new_offset, app_logger=None):
+    """Moves received_bytes from expected_offset to new_offset. False if another request moved it first."""
+    logger = app_logger if app_logger else default_logger
+    conn = get_db_connection()
+    try:
+        cursor = conn.cursor()
+        cursor.execute("""
+            UPDATE upload_sessions
+            SET received_bytes = ?, updated_at = CURRENT_TIMESTAMP
+            WHERE id = ? AND received_bytes = ?
+        """, (new_offset, upload_id, expected_offset))
+        conn.commit()
+        return cursor.rowcount == 1
+    except sqlite3.Error as e:
+        logger.error(f"DB: Error advancing upload session {upload_id} to offset {new_offset}: {e}", exc_info=True)
+        if conn: conn.rollback()
+        raise
+    finally:
+        if conn: conn.close()
+
+def delete_upload_session(upload_id, app_logger=None):
+    """Ends an upload session. Returns True if this call deleted it, False if it was already gone."""
+    logger = app_logger if app_logger else default_logger
+    conn = get_db_connection()
+    try:
+        cursor = conn.cursor()
+        cursor.execute("DELETE FROM upload_sessions WHERE id = ?", (upload_id,))
+        conn.commit()
+        logger.info(f"DB: Deleted upload session {upload_id}.")
+        return cursor.rowcount == 1
+    except sqlite3.Error as e:
+        logger.error(f"DB: Error deleting upload session {upload_id}: {e}", exc_info=True)
+        if conn: conn.rollback()
+        raise
+    finally:
+        if conn: conn.close()
+
+def get_stale_upload_sessions(max_age_s, app_logger=None):
+    """Upload sessions not written to (or created) in the last max_age_s seconds."""
+    logger = app_logger if app_logger else default_logger
+    conn = get_db_connection()
+    try:
+        cursor = conn.cursor()
+        cursor.execute(f"""
+            SELECT {', '.join(UPLOAD_SESSION_COLUMNS)}
+            FROM upload_sessions
+            WHERE updated_at < datetime('now', ?)
+        """, (f"-{int(max_age_s)} seconds",))
+        return cursor.fetchall()
+    except sqlite3.Error as e:
+        logger.error(f"DB: Error fetching stale upload sessions: {e}", exc_info=True)
+        return []
+    finally:
+        if conn: conn.close()
+
 if __name__ == '__main__':
     print(f"Standalone DB Manager: Initializing database at: {DATABASE_PATH}")
     class DummyApp:
@@ -727,5 +2121,5 @@ if __name__ == '__main__':
                 self.logger.addHandler(handler)
             self.instance_path = INSTANCE_FOLDER
     
-    init_db(app=DummyApp())
-    print("Standalone DB Manager: Database schema created/checked.")
\ No newline at end of file
+    applied = migrate_db(app_logger=DummyApp().logger)
+    print(f"Standalone DB Manager: Schema at version {SCHEMA_VERSION}, {applied} migration(s) applied.")
\ No newline at end of file
@@ -0,0 +1,412 @@
+# bilingual_app/mp3_index.py
+"""
+Pure-Python MPEG audio frame index.
+
+Scans the frame headers of an MP3 file through `mmap` (no decoding, no ffmpeg/ffprobe)
+and records the byte offset of every audio frame. Because every frame in a stream has the
+same number of samples, the frame index doubles as a time index:
+
+    time of frame i = (i * samples_per_frame - encoder_delay) / sample_rate
+
+A Xing/Info or VBRI header frame, if present, is recognised, excluded from the audio frames
+and used for the encoder delay/padding (LAME tag) and as a shortcut for the duration.
+Parts can then be cut by copying byte ranges that start and end on frame boundaries.
+"""
+import os
+import mmap
+import bisect
+from array import array
+
+# --- MPEG audio header tables ---
+MPEG_VERSION_2_5 = 0
+MPEG_VERSION_2 = 2
+MPEG_VERSION_1 = 3
+
+SAMPLE_RATES = {
+    MPEG_VERSION_1: (44100, 48000, 32000),
+    MPEG_VERSION_2: (22050, 24000, 16000),
+    MPEG_VERSION_2_5: (11025, 12000, 8000),
+}
+
+# Bitrates in kbps, indexed by the 4-bit bitrate index (0 = free format, unsupported)
+BITRATES_KBPS = {
+    (MPEG_VERSION_1, 3): (0, 32, 64, 96, 128, 160, 192, 224, 256, 288, 320, 352, 384, 416, 448),  # Layer I
+    (MPEG_VERSION_1, 2): (0, 32, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320, 384),     # Layer II
+    (MPEG_VERSION_1, 1): (0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320),      # Layer III
+    (MPEG_VERSION_2, 3): (0, 32, 48, 56, 64, 80, 96, 112, 128, 144, 160, 176, 192, 224, 256),
+    (MPEG_VERSION_2, 2): (0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160),
+    (MPEG_VERSION_2, 1): (0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160),
+}
+for _layer in (1, 2, 3):
+    BITRATES_KBPS[(MPEG_VERSION_2_5, _layer)] = BITRATES_KBPS[(MPEG_VERSION_2, _layer)]
+
+# Bits of the header that must not change between frames of one stream:
+# sync word, MPEG version, layer and sample rate index.
+STREAM_SIGNATURE_MASK = 0xFFFE0C00
+SYNC_MASK = 0xFFE00000
+
+COPY_CHUNK_SIZE_BYTES = 1024 * 1024
+
+# HLS packed audio: each segment starts with an ID3 PRIV frame carrying the 33-bit, 90 kHz
+# MPEG-2 timestamp of its first sample (RFC 8216, section 3.4).
+HLS_TIMESTAMP_PRIV_OWNER = b"com.apple.streaming.transportStreamTimestamp"
+HLS_TIMESTAMP_CLOCK_HZ = 90000
+
+
+def _parse_frame_header(header_int):
+    """
+    Decodes a 32-bit MPEG audio frame header.
+    Returns (frame_length_bytes, samples_per_frame, sample_rate, channels, version, layer, bitrate_kbps)
+    or None if the header is not a valid, supported frame header.
+    """
+    if (header_int & SYNC_MASK) != SYNC_MASK:
+        return None
+    version = (header_int >> 19) & 0x3
+    layer = (header_int >> 17) & 0x3
+    bitrate_index = (header_int >> 12) & 0xF
+    sample_rate_index = (header_int >> 10) & 0x3
+    padding = (header_int >> 9) & 0x1
+    channel_mode = (header_int >> 6) & 0x3
+
+    if version == 1 or layer == 0 or bitrate_index in (0, 15) or sample_rate_index == 3:
+        return None
+
+    sample_rate = SAMPLE_RATES[version][sample_rate_index]
+    bitrate_kbps = BITRATES_KBPS[(version, layer)][bitrate_index]
+
+    if layer == 3:  # Layer I
+        samples_per_frame = 384
+        frame_length = (12 * bitrate_kbps * 1000 // sample_rate + padding) * 4
+    elif layer == 2:  # Layer II
+        samples_per_frame = 1152
+        frame_length = 144 * bitrate_kbps * 1000 // sample_rate + padding
+    else:  # Layer III
+        samples_per_frame = 1152 if version == MPEG_VERSION_1 else 576
+        frame_length = (samples_per_frame // 8) * bitrate_kbps * 1000 // sample_rate + padding
+
+    channels = 1 if channel_mode == 3 else 2
+    return frame_length, samples_per_frame, sample_rate, channels, version, layer, bitrate_kbps
+
+
+def _id3v2_size(mm):
+    """Returns the total size of a leading ID3v2 tag (0 if there is none)."""
+    if len(mm) < 10 or mm[0:3] != b"ID3":
+        return 0
+    flags = mm[5]
+    size_bytes = mm[6:10]
+    tag_size = (size_bytes[0] << 21) | (size_bytes[1] << 14) | (size_bytes[2] << 7) | size_bytes[3]
+    footer = 10 if flags & 0x10 else 0
+    return 10 + tag_size + footer
+
+
+def _read_vbr_header(mm, frame_offset, header_int, parsed_header):
+    """
+    Looks for a Xing/Info or VBRI header inside the first frame.
+    Returns a dict with 'frames', 'bytes', 'encoder_delay', 'encoder_padding' (any may be None)
+    or None if the frame is a regular audio frame.
+    """
+    frame_length, _, _, channels, version, layer, _ = parsed_header
+    if layer != 1:  # Only Layer III carries these tags
+        return None
+
+    if version == MPEG_VERSION_1:
+        side_info_size = 17 if channels == 1 else 32
+    else:
+        side_info_size = 9 if channels == 1 else 17
+
+    xing_offset = frame_offset + 4 + side_info_size
+    tag = mm[xing_offset:xing_offset + 4]
+    if tag in (b"Xing", b"Info"):
+        info = {'frames': None, 'bytes': None, 'encoder_delay': None, 'encoder_padding': None}
+        flags = int.from_bytes(mm[xing_offset + 4:xing_offset + 8], 'big')
+        cursor = xing_offset + 8
+        if flags & 0x1:
+            info['frames'] = int.from_bytes(mm[cursor:cursor + 4], 'big')
+            cursor += 4
+        if flags & 0x2:
+            info['bytes'] = int.from_bytes(mm[cursor:cursor + 4], 'big')
+            cursor += 4
+        if flags & 0x4:
+            cursor += 100  # Seek TOC
+        if flags & 0x8:
+            cursor += 4  # Quality indicator
+        # LAME extension: 9-byte encoder string, then encoder delay/padding 21 bytes in (12 bits each)
+        if cursor + 24 <= frame_offset + frame_length and mm[cursor:cursor + 4] in (b"LAME", b"Lavf", b"Lavc"):
+            delay_bytes = mm[cursor + 21:cursor + 24]
+            info['encoder_delay'] = (delay_bytes[0] << 4) | (delay_bytes[1] >> 4)
+            info['encoder_padding'] = ((delay_bytes[1] & 0x0F) << 8) | delay_bytes[2]
+        return info
+
+    vbri_offset = frame_offset + 4 + 32
+    if mm[vbri_offset:vbri_offset + 4] == b"VBRI":
+        return {
+            'frames': int.from_bytes(mm[vbri_offset + 14:vbri_offset + 18], 'big'),
+            'bytes': int.from_bytes(mm[vbri_offset + 10:vbri_offset + 14], 'big'),
+            'encoder_delay': int.from_bytes(mm[vbri_offset + 6:vbri_offset + 8], 'big'),
+            'encoder_padding': None,
+        }
+    return None
+
+
+class Mp3FrameIndex:
+    """Frame-to-byte-offset and frame-to-time index of one MP3 file."""
+
+    def __init__(self, path, file_size, frame_offsets, audio_end, sample_rate, samples_per_frame,
+                 channels, vbr_header=None):
+        self.path = str(path)
+        self.file_size = file_size
+        self.frame_offsets = frame_offsets  # array('Q'), byte offset of every audio frame
+        self.audio_end = audio_end  # byte offset just past the last audio frame
+        self.sample_rate = sample_rate
+        self.samples_per_frame = samples_per_frame
+        self.channels = channels
+        self.vbr_header = vbr_header
+        self.encoder_delay = (vbr_header or {}).get('encoder_delay') or 0
+        self.encoder_padding = (vbr_header or {}).get('encoder_padding') or 0
+
+    @property
+    def num_frames(self):
+        return len(self.frame_offsets)
+
+    @property
+    def audio_start(self):
+        return self.frame_offsets[0] if self.frame_offsets else self.audio_end
+
+    @property
+    def frame_duration_ms(self):
+        return self.samples_per_frame * 1000.0 / self.sample_rate
+
+    @property
+    def duration_ms(self):
+        total_samples = self.num_frames * self.samples_per_frame - self.encoder_delay - self.encoder_padding
+        return int(max(0, total_samples) * 1000 / self.sample_rate)
+
+    @property
+    def average_bitrate_bps(self):
+        duration_ms = self.duration_ms
+        if duration_ms <= 0:
+            return None
+        return int((self.audio_end - self.audio_start) * 8 * 1000 / duration_ms)
+
+    def frame_start_ms(self, frame_index):
+        """Start time of a frame on the original file's timeline (encoder delay removed)."""
+        return (frame_index * self.samples_per_frame - self.encoder_delay) * 1000.0 / self.sample_rate
+
+    def frame_at_ms(self, time_ms):
+        """Index of the frame that contains `time_ms`, clamped to the valid frame range."""
+        if self.num_frames == 0:
+            return 0
+        frame_index = int(((time_ms * self.sample_rate / 1000.0) + self.encoder_delay) // self.samples_per_frame)
+        return max(0, min(frame_index, self.num_frames - 1))
+
+    def byte_offset(self, frame_index):
+        """Byte offset of a frame; `num_frames` maps to the end of the audio data."""
+        if frame_index >= self.num_frames:
+            return self.audio_end
+        return self.frame_offsets[frame_index]
+
+    def frame_at_byte_offset(self, offset):
+        """Index of the last frame starting at or before `offset`."""
+        return max(0, bisect.bisect_right(self.frame_offsets, offset) - 1)
+
+    def byte_range_for_frames(self, start_frame, end_frame):
+        """(start, end) byte range covering frames [start_frame, end_frame)."""
+        return self.byte_offset(start_frame), self.byte_offset(end_frame)
+
+
+def build_frame_index(mp3_path, logger=None):
+    """
+    Scans all frame headers of an MP3 file and returns an Mp3FrameIndex,
+    or None if the file holds no parsable MPEG audio frames.
+    """
+    mp3_path = str(mp3_path)
+    try:
+        file_size = os.path.getsize(mp3_path)
+        if file_size == 0:
+            if logger: logger.warning(f"MP3_INDEX: File {mp3_path} is empty.")
+            return None
+        with open(mp3_path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            return _scan_frames(mm, mp3_path, file_size, logger)
+    except (OSError, ValueError) as e:
+        if logger: logger.error(f"MP3_INDEX: Could not index {mp3_path}: {e}")
+        return None
+
+
+def _scan_frames(mm, mp3_path, file_size, logger):
+    scan_end = file_size
+    if file_size >= 128 and mm[file_size - 128:file_size - 125] == b"TAG":
+        scan_end = file_size - 128  # ID3v1 tag
+
+    pos = _id3v2_size(mm)
+    header_cache = {}
+    frame_offsets = array('Q')
+    stream_signature = None
+    first_header = None
+    vbr_header = None
+    resyncs = 0
+
+    while pos + 4 <= scan_end:
+        header_int = int.from_bytes(mm[pos:pos + 4], 'big')
+        parsed = header_cache.get(header_int)
+        if parsed is None:
+            parsed = _parse_frame_header(header_int) or False
+            header_cache[header_int] = parsed
+
+        valid = bool(parsed) and pos + parsed[0] <= scan_end
+        if valid and stream_signature is not None and (header_int & STREAM_SIGNATURE_MASK) != stream_signature:
+            valid = False
+        if valid and stream_signature is None:
+            # Require the next frame to line up too before locking onto a stream, to avoid false syncs.
+            next_pos = pos + parsed[0]
+            if next_pos + 4 <= scan_end:
+                next_header = int.from_bytes(mm[next_pos:next_pos + 4], 'big')
+                valid = (next_header & STREAM_SIGNATURE_MASK) == (header_int & STREAM_SIGNATURE_MASK) and \
+                        _parse_frame_header(next_header) is not None
+
+        if not valid:
+            next_sync = mm.find(b"\xff", pos + 1, scan_end)
+            if next_sync == -1:
+                break
+            resyncs += 1
+            pos = next_sync
+            continue
+
+        if stream_signature is None:
+            stream_signature = header_int & STREAM_SIGNATURE_MASK
+            first_header = parsed
+            vbr_header = _read_vbr_header(mm, pos, header_int, parsed)
+            if vbr_header is not None:
+                pos += parsed[0]  # The tag frame carries no audio
+                continue
+
+        frame_offsets.append(pos)
+        pos += parsed[0]
+
+    if not frame_offsets:
+        if logger: logger.warning(f"MP3_INDEX: No MPEG audio frames found in {mp3_path}.")
+        return None
+
+    audio_end = pos if pos <= scan_end else scan_end
+    frame_length, samples_per_frame, sample_rate, channels, _, _, _ = first_header
+    index = Mp3FrameIndex(mp3_path, file_size, frame_offsets, audio_end, sample_rate,
+                          samples_per_frame, channels, vbr_header=vbr_header)
+    if logger:
+        logger.info(f"MP3_INDEX: Indexed {index.num_frames} frames in {mp3_path} "
+                    f"({index.duration_ms} ms, {sample_rate} Hz, {channels} ch, resyncs: {resyncs}).")
+    return index
+
+
+def read_vbr_stream_info(mp3_path, logger=None):
+    """
+    Duration, sample rate and channels of an MP3 from the Xing/Info/VBRI header of its first frame,
+    without scanning the rest of the file. Returns a dict with 'duration_ms', 'sample_rate',
+    'channels' and 'audio_bytes' (None if the header does not say), or None if there is no such
+    header (or the file is not parsable MPEG audio).
+    """
+    mp3_path = str(mp3_path)
+    try:
+        file_size = os.path.getsize(mp3_path)
+        if file_size == 0:
+            return None
+        with open(mp3_path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            pos = _id3v2_size(mm)
+            next_sync = mm.find(b"\xff", pos, min(file_size, pos + 64 * 1024))
+            while next_sync != -1 and next_sync + 4 <= file_size:
+                header_int = int.from_bytes(mm[next_sync:next_sync + 4], 'big')
+                parsed = _parse_frame_header(header_int)
+                if parsed:
+                    vbr_header = _read_vbr_header(mm, next_sync, header_int, parsed)
+                    if vbr_header and vbr_header.get('frames'):
+                        _, samples_per_frame, sample_rate, channels, _, _, _ = parsed
+                        total_samples = vbr_header['frames'] * samples_per_frame \
+                                        - (vbr_header.get('encoder_delay') or 0) \
+                                        - (vbr_header.get('encoder_padding') or 0)
+                        return {'duration_ms': int(max(0, total_samples) * 1000 / sample_rate),
+                                'sample_rate': sample_rate, 'channels': channels,
+                                'audio_bytes': vbr_header.get('bytes')}
+                    break
+                next_sync = mm.find(b"\xff", next_sync + 1, min(file_size, pos + 64 * 1024))
+    except (OSError, ValueError) as e:
+        if logger: logger.error(f"MP3_INDEX: Could not read the VBR header of {mp3_path}: {e}")
+    return None
+
+
+def read_duration_ms(mp3_path, logger=None):
+    """
+    Duration of an MP3 in milliseconds. Uses the frame count of a Xing/Info/VBRI header when
+    present (reads only the first frame), otherwise falls back to a full header scan.
+    Returns None if the file is not parsable MPEG audio.
+    """
+    stream_info = read_vbr_stream_info(mp3_path, logger=logger)
+    if stream_info:
+        return stream_info['duration_ms']
+    index = build_frame_index(str(mp3_path), logger=logger)
+    return index.duration_ms if index else None
+
+
+def _syncsafe_int(value):
+    return bytes(((value >> 21) & 0x7F, (value >> 14) & 0x7F, (value >> 7) & 0x7F, value & 0x7F))
+
+
+def build_hls_timestamp_id3_tag(start_ms):
+    """ID3v2.4 tag with the HLS transport-stream timestamp PRIV frame for audio starting at start_ms."""
+    timestamp = int(round(max(0.0, start_ms) * HLS_TIMESTAMP_CLOCK_HZ / 1000.0)) & 0x1FFFFFFFF
+    priv_data = HLS_TIMESTAMP_PRIV_OWNER + b"\x00" + timestamp.to_bytes(8, 'big')
+    priv_frame = b"PRIV" + _syncsafe_int(len(priv_data)) + b"\x00\x00" + priv_data
+    return b"ID3\x04\x00\x00" + _syncsafe_int(len(priv_frame)) + priv_frame
+
+
+def copy_byte_range(src_path, start, end, dest_path, hasher=None, header=b""):
+    """
+    Copies bytes [start, end) of src_path into dest_path through a memory map, writing
+    memoryview slices of the mapping so no intermediate copies are made. An optional
+    header (e.g. an ID3 tag) is written first. If a hashlib object is given, every
+    chunk is fed to it in the same pass.
+    Returns the number of bytes written.
+    """
+    written = 0
+    with open(src_path, 'rb') as src, mmap.mmap(src.fileno(), 0, access=mmap.ACCESS_READ) as mm, \
+         open(dest_path, 'wb') as dest:
+        if header:
+            dest.write(header)
+            if hasher is not None:
+                hasher.update(header)
+            written += len(header)
+        view = memoryview(mm)
+        try:
+            for chunk_start in range(start, end, COPY_CHUNK_SIZE_BYTES):
+                chunk = view[chunk_start:min(end, chunk_start + COPY_CHUNK_SIZE_BYTES)]
+                dest.write(chunk)
+                if hasher is not None:
+                    hasher.update(chunk)
+                written += len(chunk)
+                chunk.release()
+        finally:
+            view.release()
+    return written
+
+
+def iter_file_range(src_path, start, end, chunk_size=COPY_CHUNK_SIZE_BYTES):
+    """Yields the bytes [start, end) of a file in chunks, e.g. for streaming a virtual part."""
+    with open(src_path, 'rb') as f:
+        f.seek(start)
+        remaining = end - start
+        while remaining > 0:
+            chunk = f.read(min(chunk_size, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+
+
+if __name__ == '__main__':
+    import sys
+    for arg_path in sys.argv[1:]:
+        idx = build_frame_index(arg_path)
+        if not idx:
+            print(f"{arg_path}: not an MP3 or no frames found")
+            continue
+        print(f"{arg_path}: {idx.num_frames} frames, {idx.duration_ms} ms, {idx.sample_rate} Hz, "
+              f"{idx.channels} ch, audio bytes {idx.audio_start}-{idx.audio_end}, "
+              f"encoder delay/padding {idx.encoder_delay}/{idx.encoder_padding}, "
+              f"avg bitrate {idx.average_bitrate_bps} bps")
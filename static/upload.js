@@ -0,0 +1,107 @@
+// Resumable chunked upload for the audio file of forms marked data-chunked-upload.
+// The audio is sent to /uploads in chunks before the form is submitted; the form then carries only
+// the upload id (audio_upload_id). A failed chunk is retried, and submitting again after an error
+// (or after reloading the page and picking the same file) resumes from the last stored chunk.
+document.addEventListener('DOMContentLoaded', function() {
+    const RETRIES_PER_CHUNK = 5;
+    const canHashChunks = !!(window.crypto && window.crypto.subtle); // Only in secure contexts
+
+    class UploadRejected extends Error {}
+
+    function resumeKey(file) {
+        return `chunked-upload:${file.name}:${file.size}:${file.lastModified}`;
+    }
+
+    function toHex(buffer) {
+        return Array.from(new Uint8Array(buffer), b => b.toString(16).padStart(2, '0')).join('');
+    }
+
+    async function requestJson(url, options) {
+        const response = await fetch(url, options);
+        const data = await response.json().catch(() => ({}));
+        if (!response.ok) throw new UploadRejected(data.message || response.statusText);
+        return data;
+    }
+
+    async function resumeSession(file) {
+        const uploadId = localStorage.getItem(resumeKey(file));
+        if (!uploadId) return null;
+        try {
+            return await requestJson(`/uploads/${uploadId}`);
+        } catch (e) {
+            localStorage.removeItem(resumeKey(file)); // Expired or claimed: start over
+            return null;
+        }
+    }
+
+    async function putChunk(uploadId, offset, chunk) {
+        const headers = {'Content-Type': 'application/octet-stream', 'Upload-Offset': String(offset)};
+        if (canHashChunks) {
+            headers['X-Chunk-SHA256'] = toHex(await window.crypto.subtle.digest('SHA-256', await chunk.arrayBuffer()));
+        }
+        for (let attempt = 1; ; attempt++) {
+            try {
+                const response = await fetch(`/uploads/${uploadId}`, {method: 'PUT', headers: headers, body: chunk});
+                const data = await response.json().catch(() => ({}));
+                if (response.ok) return data.offset;
+                // The server is elsewhere (e.g. an earlier response was lost): continue from its offset
+                if (response.status === 409 && typeof data.offset === 'number') return data.offset;
+                // 422 is a checksum mismatch (corrupted in transit) and 5xx may be transient; retry those
+                if (response.status !== 422 && response.status < 500) {
+                    throw new UploadRejected(data.message || response.statusText);
+                }
+                if (attempt >= RETRIES_PER_CHUNK) throw new Error(data.message || response.statusText);
+            } catch (e) {
+                if (e instanceof UploadRejected || attempt >= RETRIES_PER_CHUNK) throw e;
+            }
+            await new Promise(resolve => setTimeout(resolve, 1000 * 2 ** (attempt - 1)));
+        }
+    }
+
+    async function uploadFile(file, progress) {
+        let session = await resumeSession(file);
+        if (!session) {
+            session = await requestJson('/uploads', {
+                method: 'POST',
+                headers: {'Content-Type': 'application/json'},
+                body: JSON.stringify({filename: file.name, size: file.size})
+            });
+            localStorage.setItem(resumeKey(file), session.upload_id);
+        }
+        let offset = session.offset;
+        while (offset < file.size) {
+            if (progress) progress.textContent = `Uploading ${file.name}: ${Math.floor(offset * 100 / file.size)}%`;
+            offset = await putChunk(session.upload_id, offset, file.slice(offset, offset + session.chunk_size));
+        }
+        if (progress) progress.textContent = `Uploaded ${file.name}. Processing...`;
+        localStorage.removeItem(resumeKey(file));
+        return session.upload_id;
+    }
+
+    document.querySelectorAll('form[data-chunked-upload]').forEach(form => {
+        const fileInput = form.querySelector('input[type="file"][name="audio_file"]');
+        const uploadIdInput = form.querySelector('input[name="audio_upload_id"]');
+        const progress = form.querySelector('.upload-progress');
+        if (!fileInput || !uploadIdInput || !window.fetch) return; // Plain multipart upload
+        let uploading = false;
+
+        fileInput.addEventListener('change', () => { uploadIdInput.value = ""; });
+        form.addEventListener('submit', async event => {
+            const file = fileInput.files[0];
+            if (!file || fileInput.disabled) return; // TTS selected or no audio: submit as is
+            event.preventDefault();
+            if (uploading) return;
+            uploading = true;
+            try {
+                uploadIdInput.value = await uploadFile(file, progress);
+                fileInput.disabled = true; // The form now only needs to send the upload id
+                form.submit();
+                fileInput.disabled = false;
+            } catch (e) {
+                if (progress) progress.textContent = `Upload of ${file.name} failed: ${e.message}. Submit again to resume.`;
+            } finally {
+                uploading = false;
+            }
+        });
+    });
+});
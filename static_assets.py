@@ -0,0 +1,126 @@
+# bilingual_app/static_assets.py
+"""
+Build step for static files: content-fingerprinted copies (style.<hash>.css) that can be cached
+forever, each with brotli/gzip variants compressed once at maximum level, plus the Accept-Encoding
+negotiation used both for those variants and for compressing dynamic responses.
+Run with `flask build-assets`; without a build, templates fall back to the plain /static URLs.
+"""
+import gzip
+import hashlib
+import json
+import logging
+import shutil
+from pathlib import Path
+
+try:
+    import brotli
+    brotli_available = True
+except ImportError:
+    print("Warning: 'brotli' library not found (pip install brotli). Static assets and responses will only be gzip-compressed.")
+    brotli_available = False
+
+default_logger = logging.getLogger('static_assets_default')
+if not default_logger.hasHandlers(): # Avoid adding multiple handlers if re-imported
+    handler = logging.StreamHandler()
+    formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    handler.setFormatter(formatter)
+    default_logger.addHandler(handler)
+    default_logger.setLevel(logging.INFO)
+
+MANIFEST_FILENAME = 'manifest.json'
+FINGERPRINT_LENGTH = 12 # Hex digits of the content SHA-256 put into each built filename
+COMPRESSIBLE_SUFFIXES = {'.css', '.js', '.json', '.svg', '.txt', '.html'}
+# Content-Encoding -> suffix of the precompressed variant written next to each built file, best first
+PRECOMPRESSED_ENCODINGS = (('br', '.br'), ('gzip', '.gz'))
+
+
+def fingerprinted_name(relative_path, content):
+    """'js/article.js' -> 'js/article.<sha256 prefix>.js'."""
+    path = Path(relative_path)
+    digest = hashlib.sha256(content).hexdigest()[:FINGERPRINT_LENGTH]
+    return (path.parent / f"{path.stem}.{digest}{path.suffix}").as_posix()
+
+
+def compress_bytes(data, encoding, level=None):
+    """Compresses data for a Content-Encoding ('gzip' or 'br'); level None means maximum (build time)."""
+    if encoding == 'br':
+        return brotli.compress(data, quality=11 if level is None else level)
+    # mtime=0 keeps the output byte-identical across builds
+    return gzip.compress(data, compresslevel=9 if level is None else level, mtime=0)
+
+
+def build_assets(static_folder, output_folder, logger=None):
+    """
+    Copies every file under static_folder (except output_folder itself) to output_folder under a
+    content-fingerprinted name, writes .br/.gz variants next to compressible ones when they are smaller,
+    and writes manifest.json mapping the original relative path to the built one.
+    Old builds are removed first, so the folder only ever holds the current files.
+    Returns the manifest dict.
+    """
+    logger = logger if logger else default_logger
+    static_folder, output_folder = Path(static_folder), Path(output_folder)
+    if output_folder.exists():
+        shutil.rmtree(output_folder)
+    output_folder.mkdir(parents=True)
+
+    manifest = {}
+    for source in sorted(p for p in static_folder.rglob('*') if p.is_file()):
+        if output_folder in source.parents:
+            continue
+        relative_path = source.relative_to(static_folder).as_posix()
+        content = source.read_bytes()
+        built_name = fingerprinted_name(relative_path, content)
+        target = output_folder / built_name
+        target.parent.mkdir(parents=True, exist_ok=True)
+        target.write_bytes(content)
+        manifest[relative_path] = built_name
+
+        if source.suffix.lower() not in COMPRESSIBLE_SUFFIXES:
+            continue
+        for encoding, suffix in PRECOMPRESSED_ENCODINGS:
+            if encoding == 'br' and not brotli_available:
+                continue
+            compressed = compress_bytes(content, encoding)
+            if len(compressed) < len(content):
+                target.with_name(target.name + suffix).write_bytes(compressed)
+                logger.info(f"ASSETS: {relative_path} -> {built_name}{suffix}: {len(content)} -> {len(compressed)} bytes")
+
+    (output_folder / MANIFEST_FILENAME).write_text(json.dumps(manifest, indent=2, sort_keys=True), encoding='utf-8')
+    logger.info(f"ASSETS: Built {len(manifest)} static asset(s) into {output_folder}.")
+    return manifest
+
+
+def load_manifest(output_folder, logger=None):
+    """The manifest written by build_assets, or {} if assets have not been built."""
+    logger = logger if logger else default_logger
+    manifest_path = Path(output_folder) / MANIFEST_FILENAME
+    if not manifest_path.is_file():
+        return {}
+    try:
+        return json.loads(manifest_path.read_text(encoding='utf-8'))
+    except (OSError, ValueError) as e:
+        logger.error(f"ASSETS: Could not read asset manifest {manifest_path}: {e}")
+        return {}
+
+
+def choose_encoding(accept_encoding, available=('br', 'gzip')):
+    """
+    Best Content-Encoding from `available` (in preference order) that an Accept-Encoding header allows,
+    or None for identity. Encodings with q=0 are refused.
+    """
+    accepted = {}
+    for item in (accept_encoding or '').split(','):
+        name, _, params = item.strip().partition(';')
+        quality = 1.0
+        params = params.strip()
+        if params.startswith('q='):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        if name:
+            accepted[name.strip().lower()] = quality
+    for encoding in available:
+        if accepted.get(encoding, accepted.get('*', 0.0)) > 0:
+            return encoding
+    return None
@@ -0,0 +1,114 @@
+# bilingual_app/subtitles.py
+"""
+Subtitle and timing exports generated straight from sentence rows.
+Every format is a generator of text chunks, so an article of any length can be streamed to a client
+(or written to a file) without building the whole document in memory. Rows are anything indexable by
+column name with english_text, chinese_text, start_time_ms and end_time_ms (sqlite3.Row, dict);
+JSON timing also uses paragraph_index and sentence_index_in_paragraph. Rows without both times are skipped.
+"""
+import json
+
+# Export format -> (mimetype, file extension)
+SUBTITLE_FORMATS = {
+    'srt': ('application/x-subrip', 'srt'),
+    'vtt': ('text/vtt', 'vtt'),
+    'json': ('application/json', 'json'),
+}
+SUBTITLE_LANGS = ('both', 'en', 'zh')
+JSON_TIMING_FIELDS = ('paragraph_index', 'sentence_index_in_paragraph', 'start_time_ms', 'end_time_ms')
+CHUNK_CUES = 200 # Cues joined into one yielded chunk; keeps per-chunk overhead low when streaming
+
+
+def format_timestamp(ms_total, fraction_separator=','):
+    """'HH:MM:SS,mmm' (SRT) or, with '.', 'HH:MM:SS.mmm' (WebVTT)."""
+    ms_total = max(int(ms_total or 0), 0)
+    s_total, ms = divmod(ms_total, 1000)
+    m_total, s = divmod(s_total, 60)
+    h, m = divmod(m_total, 60)
+    return f"{h:02d}:{m:02d}:{s:02d}{fraction_separator}{ms:03d}"
+
+
+def _timed_rows(rows):
+    for row in rows:
+        if row['start_time_ms'] is not None and row['end_time_ms'] is not None:
+            yield row
+
+
+def _cue_text(row, lang, bilingual_separator):
+    english = (row['english_text'] or '').strip()
+    chinese = (row['chinese_text'] or '').strip()
+    if lang == 'en':
+        return english
+    if lang == 'zh':
+        return chinese
+    return f"{english}{bilingual_separator}{chinese}"
+
+
+def _chunked(lines):
+    chunk = []
+    for line in lines:
+        chunk.append(line)
+        if len(chunk) >= CHUNK_CUES:
+            yield ''.join(chunk)
+            chunk = []
+    if chunk:
+        yield ''.join(chunk)
+
+
+def iter_srt(rows, lang='both', bilingual_separator='\n'):
+    """SRT cues numbered from 1; lang 'both' puts English and Chinese in one cue, joined by bilingual_separator."""
+    def cues():
+        for number, row in enumerate(_timed_rows(rows), start=1):
+            yield (f"{number}\n{format_timestamp(row['start_time_ms'])} --> {format_timestamp(row['end_time_ms'])}\n"
+                   f"{_cue_text(row, lang, bilingual_separator)}\n\n")
+    return _chunked(cues())
+
+
+def _vtt_escape(text):
+    return text.replace('&', '&amp;').replace('<', '&lt;').replace('>', '&gt;')
+
+
+def iter_webvtt(rows, lang='both'):
+    """
+    WebVTT with one cue per language: for 'both', each sentence gives an English and a Chinese cue with the
+    same timing (players stack them), tagged <lang en>/<lang zh> and with ids ending in -en/-zh so either
+    can be styled or hidden through ::cue(lang(...)).
+    """
+    langs = ('en', 'zh') if lang == 'both' else (lang,)
+    def cues():
+        yield "WEBVTT\n\n"
+        for number, row in enumerate(_timed_rows(rows), start=1):
+            timing = f"{format_timestamp(row['start_time_ms'], '.')} --> {format_timestamp(row['end_time_ms'], '.')}"
+            for cue_lang in langs:
+                text = _vtt_escape(_cue_text(row, cue_lang, ''))
+                yield f"{number}-{cue_lang}\n{timing}\n<lang {cue_lang}>{text}</lang>\n\n"
+    return _chunked(cues())
+
+
+def iter_json_timings(rows, header=None):
+    """
+    Compact timing JSON: {...header, "fields": [...], "sentences": [[p, s, start_ms, end_ms], ...]},
+    one array per timed sentence in JSON_TIMING_FIELDS order. Streamed; the result is a single JSON document.
+    """
+    document = dict(header or {})
+    document['fields'] = list(JSON_TIMING_FIELDS)
+    opening = json.dumps(document, separators=(',', ':'))[:-1] + ',"sentences":['
+    def parts():
+        yield opening
+        separator = ''
+        for row in _timed_rows(rows):
+            yield separator + json.dumps([row[field] for field in JSON_TIMING_FIELDS], separators=(',', ':'))
+            separator = ','
+        yield ']}'
+    return _chunked(parts())
+
+
+def iter_subtitles(subtitle_format, rows, lang='both', header=None):
+    """Dispatches to the generator for one of SUBTITLE_FORMATS ('json' ignores lang, the others ignore header)."""
+    if subtitle_format == 'srt':
+        return iter_srt(rows, lang=lang)
+    if subtitle_format == 'vtt':
+        return iter_webvtt(rows, lang=lang)
+    if subtitle_format == 'json':
+        return iter_json_timings(rows, header=header)
+    raise ValueError(f"Unknown subtitle format '{subtitle_format}'")
@@ -0,0 +1,94 @@
+"""
+Benchmark: sentence timings read from the per-sentence columns vs the packed sentence_timings BLOB.
+
+    python tests/bench_sentence_timings.py [sentence counts...]   (default: 5000 20000)
+
+Not collected by pytest. Uses a throwaway database; prints the best of REPEATS runs in milliseconds.
+"""
+import logging
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import db_manager
+
+REPEATS = 15
+SENTENCES_PER_PARAGRAPH = 10
+
+
+def best_ms(func):
+    times = []
+    for _ in range(REPEATS):
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+    return min(times) * 1000
+
+
+def read_timings_from_rows(article_id):
+    conn = db_manager.get_db_connection()
+    try:
+        rows = conn.execute(f"""
+            SELECT {', '.join(db_manager.PACKED_TIMING_FIELDS)} FROM sentences
+            WHERE article_id = ?
+            ORDER BY paragraph_index, sentence_index_in_paragraph
+        """, (article_id,)).fetchall()
+        return {field: [row[field] for row in rows] for field in db_manager.PACKED_TIMING_FIELDS}
+    finally:
+        conn.close()
+
+
+def write_timings_to_rows(article_id, timestamps):
+    """update_sentence_timestamps without the sentence_timings upkeep."""
+    conn = db_manager.get_db_connection()
+    try:
+        ids = [row['id'] for row in conn.execute("""
+            SELECT id FROM sentences WHERE article_id = ? ORDER BY paragraph_index, sentence_index_in_paragraph
+        """, (article_id,))]
+        conn.executemany("UPDATE sentences SET start_time_ms = ?, end_time_ms = ? WHERE id = ?",
+                         [(start_ms, end_ms, sentence_id) for sentence_id, (start_ms, end_ms) in zip(ids, timestamps)])
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def run(sentence_count):
+    book_id = db_manager.add_book(f"Benchmark {sentence_count}")
+    article_id = db_manager.add_article(book_id, f"benchmark_{sentence_count}")
+    db_manager.add_sentences_batch(article_id, [(i // SENTENCES_PER_PARAGRAPH, i % SENTENCES_PER_PARAGRAPH,
+                                                 f"English sentence number {i}.", f"第{i}句。")
+                                                for i in range(sentence_count)])
+    timestamps = [(i * 1000, i * 1000 + 900) for i in range(sentence_count)]
+    db_manager.update_sentence_timestamps(article_id, timestamps)
+
+    results = {
+        'read timings, per-sentence columns': best_ms(lambda: read_timings_from_rows(article_id)),
+        'read timings, packed BLOB': best_ms(lambda: db_manager.get_packed_sentence_timings(article_id)),
+        'view_article rows (all columns)': best_ms(lambda: db_manager.get_sentences_for_article(article_id)),
+        'view_article rows (texts + BLOB)': best_ms(lambda: (db_manager.get_sentence_texts_for_article(article_id),
+                                                              db_manager.get_packed_sentence_timings(article_id))),
+        'write timestamps, per-sentence columns': best_ms(lambda: write_timings_to_rows(article_id, timestamps)),
+        'write timestamps, columns + BLOB': best_ms(lambda: db_manager.update_sentence_timestamps(article_id, timestamps)),
+    }
+    print(f"{sentence_count} sentences (best of {REPEATS}):")
+    for label, ms in results.items():
+        print(f"  {label:<40} {ms:8.2f} ms")
+
+
+def main(sentence_counts):
+    db_manager.default_logger.setLevel(logging.WARNING) # Every write logs at INFO
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db_manager.DATABASE_PATH = os.path.join(tmp_dir, 'bench.db')
+        db_manager.init_db()
+        try:
+            for sentence_count in sentence_counts:
+                run(sentence_count)
+        finally:
+            db_manager.close_thread_connection()
+
+
+if __name__ == '__main__':
+    main([int(arg) for arg in sys.argv[1:]] or [5000, 20000])
@@ -0,0 +1,62 @@
+"""
+Shared fixtures: throwaway databases for db_manager, and the Flask app imported against one with its
+instance folder (logs, processed files) in a temporary directory instead of the repository.
+"""
+import os
+import sys
+from contextlib import contextmanager
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import db_manager
+
+
+@contextmanager
+def _database_at(database_path, app=None):
+    """Points db_manager at a new database for the duration of the block, then restores the previous one."""
+    original_database_path = db_manager.DATABASE_PATH
+    db_manager.DATABASE_PATH = str(database_path)
+    try:
+        db_manager.init_db(app)
+        yield
+    finally:
+        # Positions buffered during the block belong to this database; write them before switching back
+        db_manager.flush_reading_locations()
+        db_manager.close_thread_connection()
+        db_manager.DATABASE_PATH = original_database_path
+
+
+def _make_article(sentences, title='Test Book', filename='test_article'):
+    """Adds a book with one article and its (paragraph_index, sentence_index, english, chinese) sentences."""
+    book_id = db_manager.add_book(title)
+    article_id = db_manager.add_article(book_id, filename)
+    db_manager.add_sentences_batch(article_id, sentences)
+    return book_id, article_id
+
+
+@pytest.fixture(scope='session')
+def database_at():
+    return _database_at
+
+
+@pytest.fixture(scope='session')
+def make_article():
+    return _make_article
+
+
+@pytest.fixture
+def database(tmp_path):
+    with _database_at(tmp_path / 'test.db'):
+        yield
+
+
+@pytest.fixture(scope='session')
+def flask_app(tmp_path_factory):
+    """app.app, imported once per session; its startup database and instance folder are temporary."""
+    instance_path = tmp_path_factory.mktemp('instance')
+    os.environ['AUDIOBOOK_WEB_INSTANCE_PATH'] = str(instance_path)
+    with _database_at(instance_path / 'bilingual_data.db'):
+        import app as app_module
+        yield app_module.app
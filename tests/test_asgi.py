@@ -0,0 +1,78 @@
+"""ASGI serving mode (asgi.application): the async routes, driven concurrently through httpx.ASGITransport."""
+import asyncio
+
+import pytest
+
+import db_manager
+
+httpx = pytest.importorskip('httpx')
+
+PART_BYTE_RANGES = [(0, 8192), (8192, 16384)]
+
+
+@pytest.fixture(scope='module')
+def served(flask_app, database_at, make_article, tmp_path_factory):
+    tmp_path = tmp_path_factory.mktemp('asgi')
+    import asgi
+    with database_at(tmp_path / 'test.db', asgi.app):
+        _, article_id = make_article([(0, s, f"Sentence {s}.", f"句子 {s}。") for s in range(4)])
+        mp3_bytes = bytes(range(256)) * 64
+        mp3_path = tmp_path / 'converted.mp3'
+        mp3_path.write_bytes(mp3_bytes)
+        db_manager.update_article_converted_mp3_path(article_id, str(mp3_path))
+        db_manager.update_article_mp3_parts_info(article_id, None, 2, part_checksums_list=['a' * 64, 'b' * 64],
+                                                 part_byte_ranges_list=PART_BYTE_RANGES)
+        yield asgi.application, article_id, mp3_bytes
+
+
+def _client(application):
+    return httpx.AsyncClient(transport=httpx.ASGITransport(app=application), base_url='http://testserver')
+
+
+def test_concurrent_part_downloads_and_location_save(served, caplog):
+    application, article_id, mp3_bytes = served
+    caplog.set_level('INFO')
+
+    async def run():
+        async with _client(application) as client:
+            downloads = [client.get(f"/article/{article_id}/serve_mp3_part/{i % 2}") for i in range(8)]
+            save = client.post(f"/article/{article_id}/save_location",
+                               json={'paragraph_index': 0, 'sentence_index_in_paragraph': 3})
+            return await asyncio.gather(save, *downloads)
+
+    save_response, *part_responses = asyncio.run(run())
+    assert save_response.status_code == 200
+    assert save_response.json()['status'] == 'success'
+    for i, response in enumerate(part_responses):
+        start_byte, end_byte = PART_BYTE_RANGES[i % 2]
+        assert response.status_code == 200
+        assert response.content == mp3_bytes[start_byte:end_byte]
+    assert db_manager.get_reading_location(article_id)['sentence_index_in_paragraph'] == 3
+    assert caplog.text.count('ASGI: Serving MP3 part') == 8 # Answered on the event loop, not by the Flask view
+
+
+def test_missing_part_falls_through_to_flask(served):
+    application, article_id, _ = served
+
+    async def run():
+        async with _client(application) as client:
+            return await client.get(f"/article/{article_id}/serve_mp3_part/5")
+
+    assert asyncio.run(run()).status_code == 404
+
+
+def test_upload_status(served):
+    application, _, _ = served
+    upload_id = 'f' * 32
+    db_manager.create_upload_session(upload_id, 'book.mp3', 1000, '/nonexistent/book.mp3.part')
+
+    async def run():
+        async with _client(application) as client:
+            return await asyncio.gather(client.get(f"/uploads/{upload_id}"), client.get(f"/uploads/{'0' * 32}"))
+
+    known, unknown = asyncio.run(run())
+    assert known.status_code == 200
+    assert known.json()['upload_id'] == upload_id
+    assert known.json()['offset'] == 0
+    assert not known.json()['complete']
+    assert unknown.status_code == 404
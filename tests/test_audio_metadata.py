@@ -0,0 +1,16 @@
+"""audio_processor.get_audio_metadata / get_audio_duration_ms on top of the audio_metadata cache."""
+import pytest
+
+import db_manager
+
+
+@pytest.fixture
+def audio_processor(database):
+    import audio_processor
+    return audio_processor
+
+
+def test_missing_file_has_no_metadata(audio_processor, tmp_path):
+    missing_path = str(tmp_path / 'missing.mp3')
+    assert audio_processor.get_audio_metadata(missing_path) is None
+    assert audio_processor.get_audio_duration_ms(missing_path) is None
@@ -0,0 +1,39 @@
+"""chunked_upload: chunk writes and claims, including against sessions aborted or purged concurrently."""
+import hashlib
+import io
+
+import pytest
+
+import chunked_upload
+
+
+def test_chunk_for_a_removed_staging_file_is_unknown_upload(database, tmp_path):
+    session = chunked_upload.create_upload('book.mp3', 4, str(tmp_path / 'staging'))
+    (tmp_path / 'staging' / (session['id'] + chunked_upload.STAGING_SUFFIX)).unlink() # An abort that has removed the file but not yet the row
+    with pytest.raises(chunked_upload.UploadError) as excinfo:
+        chunked_upload.write_chunk(session['id'], 0, io.BytesIO(b'abcd'), 4)
+    assert excinfo.value.status == 404
+
+
+def test_chunks_advance_the_offset(database, tmp_path):
+    session = chunked_upload.create_upload('book.mp3', 4, str(tmp_path / 'staging'))
+    assert chunked_upload.write_chunk(session['id'], 0, io.BytesIO(b'ab'), 2) == 2
+    assert chunked_upload.write_chunk(session['id'], 2, io.BytesIO(b'cd'), 2) == 4
+    completed = chunked_upload.claim_completed_upload(session['id'])
+    completed.save(tmp_path / 'book.mp3')
+    assert (tmp_path / 'book.mp3').read_bytes() == b'abcd'
+
+
+def test_claim_of_a_removed_staging_file_is_unknown_upload(database, tmp_path):
+    session = chunked_upload.create_upload('book.mp3', 4, str(tmp_path / 'staging'), sha256=hashlib.sha256(b'abcd').hexdigest())
+    chunked_upload.write_chunk(session['id'], 0, io.BytesIO(b'abcd'), 4)
+    (tmp_path / 'staging' / (session['id'] + chunked_upload.STAGING_SUFFIX)).unlink()
+    assert chunked_upload.claim_completed_upload(session['id']) is None
+
+
+def test_upload_can_only_be_claimed_once(database, tmp_path):
+    session = chunked_upload.create_upload('book.mp3', 4, str(tmp_path / 'staging'))
+    chunked_upload.write_chunk(session['id'], 0, io.BytesIO(b'abcd'), 4)
+    assert chunked_upload.claim_completed_upload(session['id']) is not None
+    assert chunked_upload.claim_completed_upload(session['id']) is None
+    assert chunked_upload.get_upload(session['id']) is None
@@ -0,0 +1,30 @@
+"""db_manager.connection_scope: db_manager writes made inside a scope are committed or rolled back together."""
+import pytest
+
+import db_manager
+
+
+def _book_titles():
+    conn = db_manager.get_db_connection()
+    try:
+        return [row['title'] for row in conn.execute("SELECT title FROM books ORDER BY title")]
+    finally:
+        conn.close()
+
+
+def test_scope_that_raises_rolls_back_helper_writes(database):
+    with pytest.raises(RuntimeError):
+        with db_manager.connection_scope():
+            book_id = db_manager.add_book('Scoped')
+            db_manager.add_article(book_id, 'scoped_article')
+            raise RuntimeError("job failed")
+    assert _book_titles() == []
+
+
+def test_scope_commits_on_success(database):
+    with db_manager.connection_scope():
+        db_manager.add_book('Scoped')
+        with db_manager.connection_scope(): # Nested scopes leave the commit to the outermost one
+            db_manager.add_book('Nested')
+        assert db_manager.get_db_connection().in_transaction
+    assert _book_titles() == ['Nested', 'Scoped']
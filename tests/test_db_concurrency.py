@@ -0,0 +1,68 @@
+"""
+WAL journaling: readers on other connections are not blocked while a long write transaction is open,
+and see the last committed state rather than waiting for the writer.
+"""
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+import db_manager
+
+WRITE_HOLD_S = 2.0 # How long the writer keeps its transaction open
+READ_DEADLINE_S = 0.5 # Well under the hold time and the busy timeout: a blocked read can't pass
+
+
+@pytest.fixture
+def article_id(database, make_article):
+    _, article_id = make_article([(0, i, f"Sentence {i}.", f"句子{i}。") for i in range(100)])
+    return article_id
+
+
+def _hold_write_transaction(article_id, started, release):
+    """Updates every sentence of the article in one transaction and keeps it open until release is set."""
+    conn = db_manager.get_db_connection()
+    try:
+        conn.execute("BEGIN EXCLUSIVE") # Locks readers out under a rollback journal; in WAL it only excludes writers
+        conn.execute("UPDATE sentences SET english_text = english_text || ' (edited)' WHERE article_id = ?", (article_id,))
+        started.set()
+        release.wait(WRITE_HOLD_S)
+        conn.commit()
+    finally:
+        db_manager.close_thread_connection()
+
+
+def _timed_read(article_id):
+    """Runs the reads of a page view on this thread's own connection; returns (seconds, first sentence text)."""
+    start = time.perf_counter()
+    try:
+        article = db_manager.get_article_by_id(article_id)
+        sentences = db_manager.get_sentences_for_article(article_id)
+        db_manager.get_reading_location(article_id)
+        assert article is not None
+        return time.perf_counter() - start, sentences[0]['english_text']
+    finally:
+        db_manager.close_thread_connection()
+
+
+def test_journal_mode_is_wal(article_id):
+    assert db_manager.get_db_connection().execute("PRAGMA journal_mode").fetchone()[0] == 'wal'
+
+
+def test_reads_complete_during_long_write(article_id):
+    started, release = threading.Event(), threading.Event()
+    writer = threading.Thread(target=_hold_write_transaction, args=(article_id, started, release))
+    writer.start()
+    try:
+        assert started.wait(5)
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            results = list(pool.map(_timed_read, [article_id] * 32))
+        assert writer.is_alive() # The write transaction was open the whole time
+    finally:
+        release.set()
+        writer.join()
+
+    assert max(seconds for seconds, _ in results) < READ_DEADLINE_S
+    assert all(text == 'Sentence 0.' for _, text in results) # Uncommitted edits are not visible
+    assert db_manager.get_sentences_for_article(article_id)[0]['english_text'] == 'Sentence 0. (edited)'
@@ -0,0 +1,118 @@
+"""
+SQL statements per request for the hot endpoints, read from the X-DB-Query-Count header
+(DB_COUNT_QUERIES). A higher count means a query crept back into the request path.
+"""
+import pytest
+
+import db_manager
+
+
+@pytest.fixture(scope='module')
+def client(flask_app, database_at, make_article, tmp_path_factory):
+    tmp_path = tmp_path_factory.mktemp('query_counts')
+    with database_at(tmp_path / 'test.db', flask_app):
+        _, article_id = make_article([(p, s, f"Sentence {p}.{s}.", f"句子 {p}.{s}。") for p in range(5) for s in range(10)])
+        db_manager.update_sentence_timestamps(article_id, [(i * 1000, i * 1000 + 900) for i in range(50)])
+        mp3_path = tmp_path / 'converted.mp3'
+        mp3_path.write_bytes(bytes(range(256)) * 64)
+        db_manager.update_article_converted_mp3_path(article_id, str(mp3_path))
+        db_manager.update_article_mp3_parts_info(article_id, None, 2, part_checksums_list=['a' * 64, 'b' * 64],
+                                                 part_byte_ranges_list=[(0, 8192), (8192, 16384)])
+
+        # Unsplit: played from the converted MP3, verified against its whole-file fingerprint
+        _, unsplit_article_id = make_article([(0, s, f"Sentence {s}.", f"句子 {s}。") for s in range(10)],
+                                             filename='unsplit_article')
+        db_manager.update_sentence_timestamps(unsplit_article_id, [(i * 1000, i * 1000 + 900) for i in range(10)])
+        db_manager.update_article_converted_mp3_path(unsplit_article_id, str(mp3_path), fingerprint='f' * 64)
+
+        flask_app.config.update(TESTING=True, DB_COUNT_QUERIES=True)
+        try:
+            with flask_app.test_client() as test_client:
+                test_client.article_id = article_id
+                test_client.unsplit_article_id = unsplit_article_id
+                yield test_client
+        finally:
+            flask_app.config['DB_COUNT_QUERIES'] = False
+
+
+def _query_count(response):
+    assert 'X-DB-Query-Count' in response.headers
+    return int(response.headers['X-DB-Query-Count'])
+
+
+def test_view_article_query_count(client):
+    # Article with book and location, sentence count and packed timings, sentence texts, renditions
+    response = client.get(f"/article/{client.article_id}")
+    assert response.status_code == 200
+    assert _query_count(response) == 5
+
+    # Sentence markup now comes from the content cache: article with book and location, renditions
+    response = client.get(f"/article/{client.article_id}")
+    assert response.status_code == 200
+    assert _query_count(response) == 2
+
+
+def test_view_unsplit_article_query_count(client):
+    # Same queries as a split article: the whole-file fingerprint comes with the article row
+    response = client.get(f"/article/{client.unsplit_article_id}")
+    assert response.status_code == 200
+    assert _query_count(response) == 5
+    assert b'f' * 64 in response.data
+
+    response = client.get(f"/article/{client.unsplit_article_id}")
+    assert response.status_code == 200
+    assert _query_count(response) == 2
+
+
+def test_serve_mp3_part_query_count(client):
+    response = client.get(f"/article/{client.article_id}/serve_mp3_part/1")
+    assert response.status_code == 200
+    assert _query_count(response) == 1
+
+
+def test_export_subtitles_query_count(client):
+    response = client.get(f"/article/{client.article_id}/subtitles.vtt")
+    assert response.status_code == 200
+    assert response.data.startswith(b"WEBVTT")
+
+    assert 'Content-Length' not in response.headers # Streamed on a cache miss
+
+    # The generated file is cached per content version: only the article lookup remains
+    response = client.get(f"/article/{client.article_id}/subtitles.vtt")
+    assert response.status_code == 200
+    assert response.data.startswith(b"WEBVTT")
+    assert response.headers['Content-Length'] == str(len(response.data))
+    assert _query_count(response) == 1
+
+
+def test_export_subtitles_over_cache_limit_is_streamed_every_time(client):
+    client.application.config['SUBTITLE_CACHE_MAX_BYTES'] = 64
+    try:
+        for _ in range(2):
+            response = client.get(f"/article/{client.article_id}/subtitles.srt")
+            assert response.status_code == 200
+            assert len(response.data) > 64
+            assert 'Content-Length' not in response.headers
+            assert _query_count(response) > 1
+    finally:
+        client.application.config['SUBTITLE_CACHE_MAX_BYTES'] = 16 * 1024 * 1024
+
+
+def test_save_location_query_count(client):
+    response = client.post(f"/article/{client.article_id}/save_location",
+                           json={'paragraph_index': 1, 'sentence_index_in_paragraph': 2})
+    assert response.status_code == 200
+    assert _query_count(response) == 1 # The location itself is buffered, not written
+
+
+def test_query_count_stopped_when_view_raises(client, monkeypatch):
+    # A propagated exception skips after_request (report_db_query_count); teardown_request must still stop counting
+    import app as app_module
+
+    def failing_load_article(article_id):
+        raise RuntimeError("load failed")
+
+    monkeypatch.setattr(app_module, 'load_article', failing_load_article)
+    with pytest.raises(RuntimeError):
+        client.get(f"/article/{client.article_id}/serve_mp3_part/0")
+    assert db_manager.stop_query_count() is None
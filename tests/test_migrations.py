@@ -0,0 +1,41 @@
+"""Schema migrations (MIGRATIONS) run against data written by the current code."""
+import sqlite3
+
+import pytest
+
+import db_manager
+
+
+def test_packed_timings_migration_matches_live_packing(database):
+    book_id = db_manager.add_book('Migration Book')
+    article_ids = [db_manager.add_article(book_id, f"migration_article_{n}") for n in range(2)]
+    for article_id in article_ids:
+        db_manager.add_sentences_batch(article_id, [(p, s, f"Sentence {p}.{s}.", f"句子 {p}.{s}。")
+                                                    for p in (1, 0) for s in range(3)])
+    db_manager.update_sentence_timestamps(article_ids[0], [(i * 1000, i * 1000 + 900) for i in range(6)])
+    db_manager.update_sentence_timestamps(article_ids[1], [(i * 1000, None) for i in range(4)]) # Leaves NULLs
+    conn = db_manager.get_db_connection()
+    expected = {row['article_id']: (row['sentence_count'], row['timings'])
+                for row in conn.execute("SELECT * FROM sentence_timings")}
+    assert set(expected) == set(article_ids)
+
+    conn.execute("DROP TABLE sentence_timings")
+    db_manager._migration_0002_packed_sentence_timings(conn.cursor(), db_manager.default_logger)
+    conn.commit()
+    migrated = {row['article_id']: (row['sentence_count'], row['timings'])
+                for row in conn.execute("SELECT * FROM sentence_timings")}
+    conn.close()
+    assert migrated == expected
+
+
+def test_failed_migration_stops_init_db(database, monkeypatch):
+    def _failing_migration(cursor, logger):
+        cursor.execute("ALTER TABLE no_such_table ADD COLUMN x INTEGER")
+
+    monkeypatch.setattr(db_manager, 'MIGRATIONS', db_manager.MIGRATIONS + [(db_manager.SCHEMA_VERSION + 1, 'failing', _failing_migration)])
+    monkeypatch.setattr(db_manager, 'SCHEMA_VERSION', db_manager.SCHEMA_VERSION + 1)
+    with pytest.raises(sqlite3.Error):
+        db_manager.init_db()
+    conn = db_manager.get_db_connection()
+    assert db_manager.get_schema_version(conn) == db_manager.SCHEMA_VERSION - 1 # Left at the last good version
+    conn.close()
@@ -0,0 +1,68 @@
+"""Buffered reading locations (buffer_reading_location / flush_reading_locations)."""
+import os
+import threading
+import time
+
+import pytest
+
+import db_manager
+
+
+@pytest.fixture
+def article(monkeypatch, database, make_article):
+    monkeypatch.setattr(db_manager, '_reading_location_flusher', object()) # Buffer without a flusher thread
+    monkeypatch.setattr(db_manager, '_pending_reading_locations', {})
+    return make_article([(0, 0, 'One.', '一。'), (0, 1, 'Two.', '二。')])
+
+
+def test_buffered_location_is_read_before_flush(article):
+    book_id, article_id = article
+    db_manager.buffer_reading_location(article_id, book_id, 0, 1)
+    assert db_manager.get_reading_location(article_id)['sentence_index_in_paragraph'] == 1
+    assert db_manager.flush_reading_locations() == 1
+    assert db_manager._pending_reading_locations == {}
+    assert db_manager.get_reading_location(article_id)['sentence_index_in_paragraph'] == 1
+
+
+def test_reprocessing_drops_buffered_location(article):
+    book_id, article_id = article
+    db_manager.buffer_reading_location(article_id, book_id, 0, 1)
+    assert db_manager.add_article(book_id, 'test_article') == article_id # Re-processing resets the article
+    assert db_manager.get_reading_location(article_id) is None
+    assert db_manager.flush_reading_locations() == 0
+    assert db_manager.get_reading_location(article_id) is None
+
+
+def test_flush_writes_to_the_database_the_location_was_buffered_for(article, database_at, tmp_path):
+    book_id, article_id = article
+    db_manager.buffer_reading_location(article_id, book_id, 0, 1)
+    with database_at(tmp_path / 'other.db'):
+        assert db_manager.flush_reading_locations() == 1
+        assert db_manager.get_reading_location(article_id) is None
+    assert db_manager.get_reading_location(article_id)['sentence_index_in_paragraph'] == 1
+
+
+def test_flush_of_a_removed_database_drops_its_locations(article, tmp_path):
+    book_id, article_id = article
+    db_manager.buffer_reading_location(article_id, book_id, 0, 1)
+    db_manager.close_thread_connection()
+    for database_file in tmp_path.glob('test.db*'):
+        database_file.unlink()
+    assert db_manager.flush_reading_locations() == 0
+    assert db_manager._pending_reading_locations == {}
+    assert not os.path.exists(tmp_path / 'test.db')
+
+
+def test_flush_waiting_on_reprocessing_does_not_write_back_the_old_location(article):
+    book_id, article_id = article
+    db_manager.buffer_reading_location(article_id, book_id, 0, 1)
+    conn = db_manager.get_db_connection()
+    conn.execute("BEGIN IMMEDIATE") # Holds the write lock as add_article's DELETEs would
+    flushed = []
+    flusher = threading.Thread(target=lambda: flushed.append(db_manager.flush_reading_locations()))
+    flusher.start()
+    time.sleep(0.2) # Let the flush block on the write lock
+    assert db_manager.add_article(book_id, 'test_article') == article_id # Commits the open transaction
+    flusher.join()
+    assert flushed == [0]
+    assert db_manager.get_reading_location(article_id) is None
@@ -0,0 +1,36 @@
+"""compress_response: HTML/JSON bodies compressed on the fly, and the ETags of their encoded representations."""
+import gzip
+import json
+
+import pytest
+
+import db_manager
+
+
+@pytest.fixture(scope='module')
+def client(flask_app, database_at, make_article, tmp_path_factory):
+    with database_at(tmp_path_factory.mktemp('compression') / 'test.db', flask_app):
+        _, article_id = make_article([(0, s, f"Sentence {s}.", f"句子 {s}。") for s in range(100)])
+        db_manager.update_sentence_timestamps(article_id, [(i * 1000, i * 1000 + 900) for i in range(100)])
+        flask_app.config['TESTING'] = True
+        with flask_app.test_client() as test_client:
+            test_client.article_id = article_id
+            yield test_client
+
+
+def test_compressed_subtitles_get_a_weak_etag(client):
+    url = f"/article/{client.article_id}/subtitles.json"
+    assert client.get(url).data # Streamed on the first request, cached for the next ones
+
+    identity = client.get(url, headers={'Accept-Encoding': 'identity'})
+    compressed = client.get(url, headers={'Accept-Encoding': 'gzip'})
+    assert compressed.headers['Content-Encoding'] == 'gzip'
+    assert json.loads(gzip.decompress(compressed.data)) == json.loads(identity.data)
+    identity_etag, identity_weak = identity.get_etag()
+    compressed_etag, compressed_weak = compressed.get_etag()
+    assert not identity_weak and compressed_weak
+    assert compressed_etag == identity_etag
+
+    revalidated = client.get(url, headers={'Accept-Encoding': 'gzip', 'If-None-Match': compressed.headers['ETag']})
+    assert revalidated.status_code == 304
+    assert revalidated.get_etag() == (compressed_etag, True)
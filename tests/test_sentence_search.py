@@ -0,0 +1,66 @@
+"""
+search_sentences: one- and two-character Chinese terms are answered from sentence_grams (no scan of
+every sentence); longer terms use the sentences_fts trigram index.
+"""
+import pytest
+
+import db_manager
+
+
+@pytest.fixture
+def article_id(database, make_article):
+    _, article_id = make_article([
+        (0, 0, 'I like learning Chinese.', '我喜欢学习中文。'),
+        (0, 1, 'The weather is nice today.', '今天天气很好。'),
+        (1, 0, 'Learning takes time.', '学习需要时间。'),
+    ])
+    return article_id
+
+
+def _search_plan(query):
+    """(rows, EXPLAIN QUERY PLAN details) of search_sentences(query)."""
+    statements = []
+    conn = db_manager.get_db_connection()
+    conn.set_trace_callback(statements.append)
+    try:
+        rows = db_manager.search_sentences(query)
+    finally:
+        conn.set_trace_callback(None)
+    select = next(s for s in statements if 'FROM' in s and 'sqlite_master' not in s)
+    plan = [row['detail'] for row in conn.execute("EXPLAIN QUERY PLAN " + select)]
+    return rows, plan
+
+
+def test_two_character_chinese_term_uses_gram_index(article_id):
+    rows, plan = _search_plan('学习')
+    assert [row['english_text'] for row in rows] == ['I like learning Chinese.', 'Learning takes time.']
+    assert 'SEARCH g USING PRIMARY KEY (gram=?)' in plan # g is sentence_grams
+    assert not any(detail.startswith('SCAN') for detail in plan)
+
+
+def test_several_short_terms_and_single_characters(article_id):
+    assert [row['english_text'] for row in db_manager.search_sentences('学习 时')] == ['Learning takes time.']
+    assert [row['english_text'] for row in db_manager.search_sentences('好')] == ['The weather is nice today.']
+    assert db_manager.search_sentences('习中 天气') == []
+
+
+def test_short_chinese_term_with_trigram_term(article_id):
+    rows, plan = _search_plan('learning 中文')
+    assert [row['english_text'] for row in rows] == ['I like learning Chinese.']
+    assert any('sentences_fts' in detail for detail in plan)
+
+
+def test_reprocessed_article_drops_its_grams(article_id):
+    book_id = db_manager.get_article_by_id(article_id)['book_id']
+    db_manager.add_article(book_id, 'test_article') # Re-processing clears the sentences
+    assert db_manager.search_sentences('学习') == []
+    count = db_manager.get_db_connection().execute("SELECT COUNT(*) FROM sentence_grams").fetchone()[0]
+    assert count == 0
+
+
+def test_migration_indexes_existing_sentences(article_id):
+    conn = db_manager.get_db_connection()
+    conn.execute("DROP TABLE sentence_grams")
+    db_manager._migration_0007_sentence_short_term_index(conn.cursor(), db_manager.default_logger)
+    conn.commit()
+    assert [row['english_text'] for row in db_manager.search_sentences('天气')] == ['The weather is nice today.']
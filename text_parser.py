@@ -73,6 +73,22 @@ def parse_bilingual_file_content(file_content_string):
         if sentence_index_in_paragraph > 0: # Only increment if sentences were found
             paragraph_index += 1
 
+def iter_bilingual_file_content(sentence_rows):
+    """
+    Inverse of parse_bilingual_file_content: yields the text of a bilingual file piece by piece from
+    rows (paragraph_index, english_text, chinese_text) in reading order, one <paragraph> per paragraph.
+    """
+    current_paragraph = None
+    for row in sentence_rows:
+        if row['paragraph_index'] != current_paragraph:
+            if current_paragraph is not None:
+                yield "</paragraph>\n"
+            yield "<paragraph>\n"
+            current_paragraph = row['paragraph_index']
+        yield f"{row['english_text']}\n{row['chinese_text']}\n"
+    if current_paragraph is not None:
+        yield "</paragraph>\n"
+
 # --- Example Usage (for testing the parser) ---
 if __name__ == '__main__':
     sample_text_with_chinese_punc = """
@@ -1,4 +1,7 @@
-import torch
+try:
+    import torch
+except ImportError: # Installed with kokoro; without it kokoro fails to import too and TTS is disabled below
+    torch = None
 # Assuming your Flask app's config will be accessible or passed where needed
 # For now, we'll assume config values are passed or hardcoded for simplicity in this standalone module.
 # In a real app, app.config would be used.
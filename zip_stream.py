@@ -0,0 +1,66 @@
+# bilingual_app/zip_stream.py
+"""
+ZIP archives generated as a stream of byte chunks, for HTTP responses that start immediately and
+use constant memory whatever the archive size. zipfile writes to a sink that cannot seek, so every
+member gets a data descriptor after its data (sizes and CRC do not need to be known in advance)
+and nothing is staged on disk. Members over 4 GiB switch to ZIP64 automatically when their size
+is given.
+"""
+import io
+import time
+import zipfile
+
+
+class _ChunkSink(io.RawIOBase):
+    """Write-only, unseekable file object that collects whatever zipfile writes until drained."""
+
+    def __init__(self):
+        super().__init__()
+        self._chunks = []
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def drain(self):
+        data = b''.join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+class ZipMember:
+    """
+    One archive member. `chunks` is an iterable of bytes or str (str is UTF-8 encoded), consumed only
+    when the member is written. `stored=True` skips deflate, for content that is already compressed
+    (MP3); `size`, when known, lets large members use ZIP64 and `mtime` dates the member.
+    """
+
+    def __init__(self, arcname, chunks, stored=False, size=None, mtime=None):
+        self.arcname = arcname
+        self.chunks = chunks
+        self.stored = stored
+        self.size = size
+        self.mtime = mtime
+
+
+def iter_zip(members):
+    """Yields the bytes of a ZIP archive holding `members` (an iterable of ZipMember, consumed lazily)."""
+    sink = _ChunkSink()
+    with zipfile.ZipFile(sink, mode='w', compression=zipfile.ZIP_DEFLATED) as archive:
+        for member in members:
+            zinfo = zipfile.ZipInfo(member.arcname, date_time=time.localtime(member.mtime or time.time())[:6])
+            zinfo.compress_type = zipfile.ZIP_STORED if member.stored else zipfile.ZIP_DEFLATED
+            zinfo.file_size = member.size or 0
+            with archive.open(zinfo, mode='w') as member_file:
+                for chunk in member.chunks:
+                    member_file.write(chunk.encode('utf-8') if isinstance(chunk, str) else chunk)
+                    data = sink.drain()
+                    if data:
+                        yield data
+            data = sink.drain()
+            if data:
+                yield data
+    yield sink.drain() # Central directory